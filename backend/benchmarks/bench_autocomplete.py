@@ -0,0 +1,90 @@
+"""
+Autocomplete Benchmark
+Fills the type-ahead prefix index with synthetic recipes (titles from a Zipf-distributed word
+list, 6-10 ingredient lines each, Zipf popularity) and times the build, single-recipe updates
+and lookups for one- to five-letter prefixes, cold (first lookup) and cached.
+Everything runs in memory; the database is not touched
+Run from the backend directory: python benchmarks/bench_autocomplete.py [--recipes 100000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cookbook.settings')
+import django
+django.setup()
+
+from recipes.autocomplete import PrefixIndex
+
+
+def synthetic_rows(count, seed):
+    """
+    Yield (recipe id, title, ingredients, weight) rows
+    """
+    rng = random.Random(seed)
+    words = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))) for _ in range(5000)]
+    ingredients = [' '.join(rng.sample(words, rng.randint(1, 2))) for _ in range(3000)]
+    zipf = [1 / (rank + 1) for rank in range(len(words))]
+    for recipe_id in range(1, count + 1):
+        title = ' '.join(rng.choices(words, weights=zipf, k=rng.randint(2, 4))).title()
+        lines = [f'{rng.randint(1, 3)} cups {name}, chopped' for name in rng.sample(ingredients, rng.randint(6, 10))]
+        yield recipe_id, title, lines, 1 + int(1000 / (recipe_id ** 0.7))
+
+
+def per_lookup_us(index, prefixes, cold):
+    if not cold:
+        for prefix in prefixes:
+            index.search(prefix, 8)
+    started = time.perf_counter()
+    for prefix in prefixes:
+        if cold:
+            index._results.clear()
+        index.search(prefix, 8)
+    return (time.perf_counter() - started) / len(prefixes) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=100_000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = list(synthetic_rows(args.recipes, args.seed))
+    started = time.perf_counter()
+    index = PrefixIndex()
+    index.load(rows)
+    elapsed = time.perf_counter() - started
+    # Measured on a second build: tracing slows building severalfold
+    tracemalloc.start()
+    traced = PrefixIndex()
+    traced.load(rows)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del traced
+    print(f"{'build':<36} {elapsed:>10.2f} s   ({len(index):,} suggestions, {index.key_count:,} keys)")
+    print(f"{'index memory':<36} {memory / 2 ** 20:>10.1f} MiB")
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    for recipe_id, title, lines, weight in rng.sample(rows, 200):
+        index.add_recipe(recipe_id, title, lines, weight + 1)
+    print(f"{'update one recipe':<36} {(time.perf_counter() - started) / 200 * 1e6:>10.0f} us")
+
+    labels = [index.items[item][0].lower() for item in rng.sample(list(index.items), args.lookups)]
+    for length in (1, 2, 3, 5):
+        prefixes = [label[:length] for label in labels]
+        print(f"{f'lookup, {length}-letter prefix (cold)':<36} {per_lookup_us(index, prefixes, True):>10.0f} us")
+        print(f"{f'lookup, {length}-letter prefix (cached)':<36} {per_lookup_us(index, prefixes, False):>10.0f} us")
+
+
+if __name__ == '__main__':
+    main()
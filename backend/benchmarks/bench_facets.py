@@ -0,0 +1,97 @@
+"""
+Faceted Browse Benchmark
+Fills the facet bitmaps with synthetic recipes (Zipf-distributed authors and ingredients,
+random servings, ratings and signature flags) and times the build, single-recipe updates and
+browse queries (facet counts for every facet plus the first page) with 0 to 3 filters.
+Everything runs in memory; the database is not touched
+Run from the backend directory: python benchmarks/bench_facets.py [--recipes 100000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cookbook.settings')
+import django
+django.setup()
+
+from recipes.facets import FacetIndex, facet_values
+
+
+def synthetic_values(count, authors, ingredients, seed):
+    """
+    Yield (recipe id, facet values) pairs
+    """
+    rng = random.Random(seed)
+    author_weights = [1 / (rank + 1) for rank in range(authors)]
+    names = [''.join(rng.choice(string.ascii_lowercase) for _ in range(8)) for _ in range(ingredients)]
+    ingredient_weights = [1 / (rank + 1) ** 0.9 for rank in range(ingredients)]
+    for recipe_id in range(1, count + 1):
+        rating_count = rng.choice([0, 0, 1, 3, 10, 40])
+        yield recipe_id, facet_values(
+            servings=rng.randint(1, 10),
+            is_signature=rng.random() < 0.05,
+            author_id=rng.choices(range(authors), weights=author_weights)[0],
+            ingredients=set(rng.choices(names, weights=ingredient_weights, k=rng.randint(6, 12))),
+            rating_count=rating_count,
+            rating_sum=rating_count * rng.uniform(1, 5),
+        )
+
+
+def per_query_ms(index, filters, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        total, _, _ = index.query(filters)
+    return (time.perf_counter() - started) / runs * 1000, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=100_000)
+    parser.add_argument('--authors', type=int, default=2000)
+    parser.add_argument('--ingredients', type=int, default=3000)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=3)
+    args = parser.parse_args()
+
+    rows = list(synthetic_values(args.recipes, args.authors, args.ingredients, args.seed))
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = FacetIndex()
+    index.load((recipe_id, values, None) for recipe_id, values in rows)
+    elapsed = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    values = sum(len(postings) for postings in index.postings.values())
+    print(f"{'build':<44} {elapsed:>9.2f} s   ({len(index):,} recipes, {values:,} facet values)")
+    print(f"{'index memory':<44} {memory / 2 ** 20:>9.1f} MiB")
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    for recipe_id, values in rng.sample(rows, 200):
+        index.add_recipe(recipe_id, values)
+    print(f"{'update one recipe':<44} {(time.perf_counter() - started) / 200 * 1000:>9.2f} ms")
+
+    ingredients = sorted(index.sizes['ingredient'], key=index.sizes['ingredient'].get, reverse=True)
+    for filters in (
+        {},
+        {'servings': ['3-4']},
+        {'servings': ['3-4', '5-6'], 'rating': ['4-5']},
+        {'rating': ['4-5'], 'signature': ['false'], 'ingredient': ingredients[:2]},
+        {'ingredient': ingredients[100:101]},
+    ):
+        elapsed, total = per_query_ms(index, filters, args.runs)
+        label = ', '.join(f'{facet}={"|".join(values)}' for facet, values in filters.items()) or 'no filter'
+        label = label if len(label) <= 44 else label[:41] + '...'
+        print(f"{label:<44} {elapsed:>9.2f} ms   ({total:,} matches)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+JSON Rendering Micro-benchmarks
+Compares DRF's stock JSONRenderer with cookbook.renderers.FastJSONRenderer on the
+homepage and recipe-list payloads, and per-socket vs pre-encoded broadcast frames
+Run from the backend directory: python benchmarks/bench_json.py [--clients N]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cookbook.settings')
+import django
+django.setup()
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from cookbook import renderers
+
+
+def measure(label, func, number):
+    """
+    Print the best per-call time of func in microseconds
+    """
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{label:<48} {best * 1e6:>10.1f} us")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=200, help='calls per timing run')
+    parser.add_argument('--clients', type=int, default=1000, help='sockets per simulated broadcast')
+    args = parser.parse_args()
+
+    client = APIClient()
+    payloads = {
+        'homepage': client.get('/api/homepage/').data,
+        'recipe list': client.get('/api/recipes/').data,
+    }
+    print(f"Encoder: {'orjson' if renderers.orjson else 'stdlib json'}")
+    print("-" * 60)
+
+    stock = JSONRenderer()
+    fast = renderers.FastJSONRenderer()
+    for name, data in payloads.items():
+        size = len(stock.render(data))
+        print(f"{name} payload: {size} bytes")
+        base = measure(f"  JSONRenderer ({name})", lambda: stock.render(data), args.number)
+        best = measure(f"  FastJSONRenderer ({name})", lambda: fast.render(data), args.number)
+        print(f"  speedup: {base / best:.1f}x")
+
+    print("-" * 60)
+    message = {'action': 'update', 'recipe': payloads['recipe list'][0] if payloads['recipe list'] else {}}
+    print(f"broadcast of one recipe_update to {args.clients} sockets")
+    per_socket = measure(
+        "  json.dumps per socket",
+        lambda: [json.dumps({'type': 'recipe_update', 'data': message}) for _ in range(args.clients)],
+        max(1, args.number // 50),
+    )
+    encoded_once = measure(
+        "  encode once, reuse frame",
+        lambda: [frame for frame in [renderers.dumps_text({'type': 'recipe_update', 'data': message})] * args.clients],
+        max(1, args.number // 50),
+    )
+    print(f"  speedup: {per_socket / encoded_once:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Recommendation Benchmark
+Builds a synthetic rating matrix (users with a few favourite cuisines, Zipf-popular recipes,
+1M ratings by default) and times the offline full build, the incremental refresh of a few
+stale recipes and the online scoring of one user's recommendations from K-neighbor lists.
+Also reports hit rate on held-out favourite ratings against a most-popular baseline.
+Everything runs in memory; the database is not touched
+Run from the backend directory: python benchmarks/bench_recommendations.py [--ratings 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cookbook.settings')
+import django
+django.setup()
+
+import numpy as np
+
+from recipes import recommendations
+
+
+def synthetic_ratings(users, recipes, ratings, cuisines, seed):
+    """
+    Return (user ids, recipe ids, scores): each user loves 3 cuisines, picks recipes from them
+    70% of the time (else from the whole catalogue), Zipf-weighted by popularity, and rates
+    favourite-cuisine recipes 4-5 stars and the rest 1-3
+    """
+    rng = np.random.default_rng(seed)
+    cuisine_of = rng.integers(0, cuisines, recipes)
+    popularity = 1 / np.arange(1, recipes + 1) ** 0.8
+    rng.shuffle(popularity)
+    favourites = rng.random((users, cuisines)).argsort(axis=1)[:, :3]
+
+    user_ids = np.repeat(np.arange(users), -(-ratings // users))[:ratings]
+    picked = np.empty(len(user_ids), dtype=np.int64)
+    from_favourites = rng.random(len(user_ids)) < 0.7
+    cuisine = favourites[user_ids, rng.integers(0, 3, len(user_ids))]
+    for group in range(cuisines):
+        members = np.flatnonzero(cuisine_of == group)
+        cumulative = np.cumsum(popularity[members]) / popularity[members].sum()
+        rows = np.flatnonzero(from_favourites & (cuisine == group))
+        picked[rows] = members[np.minimum(np.searchsorted(cumulative, rng.random(len(rows))), len(members) - 1)]
+    cumulative = np.cumsum(popularity) / popularity.sum()
+    rows = np.flatnonzero(~from_favourites)
+    picked[rows] = np.minimum(np.searchsorted(cumulative, rng.random(len(rows))), recipes - 1)
+
+    # One rating per (user, recipe)
+    _, first = np.unique(user_ids * recipes + picked, return_index=True)
+    user_ids, picked = user_ids[first], picked[first]
+    liked = (favourites[user_ids] == cuisine_of[picked][:, None]).any(axis=1)
+    scores = np.where(liked, rng.integers(4, 6, len(picked)), rng.integers(1, 4, len(picked)))
+    return user_ids, picked, scores
+
+
+def timed(label, func):
+    started = time.perf_counter()
+    result = func()
+    print(f"{label:<52} {time.perf_counter() - started:>8.2f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ratings', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--recipes', type=int, default=5_000)
+    parser.add_argument('--cuisines', type=int, default=40)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--stale', type=int, default=50, help='recipes refreshed incrementally')
+    parser.add_argument('--evaluate', type=int, default=1000, help='users in the hit-rate check')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    user_ids, recipe_ids, scores = timed(
+        f'generate {args.ratings:,} ratings', lambda: synthetic_ratings(
+            args.users, args.recipes, args.ratings, args.cuisines, args.seed,
+        )
+    )
+    # Hold out one liked rating of some users to check the recommendations find it again
+    rng = np.random.default_rng(args.seed)
+    liked_rows = np.flatnonzero(scores >= 4)
+    rng.shuffle(liked_rows)
+    _, first = np.unique(user_ids[liked_rows], return_index=True)
+    held_rows = rng.choice(liked_rows[first], min(args.evaluate, len(first)), replace=False)
+    held_out = dict(zip(user_ids[held_rows].tolist(), recipe_ids[held_rows].tolist()))
+    keep = np.ones(len(user_ids), dtype=bool)
+    keep[held_rows] = False
+    user_ids, recipe_ids, scores = user_ids[keep], recipe_ids[keep], scores[keep]
+    print(f"{len(scores):,} ratings, {args.users:,} users, {args.recipes:,} recipes, K={args.k}")
+
+    matrix = timed('build sparse matrix', lambda: recommendations.RatingMatrix(user_ids, recipe_ids, scores))
+    lists = timed('full build: top-K lists for every recipe', lambda: recommendations.compute_lists(matrix, k=args.k))
+    stale = list(range(args.stale))
+    timed(f'incremental: {args.stale} stale columns + reverse patch', lambda: [
+        np.nonzero(block > 0) for _, block in recommendations._blocks(matrix, stale, 10)
+    ])
+    print(f"stored neighbor rows: {sum(len(neighbors) for neighbors in lists.values()):,}")
+
+    # Online: one user's recommendations from their seeds' lists (what the view does after
+    # reading seeds x K rows through the (recipe, neighbor) index)
+    by_user = {}
+    for user, recipe, score in zip(user_ids.tolist(), recipe_ids.tolist(), scores.tolist()):
+        by_user.setdefault(user, {})[recipe] = score
+    popular = [int(recipe) for recipe in np.argsort(-np.bincount(recipe_ids, minlength=args.recipes))]
+    hits = popular_hits = 0
+    lookup_seconds = 0.0
+    for user, target in held_out.items():
+        rated = by_user.get(user, {})
+        mean = sum(rated.values()) / len(rated)
+        seeds = {recipe: score - mean for recipe, score in rated.items()}
+        started = time.perf_counter()
+        rows = [
+            (recipe, neighbor, similarity)
+            for recipe in seeds for neighbor, similarity in lists.get(recipe, [])
+        ]
+        ranked = recommendations.score(seeds, rows)[:10]
+        lookup_seconds += time.perf_counter() - started
+        hits += target in ranked
+        popular_hits += target in [recipe for recipe in popular if recipe not in rated][:10]
+    print(f"{'online scoring per user (seeds x K rows)':<52} {lookup_seconds / len(held_out) * 1e6:>8.0f} us")
+    print(f"hit rate@10 on {len(held_out)} held-out favourites: item-item {hits / len(held_out):.1%}, "
+          f"most popular {popular_hits / len(held_out):.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Similar Recipes Benchmark
+Creates a synthetic catalogue (dishes with a core of ingredients, each recipe a variation with
+extra ingredients and its own wording) inside a transaction that is rolled back at the end,
+then times indexing on save and the similar-recipes lookup, and checks how many results are
+variations of the same dish
+Run from the backend directory: python benchmarks/bench_similar.py [--recipes 5000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cookbook.settings')
+import django
+django.setup()
+
+from django.db import connection, transaction
+
+from recipes import similar
+from recipes.models import Recipe, User
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def word(rng, length=6):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def synthetic_recipes(author, count, dishes, seed):
+    """
+    Return (recipe, dish index) pairs: 8 ingredients and a dish name shared per dish, recipes
+    keep 5 of them plus 3 from a large vocabulary, and describe themselves in random words
+    """
+    rng = random.Random(seed)
+    vocabulary = [word(rng) for _ in range(1500)]
+    names = [f'{word(rng, 7)} {word(rng, 5)}' for _ in range(dishes)]
+    cores = [rng.sample(vocabulary, 8) for _ in range(dishes)]
+    units = ['1 cup', '2 tbsp', '500 g', '3 cloves', '1 bundle', '2 pieces', '1 tsp']
+    for _ in range(count):
+        dish = rng.randrange(dishes)
+        ingredients = rng.sample(cores[dish], 5) + rng.sample(vocabulary, 3)
+        yield Recipe(
+            title=f'{word(rng, 5).title()} {names[dish]}',
+            description=' '.join(rng.sample(vocabulary, 12)),
+            ingredients=[f'{rng.choice(units)} {name}, chopped' for name in ingredients],
+            steps='Cook.',
+            author=author,
+            status='approved',
+        ), dish
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=5000)
+    parser.add_argument('--dishes', type=int, default=250)
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            author = User.objects.create(username='bench-similar', role='user')
+            dish_of = {}
+            started = time.perf_counter()
+            for recipe, dish in synthetic_recipes(author, args.recipes, args.dishes, args.seed):
+                recipe.save()
+                dish_of[recipe.id] = dish
+            elapsed = time.perf_counter() - started
+            print(f"{'save + index per recipe':<40} {elapsed / args.recipes * 1000:>8.2f} ms")
+
+            targets = random.Random(args.seed).sample(list(dish_of), min(args.lookups, len(dish_of)))
+            same_dish = total = 0
+            timings = []
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                for recipe in Recipe.objects.filter(id__in=targets):
+                    started = time.perf_counter()
+                    results = similar.similar(recipe, 10)
+                    timings.append(time.perf_counter() - started)
+                    same_dish += sum(dish_of.get(recipe_id) == dish_of[recipe.id] for recipe_id, _ in results)
+                    total += len(results)
+            timings.sort()
+            print(f"{'lookup p50':<40} {timings[len(timings) // 2] * 1000:>8.2f} ms")
+            print(f"{'lookup p95':<40} {timings[int(len(timings) * 0.95)] * 1000:>8.2f} ms")
+            print(f"{'queries per lookup':<40} {queries.count / len(timings):>8.1f}")
+            print(f"{'results per lookup (limit 10)':<40} {total / len(timings):>8.1f}")
+            print(f"{'results from the same dish':<40} {same_dish / max(total, 1):>8.1%}")
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Cold Start Benchmark
+Measures time-to-first-response of a fresh worker process for each settings profile:
+process start, Django setup and URLconf loading, then the first and second requests,
+served in-process through the WSGI handler. With --importtime it also prints the
+slowest top-level imports of a profile as reported by `python -X importtime`.
+Run from the backend directory: python benchmarks/cold_start.py [--runs 5] [--importtime]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = ['cookbook.settings', 'cookbook.settings_api']
+
+# Runs inside the fresh worker; prints its timings as JSON
+WORKER = r'''
+import io, json, os, sys, time
+started = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+ready = time.perf_counter()
+
+def request(path):
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', 'wsgi.input': io.BytesIO()}
+    setup_testing_defaults(environ)
+    status = []
+    body = b''.join(application(environ, lambda s, h, e=None: status.append(s)))
+    return status[0], len(body)
+
+first_status, _ = request(sys.argv[1])
+first = time.perf_counter()
+request(sys.argv[1])
+second = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (ready - started) * 1000,
+    'first_request_ms': (first - ready) * 1000,
+    'second_request_ms': (second - first) * 1000,
+    'status': first_status,
+    'modules': len(sys.modules),
+    'pil_loaded': 'PIL.Image' in sys.modules,
+    'simplejwt_loaded': 'rest_framework_simplejwt' in sys.modules,
+    'channels_loaded': 'channels' in sys.modules,
+}))
+'''
+
+
+def run_worker(profile, path):
+    """
+    Start one worker process; returns its own timings plus the wall time seen from outside
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=profile)
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', WORKER, path], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def import_profile(profile, top):
+    """
+    Print the slowest top-level imports (cumulative microseconds) of Django setup
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=profile)
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         'from django.core.wsgi import get_wsgi_application; get_wsgi_application()'
+         '; from django.urls import resolve; resolve("/api/homepage/")'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)', line)
+        if match and len(match.group(3)) == 1:
+            rows.append((int(match.group(2)), match.group(4)))
+    print(f"\n{profile}: {sum(us for us, _ in rows) / 1000:.0f} ms in top-level imports")
+    for us, module in sorted(rows, reverse=True)[:top]:
+        print(f"  {us / 1000:>8.1f} ms  {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5, help='fresh workers per profile')
+    parser.add_argument('--path', default='/api/homepage/', help='first request path')
+    parser.add_argument('--importtime', action='store_true', help='also print the slowest imports')
+    parser.add_argument('--top', type=int, default=12)
+    parser.add_argument('--settings', nargs='+', default=PROFILES, help='settings modules to compare')
+    args = parser.parse_args()
+
+    print(f"{'profile':<24} {'process':>9} {'setup':>9} {'1st req':>9} {'2nd req':>9} {'modules':>8}")
+    for profile in args.settings:
+        results = [run_worker(profile, args.path) for _ in range(args.runs)]
+        median = {key: statistics.median(r[key] for r in results)
+                  for key in ('process_ms', 'setup_ms', 'first_request_ms', 'second_request_ms', 'modules')}
+        print(f"{profile:<24} {median['process_ms']:>7.0f}ms {median['setup_ms']:>7.0f}ms "
+              f"{median['first_request_ms']:>7.1f}ms {median['second_request_ms']:>7.1f}ms {median['modules']:>8.0f}"
+              f"   status {results[0]['status']}, PIL {results[0]['pil_loaded']}, "
+              f"simplejwt {results[0]['simplejwt_loaded']}, channels {results[0]['channels_loaded']}")
+
+    if args.importtime:
+        for profile in args.settings:
+            import_profile(profile, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Concurrent Rating Stress Test
+Seeds a throwaway database, then has many threads (one database connection each) rate a few
+hot recipes at once, as many raters do when a recipe is featured. Afterwards it checks that
+every leaderboard entry still equals the aggregates of the ratings table. It reports the
+throughput, the latency percentiles and the failed ratings (e.g. "database is locked").
+--legacy runs the previous read-then-write path (get, update_or_create) for comparison.
+Exits with status 1 when a rating failed or an entry drifted.
+Run from the backend directory: python benchmarks/stress_ratings.py [--threads 16 --ratings 500]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Setup Django against a scratch database (and snapshot directory) in a temporary directory
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cookbook.settings')
+from django.conf import settings
+
+SCRATCH = tempfile.mkdtemp(prefix='stress-ratings-')
+DATABASE = os.path.join(SCRATCH, 'db.sqlite3')
+settings.DATABASES['default']['NAME'] = DATABASE
+settings.DATABASES['replica']['NAME'] = f'file:{DATABASE}?mode=ro'
+settings.SNAPSHOTS_DIR = os.path.join(SCRATCH, 'snapshots')
+
+import django
+django.setup()
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import post_save
+
+from recipes import leaderboard, ratings, signals
+from recipes.models import LeaderboardEntry, Rating, Recipe, User
+from recipes.seed import seed
+
+
+def legacy_rate(recipe_id, user, score):
+    """
+    The rating path before the upsert: read, then update_or_create
+    """
+    recipe = Recipe.objects.get(id=recipe_id)
+    previous_score = Rating.objects.filter(recipe=recipe, user=user).values_list('score', flat=True).first()
+    rating, _ = Rating.objects.update_or_create(recipe=recipe, user=user, defaults={'score': score})
+    leaderboard.record_rating(recipe.id, previous_score, rating.score)
+
+
+def rater(rate, recipe_ids, users, count, seed_value, latencies, errors, start):
+    rng = random.Random(seed_value)
+    start.wait()
+    try:
+        for _ in range(count):
+            began = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    rate(rng.choice(recipe_ids), rng.choice(users), rng.randint(1, 5))
+            except DatabaseError as error:
+                errors.append(str(error))
+            else:
+                latencies.append(time.perf_counter() - began)
+    finally:
+        connection.close()
+
+
+def drift():
+    """
+    Recipes whose leaderboard entry differs from their ratings: [(id, entry, actual)]
+    """
+    actual = {
+        row['recipe_id']: (row['count'], row['total'])
+        for row in Rating.objects.values('recipe_id').annotate(count=Count('id'), total=Sum('score'))
+    }
+    return [
+        (recipe_id, (rating_count, rating_sum), actual.get(recipe_id, (0, 0)))
+        for recipe_id, rating_count, rating_sum
+        in LeaderboardEntry.objects.values_list('recipe_id', 'rating_count', 'rating_sum')
+        if (rating_count, rating_sum) != actual.get(recipe_id, (0, 0))
+    ]
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ratings', type=int, default=500, help='ratings per thread')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--hot', type=int, default=5, help='recipes all threads rate')
+    parser.add_argument('--legacy', action='store_true', help='use the previous read-then-write path')
+    parser.add_argument('--busy-timeout', type=float, default=5,
+                        help="seconds a rater waits for SQLite's write lock (5 is Python's default)")
+    parser.add_argument('--seed', type=int, default=3)
+    args = parser.parse_args()
+    # Read by every thread's connection when it opens
+    settings.DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = args.busy_timeout
+
+    call_command('migrate', verbosity=0)
+    seed(users=args.users, recipes=args.hot, seed=args.seed, log=lambda message: None)
+    recipe_ids = list(Recipe.objects.order_by('-id').values_list('id', flat=True)[:args.hot])
+    users = list(User.objects.filter(username__startswith='cook'))
+    connection.close()
+    print(f"{args.threads} threads x {args.ratings} ratings on {len(recipe_ids)} recipes by {len(users)} users "
+          f"({'legacy read-then-write' if args.legacy else 'upsert'}), database in {SCRATCH}")
+
+    rate = legacy_rate if args.legacy else ratings.rate
+    if args.legacy:
+        # legacy_rate moves the leaderboard itself, as it did before saved ratings were counted
+        post_save.disconnect(signals.rating_saved, sender=Rating)
+    latencies, errors = [], []
+    start = threading.Barrier(args.threads)
+    threads = [
+        threading.Thread(target=rater, args=(
+            rate, recipe_ids, users, args.ratings, args.seed * 1000 + number, latencies, errors, start,
+        ))
+        for number in range(args.threads)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{'ratings stored':<40} {len(latencies):>10,}")
+    print(f"{'ratings per second':<40} {len(latencies) / elapsed:>10,.0f}")
+    print(f"{'latency p50 / p99 / max (ms)':<40} {percentile(latencies, 0.5) * 1000:>10.1f} "
+          f"{percentile(latencies, 0.99) * 1000:.1f} {latencies[-1] * 1000 if latencies else 0:.1f}")
+    print(f"{'failed ratings':<40} {len(errors):>10,}")
+    for message in sorted(set(errors))[:5]:
+        print(f"  {errors.count(message):,} x {message}")
+    drifted = drift()
+    print(f"{'leaderboard entries out of step':<40} {len(drifted):>10,}")
+    for recipe_id, entry, actual in drifted[:5]:
+        print(f"  recipe {recipe_id}: entry (count, sum) {entry}, ratings {actual}")
+    return 1 if errors or drifted else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
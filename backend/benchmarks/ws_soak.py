@@ -0,0 +1,140 @@
+"""
+WebSocket Soak Test
+Opens thousands of in-process sockets against the ASGI application, broadcasts a burst of
+events and reports connect time, fan-out latency, memory per socket and how the
+slow-consumer policy treated slow clients (sockets whose every send takes --send-delay)
+Run from the backend directory: python benchmarks/ws_soak.py [--sockets 10000] [--slow 0.01]
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cookbook.settings')
+import django
+django.setup()
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+
+from cookbook.asgi import application
+from cookbook.renderers import dumps_text
+from recipes.consumers import RecipeConsumer, registry
+
+
+class SlowConsumer(RecipeConsumer):
+    """
+    RecipeConsumer behind a congested link: every frame takes `delay` seconds to go out
+    """
+    delay = 1.0
+
+    async def send(self, *args, **kwargs):
+        await asyncio.sleep(self.delay)
+        await super().send(*args, **kwargs)
+
+
+def rss_mb():
+    """
+    Current resident set size in MB (peak RSS where /proc is unavailable)
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def open_sockets(count, batch, app=application):
+    """
+    Connect `count` sockets, `batch` handshakes at a time
+    """
+    sockets = []
+    for start in range(0, count, batch):
+        communicators = [WebsocketCommunicator(app, '/ws/recipes/') for _ in range(min(batch, count - start))]
+        results = await asyncio.gather(*(communicator.connect(timeout=30) for communicator in communicators))
+        connected = [communicator for communicator, (accepted, _) in zip(communicators, results) if accepted]
+        # Consume the welcome frame carrying the current sequence number
+        await asyncio.gather(*(communicator.receive_from(timeout=30) for communicator in connected))
+        sockets.extend(connected)
+    return sockets
+
+
+async def main(args):
+    settings.WS_HEARTBEAT_SECONDS = args.heartbeat
+    settings.WS_SLOW_CONSUMER_POLICY = args.policy
+    settings.WS_SEND_QUEUE_SIZE = args.queue
+    settings.WS_SEND_TIMEOUT = args.send_timeout
+    SlowConsumer.delay = args.send_delay
+    channel_layer = get_channel_layer()
+    # Fan-out to every socket must fit the in-memory layer's per-channel buffer, and the whole
+    # burst must be delivered within its message expiry (60s) or the layer drops the rest
+    channel_layer.capacity = max(channel_layer.capacity, args.events * 2)
+
+    base_rss = rss_mb()
+    started = time.perf_counter()
+    fast = await open_sockets(args.sockets, args.batch)
+    connect_seconds = time.perf_counter() - started
+    socket_rss = rss_mb()
+    print(f"connected {len(fast)}/{args.sockets} sockets in {connect_seconds:.2f}s "
+          f"({len(fast) / connect_seconds:.0f}/s), "
+          f"{(socket_rss - base_rss) * 1024 / max(len(fast), 1):.1f} KB/socket")
+
+    # Slow clients take --send-delay per frame, so their frames back up in the send queue
+    slow = await open_sockets(int(args.sockets * args.slow), args.batch, SlowConsumer.as_asgi())
+
+    frame = dumps_text({'type': 'recipe_update', 'data': {'action': 'soak', 'recipe': {'id': 0, 'title': 'x' * 200}}})
+    started = time.perf_counter()
+    for _ in range(args.events):
+        await channel_layer.group_send('recipes', {'type': 'recipe_update', 'frame': frame})
+    send_seconds = time.perf_counter() - started
+
+    async def drain(communicator):
+        received = 0
+        while received < args.events:
+            if json.loads(await communicator.receive_from(timeout=300))['type'] == 'ping':
+                # Confirms the frames read so far, reopening the server's send window
+                await communicator.send_to(text_data=dumps_text({'type': 'pong'}))
+            else:
+                received += 1
+        return received
+
+    received = sum(await asyncio.gather(*(drain(communicator) for communicator in fast)))
+    fanout_seconds = time.perf_counter() - started
+    print(f"broadcast {args.events} events: group_send {send_seconds * 1000:.1f} ms, "
+          f"all {received} frames delivered to fast sockets in {fanout_seconds:.2f}s "
+          f"({received / fanout_seconds:.0f} frames/s)")
+
+    await asyncio.sleep(0.1)
+    print(f"peak rss {rss_mb():.0f} MB, registry {registry.stats()}")
+
+    # Slow sockets are closed by the server; fast ones close normally
+    for communicator in fast:
+        await communicator.disconnect()
+    for communicator in slow:
+        await communicator.disconnect()
+    await asyncio.sleep(0.1)
+    print(f"after disconnect registry {registry.stats()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sockets', type=int, default=10000)
+    parser.add_argument('--batch', type=int, default=500, help='concurrent handshakes')
+    parser.add_argument('--events', type=int, default=20, help='broadcasts in the burst')
+    parser.add_argument('--queue', type=int, default=16,
+                        help='per-socket send queue bound (below --events so slow sockets overflow)')
+    parser.add_argument('--slow', type=float, default=0.01, help='slow sockets, as a fraction of --sockets')
+    parser.add_argument('--send-delay', type=float, default=1.0, help='seconds each frame takes on a slow socket')
+    parser.add_argument('--send-timeout', type=float, default=settings.WS_SEND_TIMEOUT,
+                        help='seconds a frame may be held before the socket is closed')
+    parser.add_argument('--policy', choices=['close', 'drop_oldest'], default=settings.WS_SLOW_CONSUMER_POLICY)
+    parser.add_argument('--heartbeat', type=float, default=3600, help='heartbeat interval in seconds')
+    asyncio.run(main(parser.parse_args()))
@@ -1,16 +1,27 @@
 import os
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cookbook.settings')
+
+# Set up Django before importing anything that touches models or settings
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+from recipes import autocomplete, facets
+from recipes.jobs import JobWorkerMiddleware
+from recipes.outbox import OutboxDispatcherMiddleware
 from recipes.routing import websocket_urlpatterns
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cookbook.settings')
-
-application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+application = JobWorkerMiddleware(OutboxDispatcherMiddleware(ProtocolTypeRouter({
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             websocket_urlpatterns
         )
     ),
-})
+})))
+
+# Build the type-ahead and facet indexes in the background while the first requests arrive
+autocomplete.warm()
+facets.warm()
@@ -0,0 +1,39 @@
+"""
+Lazy JWT Authentication
+DRF resolves DEFAULT_AUTHENTICATION_CLASSES when rest_framework.views is first imported,
+so naming simplejwt's JWTAuthentication there loads simplejwt (and pkg_resources, through
+its package __init__) while the URLconf is still loading. This wrapper keeps that cost
+off process start-up and pays it on the first request that carries a token.
+"""
+from django.conf import settings
+from rest_framework.authentication import BaseAuthentication
+
+
+def _jwt_setting(name, default):
+    return getattr(settings, 'SIMPLE_JWT', {}).get(name, default)
+
+
+class LazyJWTAuthentication(BaseAuthentication):
+    """
+    Delegates to rest_framework_simplejwt.authentication.JWTAuthentication, imported on first use
+    """
+    _backend = None
+
+    @classmethod
+    def backend(cls):
+        if cls._backend is None:
+            from rest_framework_simplejwt.authentication import JWTAuthentication
+            cls._backend = JWTAuthentication()
+        return cls._backend
+
+    def authenticate(self, request):
+        # Anonymous requests never need simplejwt (it would return None as well)
+        if not request.META.get(_jwt_setting('AUTH_HEADER_NAME', 'HTTP_AUTHORIZATION')):
+            return None
+        return self.backend().authenticate(request)
+
+    def authenticate_header(self, request):
+        header_types = _jwt_setting('AUTH_HEADER_TYPES', ('Bearer',))
+        if isinstance(header_types, str):
+            header_types = (header_types,)
+        return f'{header_types[0]} realm="api"'
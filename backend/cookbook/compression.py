@@ -0,0 +1,184 @@
+"""
+Response compression helpers
+Content negotiation and gzip/brotli encoders shared by CompressionMiddleware and
+views that keep pre-compressed copies of cached documents
+"""
+import gzip
+import zlib
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Optional, gzip is always available
+    brotli = None
+
+# Preferred first when the client accepts several encodings equally
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+    'text/',
+)
+
+
+def min_size():
+    """
+    Bodies smaller than this are sent as-is; the headers would eat the gain
+    """
+    return getattr(settings, 'COMPRESSION_MIN_SIZE', 512)
+
+
+def is_compressible(content_type):
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+def _weights(request):
+    """
+    {coding: q-value} from Accept-Encoding
+    """
+    weights = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            weights[name] = quality
+    return weights
+
+
+def negotiate(request, available=SUPPORTED_ENCODINGS):
+    """
+    Pick the best of the `available` encodings from Accept-Encoding, or None for identity
+    Honours q-values (q=0 disables an encoding) and the '*' wildcard
+    """
+    weights = _weights(request)
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        if encoding not in available:
+            continue
+        quality = weights.get(encoding, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def identity_refused(request):
+    """
+    True when Accept-Encoding rules out an unencoded body (identity;q=0, or *;q=0 without
+    identity listed)
+    """
+    weights = _weights(request)
+    return weights.get('identity', weights.get('*', 1.0)) <= 0
+
+
+def compress(content, encoding, level=None):
+    """
+    Compress a whole body; level defaults to a fast setting suitable for per-request use
+    """
+    if encoding == 'br':
+        return brotli.compress(content, quality=4 if level is None else level)
+    if encoding == 'gzip':
+        return gzip.compress(content, compresslevel=6 if level is None else level, mtime=0)
+    return content
+
+
+# Streaming output is flushed to the client after roughly this much input
+STREAM_FLUSH_BYTES = 16 * 1024
+
+
+class _StreamCompressor:
+    """
+    Incremental encoder that flushes every STREAM_FLUSH_BYTES of input, so large
+    exports start reaching the client early without paying a flush per tiny chunk
+    """
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.pending = 0
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=4)
+        else:
+            self.compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def feed(self, chunk):
+        self.pending += len(chunk)
+        flush = self.pending >= STREAM_FLUSH_BYTES
+        if flush:
+            self.pending = 0
+        if self.encoding == 'br':
+            data = self.compressor.process(chunk)
+            return data + self.compressor.flush() if flush else data
+        data = self.compressor.compress(chunk)
+        return data + self.compressor.flush(zlib.Z_SYNC_FLUSH) if flush else data
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """
+    Compress an iterable of byte chunks incrementally
+    """
+    compressor = _StreamCompressor(encoding)
+    for chunk in chunks:
+        data = compressor.feed(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, encoding):
+    """
+    Async counterpart of compress_stream for async streaming responses
+    """
+    compressor = _StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = compressor.feed(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def precompress(content):
+    """
+    Build every variant of a cacheable body once, at the highest compression levels
+    Returns a dict of encoding -> bytes, always including 'identity'
+    """
+    variants = {'identity': content}
+    if len(content) >= min_size():
+        for encoding in SUPPORTED_ENCODINGS:
+            compressed = compress(content, encoding, level=11 if encoding == 'br' else 9)
+            if len(compressed) < len(content):
+                variants[encoding] = compressed
+    return variants
+
+
+def precompressed_response(request, variants, content_type='application/json'):
+    """
+    Serve the variant matching the client's Accept-Encoding without compressing again
+    Only the stored variants are negotiated; 406 when none of them, identity included, is acceptable
+    """
+    encoding = negotiate(request, variants)
+    if encoding is None and identity_refused(request):
+        response = HttpResponse(status=406)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+    response = HttpResponse(variants[encoding or 'identity'], content_type=content_type)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,27 @@
+"""
+Channel Layers
+The stock InMemoryChannelLayer sweeps every channel queue and group member for expired
+entries on each receive and group_send, so broadcasting one event to N sockets costs
+O(N^2). This layer runs the sweep at most once per interval; expiry is measured in
+minutes, so a sweep every second keeps the same semantics at O(N) per broadcast.
+"""
+import time
+
+from channels.layers import InMemoryChannelLayer
+
+
+class ThrottledInMemoryChannelLayer(InMemoryChannelLayer):
+    """
+    InMemoryChannelLayer with a rate-limited expiry sweep
+    """
+    def __init__(self, clean_interval=1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.clean_interval = clean_interval
+        self._last_clean = 0.0
+
+    def _clean_expired(self):
+        now = time.monotonic()
+        if now - self._last_clean < self.clean_interval:
+            return
+        self._last_clean = now
+        super()._clean_expired()
@@ -0,0 +1,159 @@
+"""
+Media file serving
+Replaces django.conf.urls.static with conditional GETs, single byte-range requests,
+far-future immutable caching for content-hashed names and optional web server offload
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from stat import S_ISREG
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .storage import is_hashed_name
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _RangeFile:
+    """
+    Read-only view of [start, start + length) of an open file for FileResponse
+    """
+    def __init__(self, fileobj, start, length):
+        self.fileobj = fileobj
+        self.remaining = length
+        fileobj.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fileobj.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.fileobj.close()
+
+
+def _apply_headers(response, headers, names=None):
+    for name in names or headers:
+        response.headers[name] = headers[name]
+
+
+def _etag(stat):
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def _parse_range(header, size):
+    """
+    Return (start, end) inclusive for a single satisfiable range, None to ignore the
+    header (multi-range or malformed) and raise ValueError when unsatisfiable
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError
+    return start, min(end, size - 1)
+
+
+def _if_none_match(header, etag):
+    if header.strip() == '*':
+        return True
+    candidates = [value.strip() for value in header.split(',')]
+    return etag in candidates or ('W/' + etag) in candidates
+
+
+def serve(request, path):
+    """
+    Serve a file below MEDIA_ROOT
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(fullpath)
+    except (OSError, SuspiciousFileOperation):
+        raise Http404('Media file not found')
+    if not S_ISREG(stat.st_mode):
+        raise Http404('Media file not found')
+
+    etag = _etag(stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if is_hashed_name(path) else REVALIDATE_CACHE_CONTROL,
+        'Accept-Ranges': 'bytes',
+    }
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if (if_none_match and _if_none_match(if_none_match, etag)) or (
+        not if_none_match
+        and not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime)
+    ):
+        response = HttpResponseNotModified()
+        _apply_headers(response, headers, ('ETag', 'Last-Modified', 'Cache-Control'))
+        return response
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    sendfile_header = getattr(settings, 'MEDIA_SENDFILE_HEADER', None)
+    if sendfile_header:
+        # Let the front web server (nginx X-Accel-Redirect, Apache X-Sendfile) do the I/O;
+        # it also handles ranges and keeps the bytes out of the Python worker entirely
+        response = HttpResponse(content_type=content_type)
+        target = fullpath
+        if sendfile_header == 'X-Accel-Redirect':
+            target = getattr(settings, 'MEDIA_SENDFILE_PREFIX', '/protected-media/') + path
+        response.headers[sendfile_header] = target
+        _apply_headers(response, headers)
+        return response
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response.headers['Content-Range'] = f'bytes */{stat.st_size}'
+            _apply_headers(response, headers)
+            return response
+
+    fileobj = open(fullpath, 'rb')
+    if byte_range is None:
+        # Whole file: FileResponse hands the descriptor to wsgi.file_wrapper (sendfile)
+        response = FileResponse(fileobj, content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(_RangeFile(fileobj, start, length), content_type=content_type, status=206)
+        response.headers['Content-Length'] = str(length)
+        response.headers['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    _apply_headers(response, headers)
+    return response
@@ -0,0 +1,467 @@
+"""
+In-process Metrics in the Prometheus Text Format
+Counters, gauges and histograms keep their values in per-process dicts guarded by one
+lock per metric, so recording a sample on the hot path costs a dict lookup and an addition.
+With METRICS_DIR set, every process also writes a snapshot of its values there (atomically,
+every METRICS_FLUSH_SECONDS), to a file named by its pid and a random instance id so a reused
+pid never overwrites an exited process's values. The /metrics view merges the snapshots of all
+worker processes: counters and histograms are summed, gauges over live processes only. The
+counters and histograms of exited processes are folded into one tombstone file, and their
+snapshots deleted, so totals do not go backwards and the directory does not grow.
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; suits request, query and job latencies alike
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+TOMBSTONE = 'tombstone.json'
+TOMBSTONE_LOCK = 'tombstone.lock'
+
+# A snapshot not rewritten for this many flush intervals belongs to an exited process, even
+# when its pid has been reused since
+STALE_FLUSHES = 60
+
+# A lock left behind by a process that died while folding is broken after this long
+LOCK_STALE_SECONDS = 30
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _instance_id():
+    return f'{os.getpid()}-{uuid.uuid4().hex[:12]}'
+
+
+# ==================== METRIC TYPES ====================
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self, lock):
+        self.value = 0.0
+        self._lock = lock
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, lock, bounds):
+        self.bounds = bounds
+        # One slot per bucket plus the overflow slot (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = lock
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return [list(self.counts), self.sum]
+
+
+class Metric:
+    """
+    A named metric with optional labels; `labels(*values)` returns the child to record on
+    Children are created once per label combination and cached, so keep label values bounded
+    (route patterns, not raw paths)
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        registry.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+            registry.start_flusher()
+        return child
+
+    def reset(self):
+        with self._lock:
+            self._children = {}
+
+    def snapshot(self):
+        return {
+            'kind': self.kind,
+            'help': self.documentation,
+            'labelnames': self.labelnames,
+            'values': [[list(values), child.snapshot()] for values, child in list(self._children.items())],
+        }
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild(self._lock)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild(self._lock)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self._lock, self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def snapshot(self):
+        return {**super().snapshot(), 'buckets': self.buckets}
+
+
+# ==================== REGISTRY ====================
+
+class Registry:
+    """
+    All metrics of this process, plus collectors that report values kept elsewhere
+    (e.g. the WebSocket connection registry) when a snapshot is taken
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+        self.instance = _instance_id()
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Duplicate metric: {metric.name}')
+        self.metrics[metric.name] = metric
+
+    def register_collector(self, collector):
+        """
+        `collector()` returns [(name, kind, help, labelnames, [(label_values, value), ...])]
+        for counters and gauges
+        """
+        self.collectors.append(collector)
+        self.start_flusher()
+
+    def snapshot(self):
+        metrics = {name: metric.snapshot() for name, metric in self.metrics.items()}
+        for collector in self.collectors:
+            for name, kind, documentation, labelnames, values in collector():
+                metrics[name] = {
+                    'kind': kind,
+                    'help': documentation,
+                    'labelnames': tuple(labelnames),
+                    'values': [[list(label_values), value] for label_values, value in values],
+                }
+        return {'pid': os.getpid(), 'instance': self.instance, 'metrics': metrics}
+
+    # ---- Cross-process aggregation ----
+
+    def start_flusher(self):
+        """
+        Write this process's snapshot to METRICS_DIR periodically (once per process)
+        """
+        if self._flusher is not None or not _setting('METRICS_DIR', None):
+            return
+        with self._flusher_lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_forever, name='metrics-flush', daemon=True)
+            self._flusher.start()
+
+    def _flush_forever(self):
+        interval = _setting('METRICS_FLUSH_SECONDS', 5)
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def flush(self):
+        directory = _setting('METRICS_DIR', None)
+        if not directory:
+            return
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{self.instance}.json'
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, path)
+
+    def after_fork(self):
+        # A forked child starts from zero (the parent keeps reporting its own values)
+        # and needs its own flusher thread
+        for metric in self.metrics.values():
+            metric.reset()
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+        self.instance = _instance_id()
+
+    def retire(self):
+        """
+        At exit: fold this process's counters into the tombstone instead of leaving its file
+        """
+        directory = _setting('METRICS_DIR', None)
+        if not directory:
+            return
+        self.flush()
+        bury(Path(directory), [Path(directory) / f'{self.instance}.json'])
+
+    def gather(self):
+        """
+        Snapshots of every worker process: this one live, the others from METRICS_DIR
+        Those of exited processes are marked dead and folded into the tombstone afterwards
+        """
+        snapshots = [self.snapshot()]
+        directory = _setting('METRICS_DIR', None)
+        if not directory or not os.path.isdir(directory):
+            return snapshots
+        stale_before = time.time() - STALE_FLUSHES * _setting('METRICS_FLUSH_SECONDS', 5)
+        dead = []
+        for entry in os.scandir(directory):
+            if not entry.name.endswith('.json') or entry.name == f'{self.instance}.json':
+                continue
+            snapshot = _read(entry.path)
+            if snapshot is None:
+                continue
+            if entry.name != TOMBSTONE:
+                try:
+                    stale = entry.stat().st_mtime < stale_before
+                except OSError:
+                    continue
+                if stale or not _alive(snapshot['pid']):
+                    snapshot['alive'] = False
+                    dead.append(Path(entry.path))
+            snapshots.append(snapshot)
+        if dead:
+            bury(Path(directory), dead)
+        return snapshots
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read(path):
+    try:
+        with open(path) as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+def merge(snapshots):
+    """
+    Sum snapshots by metric and label values; gauges only count live processes
+    """
+    merged = {}
+    for snapshot in snapshots:
+        alive = snapshot.get('alive', True)
+        for name, metric in snapshot['metrics'].items():
+            if metric['kind'] == 'gauge' and not alive:
+                continue
+            target = merged.setdefault(name, {**metric, 'values': {}})
+            if metric['kind'] == 'histogram' and list(metric['buckets']) != list(target['buckets']):
+                continue
+            for label_values, value in metric['values']:
+                key = tuple(label_values)
+                current = target['values'].get(key)
+                if current is None:
+                    target['values'][key] = value
+                elif metric['kind'] == 'histogram':
+                    target['values'][key] = [
+                        [a + b for a, b in zip(current[0], value[0])],
+                        current[1] + value[1],
+                    ]
+                else:
+                    target['values'][key] = current + value
+    return merged
+
+
+def bury(directory, paths):
+    """
+    Add the counters and histograms of exited processes' snapshots to the tombstone and
+    delete them; skipped while another process holds the lock (the next scrape retries)
+    """
+    lock = directory / TOMBSTONE_LOCK
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        try:
+            if time.time() - lock.stat().st_mtime > LOCK_STALE_SECONDS:
+                lock.unlink()
+        except OSError:
+            pass
+        return
+    except OSError:
+        return
+    try:
+        # Re-read under the lock: another process may have buried some of them already
+        buried = [(path, _read(path)) for path in paths]
+        buried = [(path, snapshot) for path, snapshot in buried if snapshot is not None]
+        if not buried:
+            return
+        tombstone = _read(directory / TOMBSTONE) or {'pid': None, 'instance': 'tombstone', 'metrics': {}}
+        for _, snapshot in buried:
+            snapshot['alive'] = False
+        merged = merge([tombstone] + [snapshot for _, snapshot in buried])
+        metrics = {
+            name: {**metric, 'values': [[list(key), value] for key, value in metric['values'].items()]}
+            for name, metric in merged.items()
+        }
+        temporary = directory / (TOMBSTONE + '.tmp')
+        temporary.write_text(json.dumps({'pid': None, 'instance': 'tombstone', 'metrics': metrics}))
+        os.replace(temporary, directory / TOMBSTONE)
+        for path, _ in buried:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+    finally:
+        try:
+            lock.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# ==================== EXPOSITION ====================
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render(snapshots=None):
+    """
+    The merged metrics of all processes in the Prometheus text exposition format
+    """
+    merged = merge(registry.gather() if snapshots is None else snapshots)
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        labelnames = metric['labelnames']
+        for label_values, value in sorted(metric['values'].items()):
+            if metric['kind'] == 'histogram':
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(list(metric['buckets']) + [float('inf')], counts):
+                    cumulative += count
+                    le = _labels(labelnames, label_values, [('le', _number(bound))])
+                    lines.append(f'{name}_bucket{le} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labelnames, label_values)} {total!r}')
+                lines.append(f'{name}_count{_labels(labelnames, label_values)} {cumulative}')
+            else:
+                lines.append(f'{name}{_labels(labelnames, label_values)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.after_fork)
+atexit.register(registry.retire)
+
+
+# ==================== SHARED METRICS ====================
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by route pattern and status', ('method', 'route', 'status'),
+)
+HTTP_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to produce the response, by route pattern', ('method', 'route'),
+)
+DB_QUERIES = Counter('db_queries_total', 'Database queries by statement kind', ('alias', 'kind'))
+DB_LATENCY = Histogram('db_query_duration_seconds', 'Database query execution time', ('alias', 'kind'))
+
+_QUERY_KINDS = {'SELECT': 'select', 'INSERT': 'insert', 'UPDATE': 'update', 'DELETE': 'delete'}
+
+
+def _time_query(execute, sql, params, many, context):
+    """
+    execute_wrapper that counts and times every query on a connection
+    """
+    kind = _QUERY_KINDS.get(sql.lstrip()[:6].upper(), 'other')
+    alias = context['connection'].alias
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        DB_LATENCY.labels(alias, kind).observe(time.perf_counter() - started)
+        DB_QUERIES.labels(alias, kind).inc()
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """
+    connection_created receiver: install the query timer on each new database connection
+    """
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
@@ -1,12 +1,147 @@
 import logging
+import time
+
+from django.utils.cache import patch_vary_headers
+
+from . import metrics, profiling, routers
+from .compression import (
+    acompress_stream, compress, compress_stream, is_compressible, min_size, negotiate,
+)
 
 logger = logging.getLogger(__name__)
 
+# Request bodies larger than this are summarized instead of logged
+LOG_BODY_MAX_BYTES = 2048
+
+class MetricsMiddleware:
+    """
+    Count and time every request by its URL pattern (e.g. api/recipes/<int:pk>/)
+    Outermost, so the time covers the whole middleware stack; for streaming responses
+    it is the time to the first byte
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        route = match.route if match is not None else '<unmatched>'
+        metrics.HTTP_LATENCY.labels(request.method, route).observe(elapsed)
+        metrics.HTTP_REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+        return response
+
+class ProfilingMiddleware:
+    """
+    Capture a profile of a single request when an admin asks for one (cookbook.profiling),
+    and tell the background sampler which view each thread is serving
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        profiling.start_background_sampler()
+
+    def __call__(self, request):
+        try:
+            mode = profiling.requested_mode(request)
+            if mode is not None:
+                return profiling.profile_request(request, self.get_response, mode)
+            return self.get_response(request)
+        finally:
+            profiling.leave_view()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profiling.enter_view(request.resolver_match.view_name or view_func.__qualname__)
+
+class ReadReplicaMiddleware:
+    """
+    Serve GETs of the hot read views from the read-only connection (cookbook.routers) and
+    keep a caller's reads on the primary right after their own writes
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.read_from(None)
+        if request.method not in routers.SAFE_METHODS and response.status_code < 400:
+            routers.wrote(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        alias = routers.replica_for(request, request.resolver_match.view_name)
+        if alias is not None:
+            routers.read_from(alias)
+
 class RequestLoggingMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        logger.info(f"API REQUEST: {request.method} {request.path} - BODY: {getattr(request, 'body', b'').decode(errors='ignore')}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("API REQUEST: %s %s - BODY: %s", request.method, request.path, self.describe_body(request))
         response = self.get_response(request)
         return response
+
+    def describe_body(self, request):
+        """
+        Never touch multipart or large bodies: reading request.body would pull the whole
+        upload into memory before the streaming upload handlers get to see it
+        """
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if request.content_type.startswith('multipart/') or length > LOG_BODY_MAX_BYTES:
+            return f"<{request.content_type}, {length} bytes>"
+        return request.body.decode(errors='ignore')
+
+class CompressionMiddleware:
+    """
+    Negotiate brotli/gzip compression for API responses
+    Skips small bodies, non-text types and responses that are already encoded
+    (e.g. pre-compressed cached documents); streaming responses are compressed chunk by chunk
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or not is_compressible(response.get('Content-Type')):
+            return response
+        if response.status_code == 206:
+            # Byte ranges refer to the identity encoding
+            return response
+        if not response.streaming and len(response.content) < min_size():
+            return response
+        if response.streaming and int(response.get('Content-Length') or min_size()) < min_size():
+            # e.g. a small file
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            # The compressed size is unknown until the stream ends
+            del response.headers['Content-Length']
+        else:
+            compressed_content = compress(response.content, encoding)
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(response.content))
+
+        # A strong ETag no longer matches the encoded bytes
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,310 @@
+"""
+Opt-in Profiling
+Per request: an admin adds `?profile=cprofile|sample` or the `X-Profile` header to capture a
+cProfile (.prof, for pstats/snakeviz) or a sampled stack profile (.folded, collapsed stacks for
+flamegraph.pl/speedscope) of that one request. Each profile is saved in PROFILING_DIR next to a
+JSON file of tags: view, status, duration, SQL query count and time, serialization and
+rendering time.
+In the background: with PROFILING_SAMPLER_ENABLED a daemon thread samples every thread's stack
+each PROFILING_SAMPLER_INTERVAL and appends the collapsed stacks, rooted at the view the thread
+is serving, to a per-process .folded file every PROFILING_SAMPLER_FLUSH_SECONDS.
+"""
+import cProfile
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+MODES = ('cprofile', 'sample')
+
+# Tags of the request being profiled in this context, None otherwise
+_tags = contextvars.ContextVar('profile_tags', default=None)
+
+# Thread id -> view it is serving, for the background sampler's stack roots
+_thread_views = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+@contextmanager
+def span(name):
+    """
+    Add the time spent in the block to the profiled request's `<name>_ms` tag
+    Does nothing (beyond one context variable read) when no profile is being captured
+    """
+    tags = _tags.get()
+    if tags is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        key = f'{name}_ms'
+        tags[key] = tags.get(key, 0) + (time.perf_counter() - started) * 1000
+
+
+# ==================== STACK SAMPLING ====================
+
+def _frame_label(frame):
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{frame.f_globals.get('__name__', '?')}.{name}".replace(';', ':')
+
+
+def collapse(frame, root=None):
+    """
+    A stack in the collapsed format flame graph tools read: root;caller;...;leaf
+    """
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    if root:
+        labels.append(root)
+    return ';'.join(reversed(labels))
+
+
+def write_folded(path, stacks):
+    """
+    Append `stack count` lines; flame graph tools sum repeated stacks
+    """
+    with open(path, 'a') as folded:
+        for stack, count in stacks.items():
+            folded.write(f'{stack} {count}\n')
+
+
+class RequestSampler:
+    """
+    Samples one thread's stack every `interval` seconds while a request runs
+    """
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class BackgroundSampler:
+    """
+    Low-rate sampler over every thread of the process, flushed to disk periodically
+    """
+    def __init__(self, interval, flush_seconds):
+        self.interval = interval
+        self.flush_seconds = flush_seconds
+        self.stacks = Counter()
+        self._thread = threading.Thread(target=self._run, name='background-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        last_flush = time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                view = _thread_views.get(thread_id)
+                root = f'view:{view}' if view else f"thread:{names.get(thread_id, thread_id)}"
+                self.stacks[collapse(frame, root)] += 1
+            if time.monotonic() - last_flush >= self.flush_seconds:
+                self.flush()
+                last_flush = time.monotonic()
+
+    def flush(self):
+        stacks, self.stacks = self.stacks, Counter()
+        if not stacks:
+            return
+        try:
+            directory = _profile_dir()
+            write_folded(directory / f"sampler-{time.strftime('%Y%m%d')}-{os.getpid()}.folded", stacks)
+        except OSError:
+            logger.exception('Writing background profile samples failed')
+
+
+_background = None
+_background_lock = threading.Lock()
+
+
+def start_background_sampler():
+    """
+    Start this process's background sampler once, when PROFILING_SAMPLER_ENABLED is on
+    """
+    global _background
+    if not _setting('PROFILING_SAMPLER_ENABLED', False) or _background is not None:
+        return
+    with _background_lock:
+        if _background is None:
+            _background = BackgroundSampler(
+                _setting('PROFILING_SAMPLER_INTERVAL', 0.1),
+                _setting('PROFILING_SAMPLER_FLUSH_SECONDS', 60),
+            )
+            _background.start()
+
+
+def enter_view(label):
+    _thread_views[threading.get_ident()] = label
+
+
+def leave_view():
+    _thread_views.pop(threading.get_ident(), None)
+
+
+# ==================== PER-REQUEST PROFILES ====================
+
+def _profile_dir():
+    directory = Path(_setting('PROFILING_DIR', 'profiles'))
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def _is_admin(request):
+    """
+    Staff users only: JWT bearer tokens (API clients) or the session user (admin site)
+    """
+    user = None
+    if request.META.get('HTTP_AUTHORIZATION'):
+        from .authentication import LazyJWTAuthentication
+        try:
+            result = LazyJWTAuthentication().authenticate(request)
+        except Exception:
+            result = None
+        user = result[0] if result else None
+    if user is None:
+        user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and getattr(user, 'role', None) in ('admin', 'super_admin'))
+
+
+def requested_mode(request):
+    """
+    The profile an admin asked for on this request, or None
+    """
+    mode = request.headers.get('X-Profile') or request.GET.get('profile')
+    if mode not in MODES or not _is_admin(request):
+        return None
+    return mode
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def _prune(directory, keep):
+    profiles = sorted(directory.glob('*.json'), key=lambda path: path.stat().st_mtime)
+    for tags_path in profiles[:max(len(profiles) - keep, 0)]:
+        for path in directory.glob(f'{tags_path.stem}.*'):
+            path.unlink(missing_ok=True)
+
+
+def profile_request(request, get_response, mode):
+    """
+    Run the request under the profiler; returns the response with X-Profile-Id and
+    Server-Timing headers
+    """
+    tags = {}
+    token = _tags.set(tags)
+    queries = _QueryTimer()
+    profiler = sampler = None
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(queries))
+            if mode == 'cprofile':
+                profiler = cProfile.Profile()
+                profiler.enable()
+            else:
+                sampler = RequestSampler(threading.get_ident(), _setting('PROFILING_SAMPLE_INTERVAL', 0.001))
+                sampler.start()
+            try:
+                response = get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                if sampler is not None:
+                    sampler.stop()
+    finally:
+        _tags.reset(token)
+    total_ms = (time.perf_counter() - started) * 1000
+
+    match = request.resolver_match
+    view = (match.view_name or match.func.__qualname__) if match is not None else '<unmatched>'
+    tags.update({
+        'mode': mode,
+        'method': request.method,
+        'path': request.path,
+        'view': view,
+        'status': response.status_code,
+        'total_ms': round(total_ms, 3),
+        'sql_count': queries.count,
+        'sql_ms': round(queries.seconds * 1000, 3),
+        'pid': os.getpid(),
+        'captured_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    })
+    for key in ('serialize_ms', 'render_ms'):
+        tags[key] = round(tags.get(key, 0), 3)
+
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{view.replace(':', '-')}-{uuid.uuid4().hex[:6]}"
+    try:
+        directory = _profile_dir()
+        if profiler is not None:
+            profiler.dump_stats(directory / f'{profile_id}.prof')
+        else:
+            tags['samples'] = sum(sampler.stacks.values())
+            write_folded(directory / f'{profile_id}.folded', sampler.stacks)
+        (directory / f'{profile_id}.json').write_text(json.dumps(tags, indent=2))
+        _prune(directory, _setting('PROFILING_KEEP', 200))
+    except OSError:
+        logger.exception('Saving profile %s failed', profile_id)
+        return response
+
+    logger.info('profile %s saved: %s', profile_id, tags)
+    response.headers['X-Profile-Id'] = profile_id
+    response.headers['Server-Timing'] = ', '.join([
+        f'total;dur={total_ms:.1f}',
+        f'db;dur={queries.seconds * 1000:.1f};desc="{queries.count} queries"',
+        f"serialize;dur={tags['serialize_ms']:.1f}",
+        f"render;dur={tags['render_ms']:.1f}",
+    ])
+    return response
@@ -0,0 +1,64 @@
+"""
+Fast JSON rendering for API responses and WebSocket frames
+Uses orjson when it is installed and falls back to the standard library encoder
+"""
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import profiling
+
+try:
+    import orjson
+except ImportError:  # Optional speedup, stdlib json is used without it
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    """
+    Handle the types DRF knows about (datetimes, decimals, lazy strings, querysets...)
+    """
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    """
+    Encode data as compact UTF-8 JSON bytes
+    Line and paragraph separators are escaped like DRF does, so output is safe to embed in JS
+    """
+    if orjson is not None:
+        # Datetimes go through DRF's encoder too, which writes UTC as 'Z' rather than '+00:00'
+        content = orjson.dumps(data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    else:
+        content = json.dumps(
+            data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8')
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+def dumps_text(data):
+    """
+    Encode data as a JSON string (for WebSocket text frames)
+    """
+    return dumps(data).decode('utf-8')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer that encodes with orjson when available
+    Requests asking for indented output still go through DRF's own encoder
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        with profiling.span('render'):
+            if self.get_indent(accepted_media_type, renderer_context):
+                return super().render(data, accepted_media_type, renderer_context)
+            return dumps(data)
@@ -0,0 +1,132 @@
+"""
+Read Routing
+GET requests to the views in READ_REPLICA_VIEWS read through the READ_REPLICA_ALIAS
+connection: by default a second, read-only connection to the same SQLite file (opened with
+mode=ro and PRAGMA query_only), but any database holding a copy of the data will do.
+With WAL journaling on the primary, those reads never wait on a writer's lock and a writer
+never waits for them. Every write, and every read outside those views, uses 'default'.
+After a successful POST/PUT/PATCH/DELETE the same caller (bearer token or session) reads from
+the primary for READ_YOUR_WRITES_SECONDS, so a replica that lags behind cannot hide their
+own change from them; the window is kept in the default cache, so it is per process unless
+that cache is shared.
+"""
+import contextvars
+import hashlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def replica_alias():
+    """
+    The configured replica alias, or None when there is no such database
+    """
+    alias = _setting('READ_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def read_from(alias):
+    """
+    Route the ORM reads of the current request (context) to `alias`; None for the primary
+    """
+    _read_alias.set(alias)
+
+
+@contextmanager
+def reading_from(alias):
+    """
+    Route the ORM reads made inside the block to `alias`
+    """
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Reads go wherever reading_from() points them (the primary outside of it); writes,
+    migrations and everything else stay on the primary
+    """
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+# ==================== READ-YOUR-WRITES ====================
+
+def _caller_key(request):
+    """
+    Who is asking, without authenticating: the bearer token or the session cookie
+    """
+    credential = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credential:
+        return None
+    return 'read-your-writes:' + hashlib.sha256(credential.encode()).hexdigest()
+
+
+def wrote(request):
+    """
+    The caller just changed something: keep their reads on the primary for a while
+    """
+    key = _caller_key(request)
+    seconds = _setting('READ_YOUR_WRITES_SECONDS', 5)
+    if key is not None and seconds > 0:
+        cache.set(key, True, seconds)
+
+
+def recently_wrote(request):
+    key = _caller_key(request)
+    return key is not None and cache.get(key, False)
+
+
+def replica_for(request, view_name):
+    """
+    The alias to read from while serving `request`, or None for the primary
+    """
+    if request.method not in SAFE_METHODS or view_name not in _setting('READ_REPLICA_VIEWS', ()):
+        return None
+    alias = replica_alias()
+    if alias is None or recently_wrote(request):
+        return None
+    return alias
+
+
+# ==================== CONNECTION SETUP ====================
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    connection_created receiver: make replica connections refuse writes, and switch the
+    primary to WAL journaling so readers and the writer stop blocking each other
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if connection.alias == replica_alias():
+            cursor.execute('PRAGMA query_only = ON')
+        elif connection.alias == DEFAULT_DB_ALIAS and _setting('DATABASE_WAL', True):
+            # Persistent: stored in the database file, a no-op once set
+            cursor.execute('PRAGMA journal_mode = WAL')
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 
@@ -26,7 +27,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cookbook.middleware.MetricsMiddleware',
+    'cookbook.middleware.ProfilingMiddleware',
+    'cookbook.middleware.ReadReplicaMiddleware',
     'cookbook.middleware.RequestLoggingMiddleware',
+    'cookbook.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,13 +63,41 @@ TEMPLATES = [
 WSGI_APPLICATION = 'cookbook.wsgi.application'
 ASGI_APPLICATION = 'cookbook.asgi.application'
 
+# 'replica' is a read-only connection to the same file that the hot GET views read through
+# (cookbook.routers); point its NAME at a copy to move those reads off the primary entirely,
+# and move it along with 'default' in settings that relocate the database
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': (BASE_DIR / 'db.sqlite3').as_uri() + '?mode=ro',
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['cookbook.routers.ReadReplicaRouter']
+
+# Read routing (cookbook.routers): GETs to these views read from READ_REPLICA_ALIAS unless the
+# caller wrote within READ_YOUR_WRITES_SECONDS. DATABASE_WAL switches the SQLite file to WAL
+# journaling so those reads and the writer do not lock each other out
+READ_REPLICA_ALIAS = 'replica'
+READ_REPLICA_VIEWS = [
+    'homepage_data',
+    'recipe_list_create',
+    'recipe_detail',
+    'recipe_changes',
+    'recipe_browse',
+    'recipe_autocomplete',
+    'recommended_recipes',
+    'similar_recipes',
+    'public_team_members',
+]
+READ_YOUR_WRITES_SECONDS = 5
+DATABASE_WAL = True
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -88,17 +121,49 @@ USE_TZ = True
 STATIC_URL = '/static/'
 # STATICFILES_DIRS = [BASE_DIR / 'static']  # Commented out to avoid warning if directory does not exist
 
+# Responses smaller than this many bytes are not compressed (cookbook.middleware.CompressionMiddleware)
+COMPRESSION_MIN_SIZE = 512
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored once per content digest (deduplicated, reference counted) so media
+# URLs can be cached as immutable; run `manage.py gc_media` to unlink unreferenced blobs
+STORAGES = {
+    'default': {
+        'BACKEND': 'cookbook.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Uploads to the image endpoints are streamed to temp files by BoundedImageUploadHandler
+# (cookbook.uploadhandlers.image_uploads), which enforces these limits per URL name (falling
+# back to 'default') while the request body is being read
+UPLOAD_LIMITS = {
+    'default': {'max_bytes': 5 * 1024 * 1024, 'max_pixels': 25_000_000},
+    'update_homepage': {'max_bytes': 10 * 1024 * 1024, 'max_pixels': 40_000_000},
+}
+
+# Set to 'X-Accel-Redirect' (nginx) or 'X-Sendfile' (Apache) to let the front web server
+# send media files; with X-Accel-Redirect files are addressed under MEDIA_SENDFILE_PREFIX
+MEDIA_SENDFILE_HEADER = None
+MEDIA_SENDFILE_PREFIX = '/protected-media/'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # IMPORTANT: Custom user model
 AUTH_USER_MODEL = 'recipes.User'
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'cookbook.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # simplejwt's JWTAuthentication, imported on the first request with a token
+        'cookbook.authentication.LazyJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -112,9 +177,141 @@ SIMPLE_JWT = {
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_EXPOSE_HEADERS = ['X-Changes-Cursor', 'X-Profile-Id', 'Server-Timing']
 
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        # Stock in-memory layer with a throttled expiry sweep (see cookbook.layers)
+        'BACKEND': 'cookbook.layers.ThrottledInMemoryChannelLayer',
+    },
+}
+
+# WebSocket connection management (recipes.consumers): application-level ping every
+# WS_HEARTBEAT_SECONDS, sockets silent for WS_HEARTBEAT_TIMEOUT are closed. At most
+# WS_SEND_WINDOW_BYTES go out before the client's pongs confirm it read them; frames held
+# back wait in a queue of WS_SEND_QUEUE_SIZE. When it is full the client is closed ('close')
+# or loses its oldest frames ('drop_oldest'), and a frame held for WS_SEND_TIMEOUT closes it
+WS_HEARTBEAT_SECONDS = 25
+WS_HEARTBEAT_TIMEOUT = 60
+WS_SEND_WINDOW_BYTES = 256 * 1024
+WS_SEND_QUEUE_SIZE = 64
+WS_SEND_TIMEOUT = 10
+WS_SLOW_CONSUMER_POLICY = 'close'
+
+# Reconnecting clients replay missed broadcasts from the last WS_REPLAY_BUFFER_SIZE kept in
+# memory (or from outbox rows kept for OUTBOX_RETENTION); gaps longer than
+# WS_REPLAY_MAX_EVENTS get a "resync" instead
+WS_REPLAY_BUFFER_SIZE = 1000
+WS_REPLAY_MAX_EVENTS = 50
+
+# Bayesian ranking for the homepage leaderboard: every recipe starts as if it had
+# LEADERBOARD_PRIOR_WEIGHT ratings of LEADERBOARD_PRIOR_MEAN stars
+LEADERBOARD_PRIOR_MEAN = 3.0
+LEADERBOARD_PRIOR_WEIGHT = 5
+
+# Item-item recommendations (recipes.recommendations): top RECOMMENDATIONS_NEIGHBORS similar
+# recipes are kept per recipe; similarities backed by few common raters are shrunk by
+# n / (n + RECOMMENDATIONS_SHRINKAGE). Ratings mark lists stale and are folded into one refresh
+# job per RECOMMENDATIONS_REFRESH_DELAY; a user's RECOMMENDATIONS_SEEDS latest ratings seed lookups
+RECOMMENDATIONS_NEIGHBORS = 20
+RECOMMENDATIONS_SHRINKAGE = 10
+RECOMMENDATIONS_REFRESH_DELAY = timedelta(minutes=1)
+RECOMMENDATIONS_SEEDS = 50
+
+# Similar recipes (recipes.similar): MinHash signatures of SIMILAR_MINHASH_PERMUTATIONS slots
+# split into SIMILAR_LSH_BANDS buckets (fewer rows per band find weaker matches); at most
+# SIMILAR_MAX_CANDIDATES bucket matches are scored, by SIMILAR_INGREDIENT_WEIGHT x ingredient
+# Jaccard + the rest x title/description TF-IDF cosine. Run build_similarity_index after changing
+SIMILAR_MINHASH_PERMUTATIONS = 64
+SIMILAR_LSH_BANDS = 32
+SIMILAR_MAX_CANDIDATES = 100
+SIMILAR_INGREDIENT_WEIGHT = 0.6
+
+# Type-ahead (recipes.autocomplete): each server process builds an in-memory prefix index at
+# startup, picks up other processes' changes from the change log every AUTOCOMPLETE_SYNC_SECONDS
+# and drops its least popular entries beyond AUTOCOMPLETE_MAX_ITEMS suggestions
+AUTOCOMPLETE_WARM_ON_START = True
+AUTOCOMPLETE_SYNC_SECONDS = 2
+AUTOCOMPLETE_MAX_ITEMS = 100_000
+AUTOCOMPLETE_RESULT_CACHE_SIZE = 4096
+
+# Moderation queue (recipes.moderation): a moderator's claim on a pending recipe lapses
+# after MODERATION_CLAIM_SECONDS unless renewed
+MODERATION_CLAIM_SECONDS = 300
+
+# Faceted browse (recipes.facets): per-process bitmaps of approved recipes per facet value,
+# synced like the type-ahead index; author and ingredient facets list their
+# FACETS_TOP_VALUES most frequent values
+FACETS_WARM_ON_START = True
+FACETS_SYNC_SECONDS = 2
+FACETS_TOP_VALUES = 20
+
+# Pre-rendered public documents (recipes.snapshots): the guest homepage, recipe list and team
+# page are rebuilt in SNAPSHOTS_DIR SNAPSHOTS_DELAY_SECONDS after a change and served from there,
+# for the SNAPSHOTS_ORIGINS listed (scheme://host[:port] as clients request it; others render
+# live). Several server processes need a shared 'recipes' cache below, or they keep rendering live
+SNAPSHOTS_ENABLED = True
+SNAPSHOTS_DIR = Path(tempfile.gettempdir()) / 'cookbook-snapshots'
+SNAPSHOTS_DELAY_SECONDS = 1
+SNAPSHOTS_ORIGINS = ['http://localhost:8000', 'http://127.0.0.1:8000']
+
+# Retention (recipes.retention, `manage.py archive_stale`): recipes declined RETENTION_DECLINED_DAYS
+# ago move to the archive table and ratings older than RETENTION_RATINGS_DAYS are folded into
+# per-recipe tallies, RETENTION_CHUNK_SIZE rows per transaction; 0 days turns either off
+RETENTION_DECLINED_DAYS = 90
+RETENTION_RATINGS_DAYS = 730
+RETENTION_CHUNK_SIZE = 500
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Serialized recipe representations (recipes.cache). LocMemCache evicts least recently
+    # used entries past MAX_ENTRIES; for several worker processes switch to a shared backend
+    # such as 'django.core.cache.backends.filebased.FileBasedCache' with a LOCATION directory
+    # or 'django.core.cache.backends.db.DatabaseCache' (run `manage.py createcachetable`).
+    'recipes': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recipes',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
     },
 }
+
+# Transactional outbox (recipes.outbox): side effects are drained after commit by a task on
+# the ASGI event loop, or by `manage.py dispatch_outbox` when OUTBOX_DISPATCH_IN_PROCESS is off
+OUTBOX_DISPATCH_IN_PROCESS = True
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_POLL_SECONDS = 5
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETENTION = timedelta(days=1)
+
+# Database-backed job queue (recipes.jobs). With JOBS_RUN_IN_PROCESS the ASGI server runs
+# jobs one at a time on its event loop; turn it off when running `manage.py run_jobs` workers
+JOBS_RUN_IN_PROCESS = True
+JOBS_RETRY_BASE_SECONDS = 5
+JOBS_LEASE_SECONDS = 300
+JOBS_RETENTION = timedelta(days=7)
+JOBS_POLL_SECONDS = 5
+
+# Unreferenced media blobs are unlinked this long after their last reference goes away
+MEDIA_GC_GRACE = timedelta(minutes=10)
+
+# Prometheus-style metrics (cookbook.metrics) served at /metrics to METRICS_ALLOWED_IPS
+# (None allows everyone). Each process writes its values to METRICS_DIR every
+# METRICS_FLUSH_SECONDS so the endpoint reports all workers; exited processes' totals are
+# folded into a tombstone file there
+METRICS_DIR = Path(tempfile.gettempdir()) / 'cookbook-metrics'
+METRICS_FLUSH_SECONDS = 5
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Profiling (cookbook.profiling): admins add ?profile=cprofile|sample or an X-Profile header to
+# save a profile of that request; the background sampler is off unless enabled explicitly
+PROFILING_DIR = Path(tempfile.gettempdir()) / 'cookbook-profiles'
+PROFILING_KEEP = 200
+PROFILING_SAMPLE_INTERVAL = 0.001
+PROFILING_SAMPLER_ENABLED = os.environ.get('PROFILING_SAMPLER_ENABLED') == '1'
+PROFILING_SAMPLER_INTERVAL = 0.1
+PROFILING_SAMPLER_FLUSH_SECONDS = 60
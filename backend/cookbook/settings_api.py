@@ -0,0 +1,49 @@
+"""
+API-only Settings Profile
+For worker processes that serve only the REST API (e.g. gunicorn cookbook.wsgi) while
+WebSockets, the admin and static files are served by the full Daphne process. Drops the
+apps and middleware those need, which shortens process start-up and every request.
+Broadcasts still go through the outbox table and are delivered by the Daphne process.
+Usage: DJANGO_SETTINGS_MODULE=cookbook.settings_api
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+# daphne installs the Twisted reactor on import (the largest single start-up cost);
+# simplejwt needs no app entry since it has no models
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS
+    if app not in {
+        'daphne',
+        'channels',
+        'django.contrib.admin',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+        'rest_framework_simplejwt',
+    }
+]
+
+# The API authenticates with JWT only: no sessions, CSRF cookies, messages or frames
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware not in {
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    }
+]
+
+ROOT_URLCONF = 'cookbook.urls_api'
+
+# JSON only; the browsable API pulls in templates and the staticfiles app
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ('cookbook.renderers.FastJSONRenderer',),
+}
+
+# Side effects are handled by the full server process (or run_jobs / dispatch_outbox)
+JOBS_RUN_IN_PROCESS = False
+OUTBOX_DISPATCH_IN_PROCESS = False
@@ -0,0 +1,169 @@
+"""
+Media storage backends
+ContentAddressedStorage stores every upload once under its SHA-256 digest and reference
+counts it, so identical images share one file and a changed image always gets a new URL
+(media responses for digest names can be cached forever)
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+BLOB_DIR = 'blobs'
+INCOMING_DIR = '.incoming'
+
+# blobs/ab/<sha256>.ext written by ContentAddressedStorage, or stem.<12 hex>[_suffix].ext
+# written by the earlier hashed-name storage
+HASHED_NAME_RE = re.compile(
+    r'(^|/)[0-9a-f]{64}\.[A-Za-z0-9]+$|\.[0-9a-f]{12}(_[A-Za-z0-9]{7})?\.[A-Za-z0-9]+$'
+)
+
+
+def is_hashed_name(name):
+    """
+    True when the file name carries a content digest (safe to mark immutable)
+    """
+    return bool(HASHED_NAME_RE.search(name))
+
+
+def is_blob_name(name):
+    return name.startswith(BLOB_DIR + '/')
+
+
+def blob_name(digest, ext):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest}{ext.lower()}'
+
+
+def _media_blob_model():
+    # Resolved lazily: storages are instantiated before the app registry is ready
+    return apps.get_model('recipes', 'MediaBlob')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that deduplicates uploads by content
+    - save() hashes the upload while streaming it to a temp file, then either moves it
+      into blobs/ab/<digest>.ext or, when that blob already exists, just bumps its refcount
+    - delete() of a blob is a refcount decrement; unreferenced blobs are unlinked later by
+      `manage.py gc_media`, off the request path
+    - names outside blobs/ (files uploaded before this storage) behave as plain files
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1]
+        incoming = self.path(f'{BLOB_DIR}/{INCOMING_DIR}')
+        os.makedirs(incoming, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'temporary_file_path'):
+            # Already spooled to disk by the upload handler: hash it and move it, no copy
+            source = content.temporary_file_path()
+            for chunk in content.chunks():
+                digest.update(chunk)
+                size += len(chunk)
+            owned = False
+        else:
+            with tempfile.NamedTemporaryFile(dir=incoming, delete=False) as temp:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    size += len(chunk)
+                    temp.write(chunk)
+            source = temp.name
+            owned = True
+
+        name = blob_name(digest.hexdigest(), ext)
+        if self._acquire(name, digest.hexdigest(), size, source):
+            return name
+        if owned:
+            os.unlink(source)
+        return name
+
+    def _acquire(self, name, digest, size, source):
+        """
+        Reference an existing blob or install `source` as a new one
+        Returns True when the source file was moved into place
+        """
+        MediaBlob = _media_blob_model()
+        while True:
+            with transaction.atomic():
+                if MediaBlob.objects.filter(name=name).update(
+                    refcount=F('refcount') + 1, updated_at=timezone.now()
+                ):
+                    if os.path.exists(self.path(name)):
+                        return False
+                    # Row survived but the file is gone: reinstall it from this upload
+                    self._install(source, name)
+                    return True
+                try:
+                    with transaction.atomic():
+                        MediaBlob.objects.create(name=name, digest=digest, size=size, refcount=1)
+                except IntegrityError:
+                    # Another upload of the same content won the race; reference it instead
+                    continue
+                self._install(source, name)
+                return True
+
+    def _install(self, source, name):
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        file_move_safe(source, full_path, allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+
+    def exists(self, name):
+        if is_blob_name(name):
+            return _media_blob_model().objects.filter(name=name, refcount__gt=0).exists()
+        return super().exists(name)
+
+    def delete(self, name):
+        """
+        Drop one reference to a blob (the file stays until gc_media), or unlink a legacy file
+        """
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        if is_blob_name(name):
+            _media_blob_model().objects.filter(name=name, refcount__gt=0).update(
+                refcount=F('refcount') - 1, updated_at=timezone.now()
+            )
+            return
+        super().delete(name)
+
+    def collect(self, name):
+        """
+        Unlink an unreferenced blob; the row is removed in the same transaction so a
+        concurrent upload of the same content either revives it first or waits and re-adds it
+        Returns the number of bytes reclaimed
+        """
+        MediaBlob = _media_blob_model()
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name, refcount=0).first()
+            if blob is None:
+                return 0
+            blob.delete()
+            super().delete(name)
+            return blob.size
+
+    def adopt(self, name):
+        """
+        Move a legacy (pre-content-addressing) file into blob storage
+        Returns the new blob name; the legacy file is removed
+        """
+        with self.open(name) as legacy:
+            new_name = self.save(name, File(legacy, name))
+        super().delete(name)
+        return new_name
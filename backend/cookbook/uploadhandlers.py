@@ -0,0 +1,188 @@
+"""
+Bounded image upload handling
+Streams uploads to a temp file in chunks while enforcing per-endpoint byte and pixel limits,
+and sniffs the image format from its magic bytes so oversized files and decompression bombs
+are rejected before Pillow or the rest of the request ever see them. Only the image
+endpoints use it (@image_uploads); other uploads keep Django's default handlers
+"""
+import functools
+import struct
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Give up on finding the image dimensions after this many bytes
+SNIFF_LIMIT = 256 * 1024
+
+# Multipart boundaries and headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+DEFAULT_UPLOAD_LIMITS = {
+    'max_bytes': 5 * 1024 * 1024,
+    'max_pixels': 25_000_000,
+}
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Uploaded file is too large.'
+    default_code = 'upload_too_large'
+
+
+class UnsupportedImage(APIException):
+    status_code = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    default_detail = 'Uploaded file is not a supported image (JPEG, PNG, GIF or WebP).'
+    default_code = 'unsupported_image'
+
+
+def _jpeg_size(data):
+    pos = 2
+    while True:
+        # Skip to the next marker (0xFF, possibly padded with more 0xFF bytes)
+        while pos < len(data) and data[pos] != 0xFF:
+            pos += 1
+        while pos < len(data) and data[pos] == 0xFF:
+            pos += 1
+        if pos >= len(data):
+            return None
+        marker = data[pos]
+        pos += 1
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker == 0xD9:
+            raise ValueError('JPEG ended before a frame header')
+        if pos + 2 > len(data):
+            return None
+        length = struct.unpack('>H', data[pos:pos + 2])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if pos + 7 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[pos + 3:pos + 7])
+            return width, height
+        pos += length
+
+
+def _webp_size(data):
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        b0, b1, b2, b3 = data[21:25]
+        width = 1 + (((b1 & 0x3F) << 8) | b0)
+        height = 1 + (((b3 & 0x0F) << 10) | (b2 << 2) | ((b1 & 0xC0) >> 6))
+        return width, height
+    if chunk == b'VP8X':
+        width = 1 + int.from_bytes(data[24:27], 'little')
+        height = 1 + int.from_bytes(data[27:30], 'little')
+        return width, height
+    raise ValueError('Unknown WebP chunk')
+
+
+def sniff_image(header):
+    """
+    Identify an image from its first bytes
+    Returns (format, width, height), None when more bytes are needed, and raises
+    ValueError when the data is not a supported image
+    """
+    if header.startswith(b'\xff\xd8\xff'):
+        size = _jpeg_size(header)
+        return ('JPEG',) + size if size else None
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        if len(header) < 24:
+            return None
+        width, height = struct.unpack('>II', header[16:24])
+        return 'PNG', width, height
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        if len(header) < 10:
+            return None
+        width, height = struct.unpack('<HH', header[6:10])
+        return 'GIF', width, height
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        size = _webp_size(header)
+        return ('WEBP',) + size if size else None
+    if len(header) < 12:
+        # Too short to rule anything out yet
+        return None
+    raise ValueError('Unrecognized image format')
+
+
+def upload_limits(request):
+    """
+    Limits for the endpoint handling this request: UPLOAD_LIMITS[url_name] over UPLOAD_LIMITS['default']
+    """
+    configured = getattr(settings, 'UPLOAD_LIMITS', {})
+    limits = dict(DEFAULT_UPLOAD_LIMITS)
+    limits.update(configured.get('default', {}))
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and match.url_name in configured:
+        limits.update(configured[match.url_name])
+    return limits
+
+
+class BoundedImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Temp-file upload handler that rejects oversized uploads up front (Content-Length)
+    or mid-stream, and non-images or too many pixels as soon as the header is read
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.limits = upload_limits(self.request)
+        if content_length and content_length > self.limits['max_bytes'] + MULTIPART_OVERHEAD:
+            raise UploadTooLarge()
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if not hasattr(self, 'limits'):
+            self.limits = upload_limits(self.request)
+        self.header = b''
+        self.image_info = None
+        self.received = 0
+
+    def _reject(self, exc):
+        self.file.close()
+        raise exc
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.limits['max_bytes']:
+            self._reject(UploadTooLarge())
+
+        if self.image_info is None:
+            self.header += raw_data[:SNIFF_LIMIT - len(self.header)]
+            try:
+                self.image_info = sniff_image(self.header)
+            except (ValueError, struct.error):
+                self._reject(UnsupportedImage())
+            if self.image_info is None and len(self.header) >= SNIFF_LIMIT:
+                self._reject(UnsupportedImage())
+            if self.image_info is not None:
+                _, width, height = self.image_info
+                if width * height > self.limits['max_pixels']:
+                    self._reject(UploadTooLarge(f'Image is too large ({width}x{height} pixels).'))
+                self.header = b''
+
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.image_info is None:
+            # Stream ended before the image header was complete
+            self._reject(UnsupportedImage())
+        return super().file_complete(file_size)
+
+
+def image_uploads(view):
+    """
+    Stream the view's uploads through BoundedImageUploadHandler
+    Goes outside @api_view (or on dispatch), so it runs before DRF parses the body
+    """
+    @functools.wraps(view)
+    def wrapped(request, *args, **kwargs):
+        request.upload_handlers = [BoundedImageUploadHandler(request)]
+        return view(request, *args, **kwargs)
+    return wrapped
@@ -1,11 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
-from . import views
+from . import media, views
 
 urlpatterns = [
     path('', views.root, name='root'),
     path('admin/', admin.site.urls),
     path('api/', include('recipes.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('metrics', views.metrics, name='metrics'),
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", media.serve, name='media'),
+]
@@ -0,0 +1,14 @@
+"""
+URL Configuration for the API-only profile (cookbook.settings_api)
+Same routes as cookbook.urls without the admin site
+"""
+from django.urls import path, include
+from django.conf import settings
+from . import media, views
+
+urlpatterns = [
+    path('', views.root, name='root'),
+    path('api/', include('recipes.urls')),
+    path('metrics', views.metrics, name='metrics'),
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", media.serve, name='media'),
+]
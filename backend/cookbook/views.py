@@ -1,4 +1,17 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from . import metrics as metrics_registry
 
 def root(request):
     return HttpResponse("Ninang Rhobby's Cookbook API Root")
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint: merged metrics of every worker process
+    Limited to METRICS_ALLOWED_IPS since scrapers do not carry user tokens
+    """
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', None)
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics_registry.render(), content_type=metrics_registry.CONTENT_TYPE)
@@ -3,3 +3,8 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cookbook.settings')
 application = get_wsgi_application()
+
+# Build the type-ahead and facet indexes in the background while the first requests arrive
+from recipes import autocomplete, facets  # noqa: E402
+autocomplete.warm()
+facets.warm()
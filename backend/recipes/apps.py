@@ -0,0 +1,19 @@
+from django.apps import AppConfig
+
+
+class RecipesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'recipes'
+
+    def ready(self):
+        # Connect model signal handlers (leaderboard and cache maintenance)
+        from . import signals  # noqa: F401
+        # Register deferred jobs with the job queue
+        from . import tasks  # noqa: F401
+        # Count and time every database query for /metrics
+        from django.db.backends.signals import connection_created
+        from cookbook import metrics
+        connection_created.connect(metrics.instrument_connection)
+        # Read-only replica connections and WAL journaling on the primary
+        from cookbook import routers
+        connection_created.connect(routers.configure_connection)
@@ -0,0 +1,403 @@
+"""
+Type-ahead Suggestions for Recipe Titles and Ingredients
+Each process keeps an in-memory prefix index over approved recipe titles and their normalized
+ingredient names: one sorted array of (key, item) pairs, where every word of a title or
+ingredient starts a key, so "ado" finds "Chicken Adobo". A lookup bisects to the first key
+with the prefix and walks the run of matching keys; no query reaches the database.
+Suggestions are ranked by popularity: a recipe weighs 1 + its rating count, an ingredient the
+sum of the weights of the recipes using it.
+
+The index is built when the server starts (or on first use), updated in place for recipes
+saved, rated or deleted in this process, and catches up with other processes by reading the
+recipe change log (recipes.changes) every AUTOCOMPLETE_SYNC_SECONDS. At AUTOCOMPLETE_MAX_ITEMS
+it drops its least popular tenth.
+"""
+import bisect
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from . import changes
+from .models import Recipe
+from .similar import normalize_ingredient
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r'[^\W_]+')
+
+# Keys keep this many characters: longer prefixes are matched on their start only, which
+# bounds memory per key without changing suggestions in practice
+KEY_LENGTH = 40
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def normalize(text):
+    """
+    Lowercase words separated by single spaces: the form keys and prefixes are compared in
+    """
+    return ' '.join(_WORD.findall(text.lower()))
+
+
+def _keys(text):
+    """
+    The text from each of its words on: "chicken adobo" -> "chicken adobo", "adobo"
+    """
+    words = normalize(text).split()
+    return [' '.join(words[start:])[:KEY_LENGTH] for start in range(len(words))]
+
+
+class PrefixIndex:
+    """
+    Suggestions in a sorted array of (key, item) pairs, searched with bisect; not thread-safe
+    on its own (the module functions hold one lock around every use)
+    The array is cut into blocks of about BLOCK pairs that remember their heaviest item, so a
+    short prefix matching thousands of keys only scans the blocks that can still beat the
+    best `limit` suggestions found so far, and an insert shifts one block instead of the
+    whole array
+    """
+    BLOCK = 32
+
+    def __init__(self):
+        self.blocks = []        # Consecutive runs of the sorted (key, item) pairs
+        self.firsts = []        # First pair of each block, for bisect
+        self.maxes = []         # Heaviest item weight in each block
+        self.items = {}         # item -> [label, kind, recipe id or None, weight]
+        self.recipes = {}       # recipe id -> (title item, ingredient items, weight)
+        self.ingredients = {}   # ingredient item -> number of recipes using it
+        self._results = {}      # (prefix, limit) -> suggestions, cleared by every change
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def key_count(self):
+        return sum(map(len, self.blocks))
+
+    # ---- Blocked sorted array ----
+
+    def _weight(self, pair):
+        return self.items[pair[1]][3]
+
+    def _locate(self, pair):
+        return max(bisect.bisect_right(self.firsts, pair) - 1, 0)
+
+    def _refresh(self, position):
+        block = self.blocks[position]
+        self.firsts[position] = block[0]
+        self.maxes[position] = max(map(self._weight, block))
+
+    def _insert(self, pair):
+        if not self.blocks:
+            self.blocks, self.firsts, self.maxes = [[pair]], [pair], [self._weight(pair)]
+            return
+        position = self._locate(pair)
+        block = self.blocks[position]
+        bisect.insort(block, pair)
+        self.firsts[position] = block[0]
+        self.maxes[position] = max(self.maxes[position], self._weight(pair))
+        if len(block) > 2 * self.BLOCK:
+            half = len(block) // 2
+            self.blocks[position:position + 1] = [block[:half], block[half:]]
+            self.firsts[position:position + 1] = [None, None]
+            self.maxes[position:position + 1] = [0, 0]
+            self._refresh(position)
+            self._refresh(position + 1)
+
+    def _discard(self, pair):
+        if not self.blocks:
+            return
+        position = self._locate(pair)
+        block = self.blocks[position]
+        index = bisect.bisect_left(block, pair)
+        if index < len(block) and block[index] == pair:
+            del block[index]
+            if not block:
+                del self.blocks[position], self.firsts[position], self.maxes[position]
+            else:
+                self._refresh(position)
+
+    def _bulk_load(self, pairs):
+        pairs.sort()
+        self.blocks = [pairs[start:start + self.BLOCK] for start in range(0, len(pairs), self.BLOCK)]
+        self.firsts = [block[0] for block in self.blocks]
+        self.maxes = [max(map(self._weight, block)) for block in self.blocks]
+
+    # ---- Items ----
+
+    def _add_item(self, item, label, kind, recipe_id, weight, pairs=None):
+        self.items[item] = [label, kind, recipe_id, weight]
+        for key in _keys(label):
+            if pairs is not None:
+                pairs.append((key, item))
+            else:
+                self._insert((key, item))
+
+    def _remove_item(self, item):
+        label = self.items[item][0]
+        for key in _keys(label):
+            self._discard((key, item))
+        del self.items[item]
+
+    def _reweigh(self, item, weight):
+        entry = self.items[item]
+        old, entry[3] = entry[3], weight
+        for key in _keys(entry[0]):
+            position = self._locate((key, item))
+            if weight > self.maxes[position]:
+                self.maxes[position] = weight
+            elif old == self.maxes[position] and weight < old:
+                self._refresh(position)
+
+    # ---- Recipes ----
+
+    def add_recipe(self, recipe_id, title, ingredients, weight, pairs=None):
+        """
+        Index a recipe; load() passes `pairs` to collect the keys and sort them once
+        """
+        self.remove_recipe(recipe_id)
+        title_item = f'r:{recipe_id}'
+        self._add_item(title_item, title, 'recipe', recipe_id, weight, pairs)
+        names = {name for name in map(normalize_ingredient, map(str, ingredients or [])) if name}
+        ingredient_items = []
+        for name in names:
+            item = f'i:{name}'
+            self.ingredients[item] = self.ingredients.get(item, 0) + 1
+            if item not in self.items:
+                self._add_item(item, name, 'ingredient', None, weight, pairs)
+            elif pairs is not None:
+                self.items[item][3] += weight
+            else:
+                self._reweigh(item, self.items[item][3] + weight)
+            ingredient_items.append(item)
+        self.recipes[recipe_id] = (title_item, ingredient_items, weight)
+        self._results.clear()
+
+    def load(self, rows):
+        """
+        Index (recipe id, title, ingredients, weight) rows with one sort at the end
+        """
+        pairs = []
+        for recipe_id, title, ingredients, weight in rows:
+            self.add_recipe(recipe_id, title, ingredients, weight, pairs)
+        self._bulk_load(pairs)
+
+    def remove_recipe(self, recipe_id):
+        indexed = self.recipes.pop(recipe_id, None)
+        if indexed is None:
+            return
+        title_item, ingredient_items, weight = indexed
+        self._remove_item(title_item)
+        for item in ingredient_items:
+            self.ingredients[item] -= 1
+            if self.ingredients[item]:
+                self._reweigh(item, self.items[item][3] - weight)
+            else:
+                del self.ingredients[item]
+                self._remove_item(item)
+        self._results.clear()
+
+    def trim(self, fraction=0.1):
+        """
+        Drop the least popular recipes (and ingredients only they use)
+        """
+        count = max(int(len(self.recipes) * fraction), 1)
+        for recipe_id in heapq.nsmallest(count, self.recipes, key=lambda recipe_id: self.recipes[recipe_id][2]):
+            self.remove_recipe(recipe_id)
+
+    # ---- Lookup ----
+
+    def search(self, prefix, limit):
+        """
+        Most popular suggestions with a word starting with `prefix`
+        """
+        prefix = normalize(prefix)[:KEY_LENGTH]
+        if not prefix or not self.blocks:
+            return []
+        cached = self._results.get((prefix, limit))
+        if cached is not None:
+            return cached
+        items = self.items
+        first = self._locate((prefix,))
+        last = self._locate((prefix + '\U0010ffff',))
+        found = set()
+        top = []  # Min-heap of the `limit` heaviest (weight, item) found so far
+
+        def scan(block):
+            start = bisect.bisect_left(block, (prefix,))
+            for key, item in block[start:]:
+                if not key.startswith(prefix):
+                    break
+                if item not in found:
+                    found.add(item)
+                    if len(top) < limit:
+                        heapq.heappush(top, (items[item][3], item))
+                    else:
+                        heapq.heappushpop(top, (items[item][3], item))
+
+        # Heaviest blocks first; stop at the first that cannot beat the current top `limit`
+        # (items tied with the weakest of them may come in either order)
+        candidates = [(-self.maxes[position], position) for position in range(first, last + 1)]
+        heapq.heapify(candidates)
+        while candidates:
+            weight, position = heapq.heappop(candidates)
+            if len(top) == limit and -weight <= top[0][0]:
+                break
+            scan(self.blocks[position])
+        best = heapq.nsmallest(limit, found, key=lambda item: (-items[item][3], items[item][0]))
+        results = [
+            {'label': items[item][0], 'kind': items[item][1], 'recipe_id': items[item][2]}
+            for item in best
+        ]
+        if len(self._results) >= _setting('AUTOCOMPLETE_RESULT_CACHE_SIZE', 4096):
+            self._results.clear()
+        self._results[(prefix, limit)] = results
+        return results
+
+
+_index = None
+_cursor = 0
+_synced_at = 0.0
+_pending = set()
+_lock = threading.Lock()
+
+
+def _rows(recipe_ids=None):
+    """
+    Yield (recipe id, title, ingredients, weight) of approved recipes
+    """
+    queryset = Recipe.objects.filter(status='approved')
+    if recipe_ids is not None:
+        queryset = queryset.filter(id__in=list(recipe_ids))
+    for recipe_id, title, ingredients, rating_count in queryset.values_list(
+        'id', 'title', 'ingredients', 'leaderboard__rating_count'
+    ).iterator():
+        yield recipe_id, title, ingredients, 1 + (rating_count or 0)
+
+
+def _bound(index):
+    while len(index) > _setting('AUTOCOMPLETE_MAX_ITEMS', 100_000):
+        index.trim()
+
+
+def build():
+    """
+    (Re)build this process's index from the database
+    """
+    global _index, _cursor, _synced_at
+    started = time.perf_counter()
+    index = PrefixIndex()
+    cursor = changes.latest_cursor()
+    index.load(_rows())
+    _bound(index)
+    with _lock:
+        # Changes recorded while loading are re-read from the change log on the next sync
+        _index, _cursor, _synced_at = index, cursor, 0.0
+    logger.info('Autocomplete index built: %d suggestions in %.2fs', len(index), time.perf_counter() - started)
+    return index
+
+
+_build_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+
+def _ensure():
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                build()
+    return _index
+
+
+def _sync(index):
+    """
+    Re-read recipes changed in this process, and every AUTOCOMPLETE_SYNC_SECONDS those changed
+    by other processes according to the change log
+    The database is read without the lock, which is only taken to apply the rows, so lookups
+    never wait on a query; one thread syncs at a time and the others search the index as it is
+    """
+    global _cursor, _synced_at
+    if not _sync_lock.acquire(blocking=False):
+        return
+    try:
+        with _lock:
+            recipe_ids = set(_pending)
+            _pending.difference_update(recipe_ids)
+            cursor = _cursor
+            due = time.monotonic() - _synced_at >= _setting('AUTOCOMPLETE_SYNC_SECONDS', 2)
+            if due:
+                _synced_at = time.monotonic()
+        if due:
+            changed, cursor = changes.drain(cursor)
+            recipe_ids.update(changed)
+        if not recipe_ids:
+            return
+        rows = list(_rows(recipe_ids))
+        with _lock:
+            if _index is not index:
+                # Rebuilt meanwhile: keep the recipes touched here for the new index
+                _pending.update(recipe_ids)
+                return
+            _cursor = cursor
+            seen = set()
+            for recipe_id, title, ingredients, weight in rows:
+                index.add_recipe(recipe_id, title, ingredients, weight)
+                seen.add(recipe_id)
+            for recipe_id in recipe_ids - seen:
+                index.remove_recipe(recipe_id)
+            _bound(index)
+    finally:
+        _sync_lock.release()
+
+
+def suggest(prefix, limit=10):
+    """
+    Return up to `limit` suggestions [{'label', 'kind', 'recipe_id'}] for a typed prefix
+    """
+    index = _ensure()
+    _sync(index)
+    with _lock:
+        return index.search(prefix, limit)
+
+
+def touch(recipe_id):
+    """
+    A recipe was saved, rated or deleted in this process: re-read it on the next lookup
+    """
+    if _index is not None:
+        _pending.add(recipe_id)
+
+
+def warm():
+    """
+    Build the index in the background when a server process starts
+    """
+    if _setting('AUTOCOMPLETE_WARM_ON_START', True):
+        threading.Thread(target=_warm, name='autocomplete-warm', daemon=True).start()
+
+
+def _warm():
+    try:
+        _ensure()
+    except Exception:
+        logger.exception('Building the autocomplete index failed')
+
+
+def _after_fork():
+    # A forked worker rebuilds on first use rather than trusting a copy taken mid-update
+    global _index, _lock, _build_lock, _sync_lock
+    _index = None
+    _lock = threading.Lock()
+    _build_lock = threading.Lock()
+    _sync_lock = threading.Lock()
+    _pending.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,221 @@
+"""
+Read-through cache for serialized recipes
+Stores DRF representations per recipe id so hot recipes skip the ORM and re-serialization:
+the full detail, the homepage card and the moderation card. Every variant of a recipe is keyed
+by the same version token, so one invalidation retires them all.
+Entries are versioned: every recipe has a version token and writers replace the token
+instead of deleting entries, so a reader that raced a writer can only fill an orphaned key.
+The backend is whatever CACHES['recipes'] points at (locmem LRU by default, file/database
+caches for multi-process deployments), and MAX_ENTRIES caps its size.
+"""
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+
+from cookbook import metrics, profiling
+from .models import Recipe
+from .serializers import ModerationCardSerializer, RecipeCardSerializer, RecipeSerializer
+
+CACHE_ALIAS = 'recipes'
+GENERATION_KEY = 'recipes:generation'
+CATALOGUE_KEY = 'recipes:catalogue'
+
+LOOKUPS = metrics.Counter('recipe_cache_lookups_total', 'Recipe cache reads by result', ('kind', 'result'))
+
+# Representations that can be cached, keyed by variant name
+SERIALIZERS = {
+    'detail': RecipeSerializer,
+    'card': RecipeCardSerializer,
+    'moderation': ModerationCardSerializer,
+}
+
+# Relations a variant reads, prefetched for the misses
+PREFETCH = {
+    'detail': ('ratings__user', 'rating_tally'),
+    'card': ('ratings', 'rating_tally'),
+    'moderation': (),
+}
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(recipe_id):
+    return f'recipes:version:{recipe_id}'
+
+
+def _new_token():
+    return uuid.uuid4().hex[:12]
+
+
+def _tokens(cache, recipe_ids):
+    """
+    Return (generation, {recipe_id: version}) creating missing tokens on the fly
+    A fresh random token (never a counter restarting at 1) keeps evicted versions safe
+    """
+    keys = [GENERATION_KEY] + [_version_key(recipe_id) for recipe_id in recipe_ids]
+    found = cache.get_many(keys)
+    missing = {key: _new_token() for key in keys if key not in found}
+    if missing:
+        for key, token in missing.items():
+            cache.add(key, token, timeout=None)
+        found.update(cache.get_many(list(missing)))
+    versions = {recipe_id: found.get(_version_key(recipe_id)) for recipe_id in recipe_ids}
+    return found.get(GENERATION_KEY), versions
+
+
+def _entry_key(recipe_id, version, generation, variant, request):
+    origin = f'{request.scheme}://{request.get_host()}' if request else ''
+    return f'recipes:{variant}:{recipe_id}:{version}:{generation}:{origin}'
+
+
+def _personalize(data, request):
+    """
+    Fill in the per-user field from the cached ratings list instead of querying
+    """
+    if 'user_rating' not in data:
+        return data
+    data = dict(data)
+    user = getattr(request, 'user', None)
+    data['user_rating'] = None
+    if user is not None and user.is_authenticated:
+        for rating in data.get('ratings', ()):
+            if rating['user']['id'] == user.id:
+                data['user_rating'] = rating['score']
+                break
+    return data
+
+
+def _serialize(recipe, request, variant):
+    with profiling.span('serialize'):
+        data = dict(SERIALIZERS[variant](recipe, context={'request': request}).data)
+    if 'user_rating' in data:
+        data['user_rating'] = None
+    return data
+
+
+def get(recipe_id, request, variant='detail'):
+    """
+    Return the cached representation of a recipe, or None on a miss
+    """
+    cache = _cache()
+    generation, versions = _tokens(cache, [recipe_id])
+    data = cache.get(_entry_key(recipe_id, versions[recipe_id], generation, variant, request))
+    LOOKUPS.labels(variant, 'miss' if data is None else 'hit').inc()
+    return _personalize(data, request) if data is not None else None
+
+
+def represent(recipes, request, variant='detail'):
+    """
+    Serialize recipes (instances or ids) in order, reading through the cache
+    Misses are loaded in one query with their author and the relations of the variant prefetched
+    """
+    cache = _cache()
+    recipe_ids = [recipe if isinstance(recipe, int) else recipe.id for recipe in recipes]
+    generation, versions = _tokens(cache, recipe_ids)
+    keys = {
+        recipe_id: _entry_key(recipe_id, versions[recipe_id], generation, variant, request)
+        for recipe_id in recipe_ids
+    }
+    hits = cache.get_many(list(keys.values()))
+
+    missing_ids = [recipe_id for recipe_id in recipe_ids if keys[recipe_id] not in hits]
+    LOOKUPS.labels(variant, 'hit').inc(len(recipe_ids) - len(missing_ids))
+    LOOKUPS.labels(variant, 'miss').inc(len(missing_ids))
+    if missing_ids:
+        provided = {recipe.id: recipe for recipe in recipes if not isinstance(recipe, int)}
+        instances = [provided[recipe_id] for recipe_id in missing_ids if recipe_id in provided]
+        to_load = [recipe_id for recipe_id in missing_ids if recipe_id not in provided]
+        if to_load:
+            instances += list(Recipe.objects.filter(id__in=to_load).select_related('author'))
+        prefetch_related_objects(instances, *PREFETCH[variant])
+        fresh = {keys[recipe.id]: _serialize(recipe, request, variant) for recipe in instances}
+        cache.set_many(fresh)
+        hits.update(fresh)
+
+    return [
+        _personalize(hits[keys[recipe_id]], request)
+        for recipe_id in recipe_ids
+        if keys[recipe_id] in hits
+    ]
+
+
+def represent_one(recipe, request, variant='detail'):
+    """
+    Serialize a single recipe instance through the cache
+    """
+    result = represent([recipe], request, variant)
+    return result[0] if result else None
+
+
+def catalogue_token():
+    """
+    Token replaced by every change to a recipe, rating, user or the homepage content
+    Whole-catalogue documents built under an older token are out of date
+    """
+    cache = _cache()
+    catalogue = cache.get(CATALOGUE_KEY)
+    if catalogue is None:
+        cache.add(CATALOGUE_KEY, _new_token(), timeout=None)
+        catalogue = cache.get(CATALOGUE_KEY)
+    return catalogue
+
+
+def _document_key(name, request):
+    origin = f'{request.scheme}://{request.get_host()}' if request else ''
+    return f'recipes:document:{name}:{catalogue_token()}:{origin}'
+
+
+def get_document(name, request):
+    """
+    Return a cached whole-catalogue document (e.g. the public homepage), or None
+    Documents are retired by any recipe, rating, user or homepage change
+    """
+    document = _cache().get(_document_key(name, request))
+    LOOKUPS.labels(f'document:{name}', 'miss' if document is None else 'hit').inc()
+    return document
+
+
+def set_document(name, request, value):
+    _cache().set(_document_key(name, request), value)
+
+
+def _bump(recipe_id):
+    cache = _cache()
+    cache.set_many({_version_key(recipe_id): _new_token(), CATALOGUE_KEY: _new_token()}, timeout=None)
+
+
+def invalidate(recipe_id):
+    """
+    Retire every cached representation of one recipe
+    Repeated on commit so readers racing the open transaction cannot pin stale data
+    """
+    _bump(recipe_id)
+    transaction.on_commit(lambda: _bump(recipe_id))
+
+
+def _bump_generation():
+    _cache().set_many({GENERATION_KEY: _new_token(), CATALOGUE_KEY: _new_token()}, timeout=None)
+
+
+def invalidate_all():
+    """
+    Retire all cached recipes (e.g. an author or rater profile changed)
+    """
+    _bump_generation()
+    transaction.on_commit(_bump_generation)
+
+
+def _bump_catalogue():
+    _cache().set(CATALOGUE_KEY, _new_token(), timeout=None)
+
+
+def invalidate_documents():
+    """
+    Retire cached catalogue documents only (e.g. homepage content edited)
+    """
+    _bump_catalogue()
+    transaction.on_commit(_bump_catalogue)
@@ -3,67 +3,359 @@ Enhanced WebSocket Consumer for Real-time Updates
 Handles all real-time communication between server and clients
 Broadcasts recipe updates, user changes, and homepage modifications
 """
+import asyncio
 import json
+import logging
+import time
+
+from collections import deque
+from urllib.parse import parse_qs
+
+from asgiref.timeout import timeout as async_timeout
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from cookbook import metrics
+from cookbook.renderers import dumps_text
+from . import moderation
+from . import replay
+
+logger = logging.getLogger(__name__)
+
+PING_FRAME = dumps_text({'type': 'ping'})
+PONG_FRAME = dumps_text({'type': 'pong'})
+
+# Application close codes (4000-4999 are free for application use)
+CLOSE_SLOW_CONSUMER = 4008
+CLOSE_HEARTBEAT_TIMEOUT = 4009
+CLOSE_FORBIDDEN = 4003
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class ConnectionRegistry:
+    """
+    Live sockets of this process plus counters for monitoring
+    Also drives one shared heartbeat loop instead of a timer per socket
+    """
+    def __init__(self):
+        self.consumers = set()
+        self.counters = {
+            'accepted': 0,
+            'closed': 0,
+            'frames_sent': 0,
+            'frames_dropped': 0,
+            'evicted_slow': 0,
+            'evicted_idle': 0,
+        }
+        self._heartbeat = None
+
+    def add(self, consumer):
+        self.consumers.add(consumer)
+        self.counters['accepted'] += 1
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.get_running_loop().create_task(self._run_heartbeat())
+
+    def discard(self, consumer):
+        if consumer in self.consumers:
+            self.consumers.discard(consumer)
+            self.counters['closed'] += 1
+
+    def stats(self):
+        return {
+            'active': len(self.consumers),
+            'queued_frames': sum(consumer.queue.qsize() for consumer in self.consumers),
+            'unacked_bytes': sum(consumer.sent_bytes - consumer.acked_bytes for consumer in self.consumers),
+            **self.counters,
+        }
+
+    async def _run_heartbeat(self):
+        """
+        Ping every socket each interval; evict sockets silent for longer than the timeout
+        (half-open connections from sleeping phones and dropped Wi-Fi never send a close)
+        """
+        interval = _setting('WS_HEARTBEAT_SECONDS', 25)
+        timeout = _setting('WS_HEARTBEAT_TIMEOUT', 60)
+        while self.consumers:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for consumer in list(self.consumers):
+                if now - consumer.last_seen > timeout:
+                    consumer.evict(CLOSE_HEARTBEAT_TIMEOUT, 'idle')
+                else:
+                    consumer.enqueue(PING_FRAME)
+
+
+registry = ConnectionRegistry()
+
+
+def collect_metrics():
+    """
+    Report the registry's counters through /metrics
+    """
+    counters = registry.counters
+    return [
+        ('ws_connections_active', 'gauge', 'Open WebSocket connections', (),
+         [((), len(registry.consumers))]),
+        ('ws_send_queue_frames', 'gauge', 'Frames waiting in per-socket send queues', (),
+         [((), sum(consumer.queue.qsize() for consumer in list(registry.consumers)))]),
+        ('ws_connections_total', 'counter', 'WebSocket connections accepted', (),
+         [((), counters['accepted'])]),
+        ('ws_frames_sent_total', 'counter', 'Frames written to WebSocket clients', (),
+         [((), counters['frames_sent'])]),
+        ('ws_frames_dropped_total', 'counter', 'Frames dropped for slow WebSocket clients', (),
+         [((), counters['frames_dropped'])]),
+        ('ws_evictions_total', 'counter', 'WebSocket clients closed by the server', ('reason',),
+         [(('slow',), counters['evicted_slow']), (('idle',), counters['evicted_idle'])]),
+    ]
+
+
+metrics.registry.register_collector(collect_metrics)
+
 
 class RecipeConsumer(AsyncWebsocketConsumer):
     """
     WebSocket consumer for handling real-time updates
     Manages connections and broadcasts updates to all connected clients
+    Outbound frames go through a bounded per-socket queue drained by a writer task. The
+    server's send rarely blocks (daphne buffers whatever the client has not read), so the
+    writer also stops once WS_SEND_WINDOW_BYTES are unconfirmed: pings mark positions in the
+    stream and the client's pongs, answered in order, confirm what it has read. A slow client
+    then backs up only its own queue (and is closed or loses its oldest frames, per
+    WS_SLOW_CONSUMER_POLICY) instead of the server's write buffers
     """
-    
+    group = 'recipes'  # Group name for all recipe-related updates
+
     async def connect(self):
         """
         Accept WebSocket connection and add to recipes group
         All clients join the same group for broadcast updates
         """
-        await self.channel_layer.group_add(
-            'recipes',  # Group name for all recipe-related updates
-            self.channel_name
-        )
+        self.queue = asyncio.Queue(maxsize=_setting('WS_SEND_QUEUE_SIZE', 64))
+        self.last_seen = time.monotonic()
+        self.closing = False
+        self.replayed = set()
+        self.sent_bytes = 0
+        self.acked_bytes = 0
+        self.markers = deque()  # sent_bytes right after each ping still awaiting its pong
+        self.acked = asyncio.Event()
+        await self.channel_layer.group_add(self.group, self.channel_name)
         await self.accept()
-        print(f"WebSocket connected: {self.channel_name}")
+        self.writer = asyncio.get_running_loop().create_task(self._write_frames())
+        registry.add(self)
+        logger.debug('websocket connected channel=%s active=%d', self.channel_name, len(registry.consumers))
+        last_seq = parse_qs(self.scope.get('query_string', b'').decode()).get('last_seq')
+        if last_seq:
+            await self.resume(last_seq[0])
+        else:
+            # Anchor for the client's next reconnect even if no broadcast reaches it first
+            self.enqueue(dumps_text({'type': 'welcome', 'seq': await self.latest_seq()}))
 
     async def disconnect(self, close_code):
         """
         Remove client from recipes group when disconnecting
         Clean up connection to prevent memory leaks
         """
-        await self.channel_layer.group_discard(
-            'recipes',
-            self.channel_name
-        )
-        print(f"WebSocket disconnected: {self.channel_name} (code: {close_code})")
+        registry.discard(self)
+        writer = getattr(self, 'writer', None)
+        if writer is not None:
+            writer.cancel()
+        await self.channel_layer.group_discard(self.group, self.channel_name)
+        logger.debug('websocket disconnected channel=%s code=%s active=%d',
+                     self.channel_name, close_code, len(registry.consumers))
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        Any client frame proves the socket is alive; answer client pings
+        """
+        self.last_seen = time.monotonic()
+        try:
+            message = json.loads(text_data or '')
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+        if message.get('type') == 'ping':
+            self.enqueue(PONG_FRAME)
+        elif message.get('type') == 'pong' and self.markers:
+            self.acked_bytes = self.markers.popleft()
+            self.acked.set()
+        elif message.get('type') == 'resume':
+            await self.resume(message.get('last_seq'))
+
+    async def resume(self, last_seq):
+        """
+        Replay the broadcasts a reconnecting client missed since `last_seq`, or tell it to resync
+        Runs before any live event is handled (the consumer handles one message at a time),
+        so replayed frames always precede live ones; live copies of replayed events are skipped
+        """
+        try:
+            last_seq = int(last_seq)
+        except (TypeError, ValueError):
+            return
+        frames = replay.from_buffer(last_seq, self.group)
+        if frames is replay.UNKNOWN:
+            frames = await database_sync_to_async(replay.from_database)(last_seq, self.group)
+        if frames is None:
+            self.enqueue(dumps_text({'type': 'resync', 'seq': await self.latest_seq()}))
+            return
+        for seq, frame in frames:
+            self.replayed.add(seq)
+            self.enqueue(frame)
+
+    async def latest_seq(self):
+        if replay.buffer.latest is not None:
+            return replay.buffer.latest
+        return await database_sync_to_async(replay.latest_seq)()
+
+    async def _write_frames(self):
+        """
+        Drain the outbound queue; a frame held longer than WS_SEND_TIMEOUT (waiting for the
+        client to confirm earlier frames, or in a send the server blocks) marks the client slow
+        """
+        send_timeout = _setting('WS_SEND_TIMEOUT', 10)
+        window = _setting('WS_SEND_WINDOW_BYTES', 256 * 1024)
+        while True:
+            frame = await self.queue.get()
+            try:
+                async with async_timeout(send_timeout):
+                    await self._wait_for_window(len(frame), window)
+                    await self._send_frame(frame)
+            except asyncio.TimeoutError:
+                self.evict(CLOSE_SLOW_CONSUMER, 'send_timeout')
+                return
+            registry.counters['frames_sent'] += 1
+
+    async def _wait_for_window(self, size, window):
+        """
+        Hold the next frame while more than `window` bytes sent are unconfirmed by the client
+        A ping goes out first if none marks the end of the stream yet
+        """
+        while self.sent_bytes > self.acked_bytes and self.sent_bytes - self.acked_bytes + size > window:
+            if not self.markers or self.markers[-1] < self.sent_bytes:
+                await self._send_frame(PING_FRAME)
+            self.acked.clear()
+            await self.acked.wait()
+
+    async def _send_frame(self, frame):
+        # Frames are mostly ASCII JSON, so their length stands in for the encoded size
+        await self.send(text_data=frame)
+        self.sent_bytes += len(frame)
+        if frame == PING_FRAME:
+            self.markers.append(self.sent_bytes)
+
+    def enqueue(self, frame):
+        """
+        Queue a frame without waiting; apply the slow-consumer policy when the queue is full
+        """
+        if self.closing:
+            return
+        try:
+            self.queue.put_nowait(frame)
+            return
+        except asyncio.QueueFull:
+            pass
+        if _setting('WS_SLOW_CONSUMER_POLICY', 'close') == 'drop_oldest':
+            self.queue.get_nowait()
+            self.queue.put_nowait(frame)
+            registry.counters['frames_dropped'] += 1
+        else:
+            registry.counters['frames_dropped'] += self.queue.qsize() + 1
+            self.evict(CLOSE_SLOW_CONSUMER, 'queue_full')
+
+    def evict(self, code, reason):
+        """
+        Close the socket from the server side and stop accepting frames for it
+        """
+        if self.closing:
+            return
+        self.closing = True
+        registry.discard(self)
+        registry.counters['evicted_idle' if reason == 'idle' else 'evicted_slow'] += 1
+        logger.info('websocket evicted reason=%s channel=%s', reason, self.channel_name)
+        if self.writer is not asyncio.current_task():
+            self.writer.cancel()
+        asyncio.get_running_loop().create_task(self._close(code))
+
+    async def _close(self, code):
+        # Frees the group membership now; the client may never complete the close handshake
+        await self.channel_layer.group_discard(self.group, self.channel_name)
+        await self.close(code=code)
+
+    async def _forward_event(self, event):
+        """
+        Send a broadcast event to the client
+        broadcast_update pre-encodes the frame once for all recipients; events that
+        only carry a raw message are encoded here
+        """
+        if event.get('seq') in self.replayed:
+            return
+        frame = event.get('frame')
+        if frame is None:
+            frame = dumps_text({'type': event['type'], 'data': event['message']})
+        self.enqueue(frame)
 
     async def recipe_update(self, event):
         """
         Handle recipe-related updates and send to client
         Covers: create, update, delete, rate, approve, decline, signature_toggle, photo_update
         """
-        message = event['message']
-        await self.send(text_data=json.dumps({
-            'type': 'recipe_update',
-            'data': message
-        }))
+        await self._forward_event(event)
 
     async def user_update(self, event):
         """
         Handle user-related updates and send to client
         Covers: register, profile_update, role_update, create_team_member, delete_user
         """
-        message = event['message']
-        await self.send(text_data=json.dumps({
-            'type': 'user_update',
-            'data': message
-        }))
+        await self._forward_event(event)
 
     async def homepage_update(self, event):
         """
         Handle homepage content updates and send to client
         Covers: homepage_update (welcome message and Ninang Rhobby's image)
         """
-        message = event['message']
-        await self.send(text_data=json.dumps({
-            'type': 'homepage_update',
-            'data': message
-        }))
+        await self._forward_event(event)
+
+
+@database_sync_to_async
+def _token_user(token):
+    """
+    The user a JWT access token belongs to, or None
+    """
+    from rest_framework.exceptions import AuthenticationFailed
+    from cookbook.authentication import LazyJWTAuthentication
+    backend = LazyJWTAuthentication.backend()
+    try:
+        return backend.get_user(backend.get_validated_token(token))
+    except AuthenticationFailed:
+        return None
+
+
+class ModeratorConsumer(RecipeConsumer):
+    """
+    Moderation queue updates for admins: pending count, submissions, claims and decisions
+    Browsers cannot set headers on a WebSocket, so the JWT access token comes as ?token=
+    (the session user works too); anyone else is closed with code 4003. The current pending
+    count follows the welcome frame
+    """
+    group = 'moderators'
+
+    async def connect(self):
+        token = parse_qs(self.scope.get('query_string', b'').decode()).get('token')
+        user = await _token_user(token[0]) if token else self.scope.get('user')
+        if user is None or not user.is_authenticated or getattr(user, 'role', None) not in ('admin', 'super_admin'):
+            await self.close(code=CLOSE_FORBIDDEN)
+            return
+        self.scope['user'] = user
+        await super().connect()
+        count = await database_sync_to_async(moderation.pending_count)()
+        self.enqueue(dumps_text({'type': 'pending_count', 'count': count}))
+
+    async def moderation_update(self, event):
+        """
+        Covers: submit, update, delete, claim, release, approve, decline
+        """
+        await self._forward_event(event)
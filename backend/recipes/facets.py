@@ -0,0 +1,433 @@
+"""
+Faceted Browsing over Approved Recipes
+Each process keeps, per facet value (a servings band, a rating band, signature or not, an
+author, an ingredient), the set of approved recipes having it as a bitmap: a Python int with
+one bit per recipe. Recipes get bit positions in creation order, so walking a bitmap from its
+highest bit lists the newest recipes first.
+The recipes matching a filter are the AND of the selected facets (values selected within one
+facet are OR-ed, except ingredients, which must all be present), and every facet count is one
+AND plus a popcount, so a browse request never runs a GROUP BY. Authors and ingredients only
+report their most frequent values, so values too rare to make the list are never counted.
+
+Like recipes.autocomplete, the index is built when the server starts (or on first use),
+re-reads recipes saved, rated or deleted in this process on the next request, and follows
+other processes through the recipe change log every FACETS_SYNC_SECONDS.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from . import changes
+from .models import Recipe
+from .similar import normalize_ingredient
+
+logger = logging.getLogger(__name__)
+
+FACETS = ('servings', 'rating', 'signature', 'author', 'ingredient')
+
+# Facets whose selected values must all apply (the others accept any of them)
+CONJUNCTIVE = {'ingredient'}
+
+# Facets with open-ended values: only the most frequent are counted in responses
+OPEN_ENDED = {'author', 'ingredient'}
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(bitmap):
+        return bin(bitmap).count('1')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def servings_band(servings):
+    if servings <= 2:
+        return '1-2'
+    if servings <= 4:
+        return '3-4'
+    if servings <= 6:
+        return '5-6'
+    return '7+'
+
+
+def rating_band(rating_count, rating_sum):
+    """
+    Band of the average rating: 'unrated', '1-2', '2-3', '3-4' or '4-5' (5 included)
+    """
+    if not rating_count:
+        return 'unrated'
+    low = min(max(int(rating_sum / rating_count), 1), 4)
+    return f'{low}-{low + 1}'
+
+
+def facet_values(servings, is_signature, author_id, ingredients, rating_count, rating_sum):
+    """
+    {facet: set of values} of one recipe
+    """
+    return {
+        'servings': {servings_band(servings)},
+        'rating': {rating_band(rating_count, rating_sum)},
+        'signature': {'true' if is_signature else 'false'},
+        'author': {str(author_id)},
+        'ingredient': {name for name in map(normalize_ingredient, map(str, ingredients or [])) if name},
+    }
+
+
+def _bitmap(slots):
+    """
+    Bitmap with the given bit positions set, built in one pass
+    """
+    slots = list(slots)
+    if not slots:
+        return 0
+    buffer = bytearray(max(slots) // 8 + 1)
+    for slot in slots:
+        buffer[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def _descending(bitmap):
+    """
+    Yield the set bit positions of a bitmap, highest first
+    """
+    digits = bin(bitmap)
+    top = len(digits) - 1
+    position = digits.find('1', 2)
+    while position != -1:
+        yield top - position
+        position = digits.find('1', position + 1)
+
+
+class FacetIndex:
+    """
+    Per-value bitmaps of the approved recipes; not thread-safe on its own (the module
+    functions hold one lock around every use)
+    """
+    def __init__(self):
+        self.slots = {}         # recipe id -> bit position (kept when a recipe leaves)
+        self.recipe_ids = []    # bit position -> recipe id
+        self.values = {}        # indexed recipe id -> {facet: set of values}
+        self.postings = {facet: {} for facet in FACETS}  # facet -> value -> bitmap
+        self.sizes = {facet: {} for facet in FACETS}     # facet -> value -> recipes with it
+        self.everything = 0     # Bitmap of every indexed recipe
+        self.authors = {}       # author id (as a facet value) -> username
+        self._orders = {}       # facet -> values by decreasing size, until the next change
+
+    def __len__(self):
+        return len(self.values)
+
+    def _slot(self, recipe_id):
+        slot = self.slots.get(recipe_id)
+        if slot is None:
+            slot = self.slots[recipe_id] = len(self.recipe_ids)
+            self.recipe_ids.append(recipe_id)
+        return slot
+
+    def load(self, rows):
+        """
+        Index (recipe id, values, author name) rows, oldest first, building each bitmap once
+        """
+        members = {facet: {} for facet in FACETS}
+        for recipe_id, values, author_name in rows:
+            slot = self._slot(recipe_id)
+            self.values[recipe_id] = values
+            for facet, facet_values in values.items():
+                for value in facet_values:
+                    members[facet].setdefault(value, []).append(slot)
+            if author_name is not None:
+                self.authors.update({value: author_name for value in values['author']})
+        for facet, by_value in members.items():
+            for value, slots in by_value.items():
+                self.postings[facet][value] = _bitmap(slots)
+                self.sizes[facet][value] = len(slots)
+        self.everything = _bitmap(self.slots[recipe_id] for recipe_id in self.values)
+        self._orders.clear()
+
+    def add_recipe(self, recipe_id, values, author_name=None):
+        self.remove_recipe(recipe_id)
+        bit = 1 << self._slot(recipe_id)
+        for facet, facet_values in values.items():
+            postings, sizes = self.postings[facet], self.sizes[facet]
+            for value in facet_values:
+                postings[value] = postings.get(value, 0) | bit
+                sizes[value] = sizes.get(value, 0) + 1
+        self.values[recipe_id] = values
+        self.everything |= bit
+        self._orders.clear()
+        if author_name is not None:
+            self.authors.update({value: author_name for value in values['author']})
+
+    def remove_recipe(self, recipe_id):
+        values = self.values.pop(recipe_id, None)
+        if values is None:
+            return
+        mask = ~(1 << self.slots[recipe_id])
+        for facet, facet_values in values.items():
+            postings, sizes = self.postings[facet], self.sizes[facet]
+            for value in facet_values:
+                sizes[value] -= 1
+                if sizes[value]:
+                    postings[value] &= mask
+                else:
+                    del postings[value], sizes[value]
+        self.everything &= mask
+        self._orders.clear()
+
+    def _selection(self, facet, selected):
+        """
+        Bitmap of the recipes a facet's selected values admit
+        """
+        postings = self.postings[facet]
+        if facet in CONJUNCTIVE:
+            bitmap = self.everything
+            for value in selected:
+                bitmap &= postings.get(value, 0)
+            return bitmap
+        bitmap = 0
+        for value in selected:
+            bitmap |= postings.get(value, 0)
+        return bitmap
+
+    def _by_size(self, facet):
+        order = self._orders.get(facet)
+        if order is None:
+            sizes = self.sizes[facet]
+            order = self._orders[facet] = sorted(sizes, key=sizes.get, reverse=True)
+        return order
+
+    def _counts(self, facet, base, selected, top):
+        """
+        [{'value', 'count', 'selected'}] of a facet within `base`, most frequent first
+        Open-ended facets tally the values of the recipes in `base` when they are few, and
+        otherwise visit values from the most common down, stopping once a value's size cannot
+        reach the `top` counts found so far
+        """
+        sizes, postings = self.sizes[facet], self.postings[facet]
+        whole = base == self.everything
+
+        def count(value):
+            if whole:
+                return sizes.get(value, 0)
+            bitmap = postings.get(value)
+            return _popcount(bitmap & base) if bitmap else 0
+
+        if facet in OPEN_ENDED and not whole and _popcount(base) * 16 < len(self.recipe_ids):
+            # Few recipes left: tallying their values beats an AND per value
+            counts = {}
+            values, recipe_ids = self.values, self.recipe_ids
+            for slot in _descending(base):
+                for value in values[recipe_ids[slot]][facet]:
+                    counts[value] = counts.get(value, 0) + 1
+        elif facet in OPEN_ENDED:
+            counts = {}
+            best = []  # Min-heap of the `top` largest counts
+            for value in self._by_size(facet):
+                if len(best) == top and sizes[value] <= best[0]:
+                    break
+                found = count(value)
+                if found:
+                    counts[value] = found
+                    if len(best) < top:
+                        heapq.heappush(best, found)
+                    else:
+                        heapq.heappushpop(best, found)
+        else:
+            counts = {value: count(value) for value in postings}
+        for value in selected:
+            if value not in counts:
+                counts[value] = count(value)
+
+        pairs = ((found, value) for value, found in counts.items() if found or value in selected)
+
+        def order(pair):
+            return -pair[0], pair[1]
+
+        if facet in OPEN_ENDED:
+            pairs = heapq.nsmallest(top, pairs, key=order)
+            shown = {value for _, value in pairs}
+            pairs += sorted(((counts[value], value) for value in selected if value not in shown), key=order)
+        else:
+            pairs = sorted(pairs, key=order)
+        result = []
+        for found, value in pairs:
+            entry = {'value': value, 'count': found, 'selected': value in selected}
+            if facet == 'author':
+                entry['label'] = self.authors.get(value, value)
+            result.append(entry)
+        return result
+
+    def query(self, filters, offset=0, limit=20, top=20):
+        """
+        Return (total, recipe ids of the page, newest first, {facet: [{'value', 'count',
+        'selected'}]}) for filters {facet: [values]}
+        Counts of an OR-ed facet ignore its own selection (they read "how many if this value
+        were picked instead or too"); ingredient counts are within the current results
+        """
+        selections = {
+            facet: self._selection(facet, values) for facet, values in filters.items() if values
+        }
+        matched = self.everything
+        for bitmap in selections.values():
+            matched &= bitmap
+
+        facets = {}
+        for facet in FACETS:
+            base = self.everything
+            if facet in CONJUNCTIVE:
+                base = matched
+            else:
+                for other, bitmap in selections.items():
+                    if other != facet:
+                        base &= bitmap
+            facets[facet] = self._counts(facet, base, set(filters.get(facet, ())), top)
+
+        page = []
+        for position, slot in enumerate(_descending(matched)):
+            if position >= offset + limit:
+                break
+            if position >= offset:
+                page.append(self.recipe_ids[slot])
+        return _popcount(matched), page, facets
+
+
+_index = None
+_cursor = 0
+_synced_at = 0.0
+_pending = set()
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+
+def _rows(recipe_ids=None):
+    """
+    Yield (recipe id, facet values, author username) of approved recipes, oldest first
+    """
+    queryset = Recipe.objects.filter(status='approved').order_by('created_at', 'id')
+    if recipe_ids is not None:
+        queryset = queryset.filter(id__in=list(recipe_ids))
+    for row in queryset.values_list(
+        'id', 'servings', 'is_signature', 'author_id', 'ingredients',
+        'leaderboard__rating_count', 'leaderboard__rating_sum', 'author__username',
+    ).iterator():
+        recipe_id, servings, is_signature, author_id, ingredients, rating_count, rating_sum, username = row
+        yield recipe_id, facet_values(
+            servings, is_signature, author_id, ingredients, rating_count or 0, rating_sum or 0,
+        ), username
+
+
+def build():
+    """
+    (Re)build this process's index from the database
+    """
+    global _index, _cursor, _synced_at
+    started = time.perf_counter()
+    index = FacetIndex()
+    cursor = changes.latest_cursor()
+    index.load(_rows())
+    with _lock:
+        # Changes recorded while loading are re-read from the change log on the next sync
+        _index, _cursor, _synced_at = index, cursor, 0.0
+    logger.info('Facet index built: %d recipes in %.2fs', len(index), time.perf_counter() - started)
+    return index
+
+
+def _ensure():
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                build()
+    return _index
+
+
+def _sync(index):
+    """
+    Re-read recipes changed in this process, and every FACETS_SYNC_SECONDS those changed by
+    other processes according to the change log
+    The database is read without the lock, which is only taken to apply the rows, so browse
+    requests never wait on a query; one thread syncs at a time and the others query the
+    index as it is
+    """
+    global _cursor, _synced_at
+    if not _sync_lock.acquire(blocking=False):
+        return
+    try:
+        with _lock:
+            recipe_ids = set(_pending)
+            _pending.difference_update(recipe_ids)
+            cursor = _cursor
+            due = time.monotonic() - _synced_at >= _setting('FACETS_SYNC_SECONDS', 2)
+            if due:
+                _synced_at = time.monotonic()
+        if due:
+            changed, cursor = changes.drain(cursor)
+            recipe_ids.update(changed)
+        if not recipe_ids:
+            return
+        rows = list(_rows(recipe_ids))
+        with _lock:
+            if _index is not index:
+                # Rebuilt meanwhile: keep the recipes touched here for the new index
+                _pending.update(recipe_ids)
+                return
+            _cursor = cursor
+            seen = set()
+            for recipe_id, values, username in rows:
+                index.add_recipe(recipe_id, values, username)
+                seen.add(recipe_id)
+            for recipe_id in recipe_ids - seen:
+                index.remove_recipe(recipe_id)
+    finally:
+        _sync_lock.release()
+
+
+def browse(filters, offset=0, limit=20):
+    """
+    Return (total, recipe ids, facet counts) of the approved recipes matching `filters`
+    """
+    index = _ensure()
+    _sync(index)
+    with _lock:
+        return index.query(filters, offset, limit, _setting('FACETS_TOP_VALUES', 20))
+
+
+def touch(recipe_id):
+    """
+    A recipe was saved, rated or deleted in this process: re-read it on the next request
+    """
+    if _index is not None:
+        _pending.add(recipe_id)
+
+
+def warm():
+    """
+    Build the index in the background when a server process starts
+    """
+    if _setting('FACETS_WARM_ON_START', True):
+        threading.Thread(target=_warm, name='facets-warm', daemon=True).start()
+
+
+def _warm():
+    try:
+        _ensure()
+    except Exception:
+        logger.exception('Building the facet index failed')
+
+
+def _after_fork():
+    # A forked worker rebuilds on first use rather than trusting a copy taken mid-update
+    global _index, _lock, _build_lock, _sync_lock
+    _index = None
+    _lock = threading.Lock()
+    _build_lock = threading.Lock()
+    _sync_lock = threading.Lock()
+    _pending.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork)
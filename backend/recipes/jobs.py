@@ -0,0 +1,347 @@
+"""
+Database-backed Job Queue
+Deferred work (media cleanup, aggregate recomputation) is stored as Job rows in the same
+SQLite database, so enqueueing joins the request's transaction and needs no broker.
+Workers lease ready jobs highest priority first, run them on a thread or process pool and
+retry failures with exponential backoff. Functions become jobs with the @task decorator;
+task modules are imported by RecipesConfig.ready() so every process knows the registry.
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from cookbook import metrics
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+JOBS_EXECUTED = metrics.Counter('jobs_executed_total', 'Job attempts by outcome', ('name', 'outcome'))
+JOB_RUNTIME = metrics.Histogram(
+    'job_run_seconds', 'Job run time', ('name',), buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+
+_registry = {}
+
+_loop = None
+_wakeup = None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==================== REGISTRY ====================
+
+def task(name=None, priority=0, max_attempts=3):
+    """
+    Register a function as a job; its arguments must be JSON serializable
+    """
+    def decorator(func):
+        func.task_name = name or f'{func.__module__}.{func.__name__}'
+        func.task_priority = priority
+        func.task_max_attempts = max_attempts
+        _registry[func.task_name] = func
+        return func
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f'Unknown job: {name}') from None
+
+
+# ==================== PRODUCERS ====================
+
+def enqueue(func, *args, priority=None, delay=None, dedupe_key=''):
+    """
+    Queue func(*args); it becomes visible to workers when the surrounding transaction commits
+    With a dedupe_key, a job still waiting under the same key absorbs the new one
+    """
+    name = getattr(func, 'task_name', func)
+    func = get_task(name)
+    if dedupe_key:
+        existing = Job.objects.filter(dedupe_key=dedupe_key, status='queued').first()
+        if existing is not None:
+            return existing
+    job = Job.objects.create(
+        name=name,
+        args=list(args),
+        priority=func.task_priority if priority is None else priority,
+        run_at=timezone.now() + (delay or timedelta()),
+        dedupe_key=dedupe_key,
+        max_attempts=func.task_max_attempts,
+    )
+    transaction.on_commit(notify)
+    return job
+
+
+def notify():
+    """
+    Wake the in-process worker (safe to call from any thread)
+    """
+    if _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+# ==================== WORKER ====================
+
+def _retry_delay(attempts):
+    """
+    Exponential backoff with jitter: base, 2*base, 4*base, ... plus up to one base
+    """
+    base = _setting('JOBS_RETRY_BASE_SECONDS', 5)
+    return timedelta(seconds=base * 2 ** (attempts - 1) + random.uniform(0, base))
+
+
+def claim(worker_id, limit):
+    """
+    Lease up to `limit` ready jobs to this worker, highest priority and earliest first
+    """
+    close_old_connections()
+    now = timezone.now()
+    ids = Job.objects.filter(status='queued', run_at__lte=now).order_by('-priority', 'run_at', 'id').values('id')[:limit]
+    Job.objects.filter(id__in=ids, status='queued').update(
+        status='running', locked_by=worker_id, locked_at=now, started_at=now, attempts=F('attempts') + 1,
+    )
+    return list(Job.objects.filter(status='running', locked_by=worker_id, locked_at=now).values_list('id', flat=True))
+
+
+def requeue_expired():
+    """
+    Return jobs whose worker died mid-run to the queue (they count as a failed attempt)
+    """
+    horizon = timezone.now() - timedelta(seconds=_setting('JOBS_LEASE_SECONDS', 300))
+    expired = Job.objects.filter(status='running', locked_at__lt=horizon)
+    failed = expired.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=timezone.now(), last_error='Lease expired', locked_by=''
+    )
+    requeued = expired.update(status='queued', last_error='Lease expired', locked_by='', locked_at=None)
+    return requeued + failed
+
+
+def execute(job_id):
+    """
+    Run one claimed job and record the outcome
+    Runs on a pool thread or a pool process, so it manages its own connections
+    """
+    close_old_connections()
+    try:
+        job = Job.objects.get(id=job_id)
+        started = time.perf_counter()
+        try:
+            get_task(job.name)(*job.args)
+        except Exception:
+            JOB_RUNTIME.labels(job.name).observe(time.perf_counter() - started)
+            error = traceback.format_exc()
+            logger.warning('Job %s (%s) failed on attempt %s', job.id, job.name, job.attempts, exc_info=True)
+            if job.attempts >= job.max_attempts:
+                JOBS_EXECUTED.labels(job.name, 'failed').inc()
+                Job.objects.filter(id=job.id).update(
+                    status='failed', last_error=error, finished_at=timezone.now(), locked_by='', locked_at=None
+                )
+            else:
+                JOBS_EXECUTED.labels(job.name, 'retry').inc()
+                Job.objects.filter(id=job.id).update(
+                    status='queued', last_error=error, run_at=timezone.now() + _retry_delay(job.attempts),
+                    locked_by='', locked_at=None,
+                )
+            return False
+        JOB_RUNTIME.labels(job.name).observe(time.perf_counter() - started)
+        JOBS_EXECUTED.labels(job.name, 'done').inc()
+        Job.objects.filter(id=job.id).update(status='done', finished_at=timezone.now(), locked_by='', locked_at=None)
+        return True
+    finally:
+        connections.close_all()
+
+
+def prune():
+    """
+    Drop finished jobs past the retention window (failed ones are kept for inspection)
+    """
+    horizon = timezone.now() - _setting('JOBS_RETENTION', timedelta(days=7))
+    deleted, _ = Job.objects.filter(status='done', finished_at__lt=horizon).delete()
+    return deleted
+
+
+def _init_process():
+    # Forked pool processes must not reuse the parent's SQLite connections
+    import django
+    django.setup()
+    connections.close_all()
+
+
+class Worker:
+    """
+    Poll-and-lease loop feeding a thread or process pool of `concurrency` slots
+    """
+    def __init__(self, concurrency=2, pool='thread', poll_seconds=1.0):
+        self.concurrency = concurrency
+        self.pool = pool
+        self.poll_seconds = poll_seconds
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.processed = 0
+
+    def _executor(self):
+        if self.pool == 'process':
+            return ProcessPoolExecutor(max_workers=self.concurrency, initializer=_init_process)
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job')
+
+    def run(self, stop=None, once=False):
+        """
+        Process jobs until `stop` is set, or until the queue is empty when once=True
+        """
+        stop = stop or threading.Event()
+        in_flight = set()
+        last_maintenance = 0.0
+        with self._executor() as executor:
+            while not stop.is_set():
+                if time.monotonic() - last_maintenance > 60:
+                    requeue_expired()
+                    prune()
+                    last_maintenance = time.monotonic()
+                free = self.concurrency - len(in_flight)
+                if free > 0:
+                    claimed = claim(self.worker_id, free)
+                    in_flight.update(executor.submit(execute, job_id) for job_id in claimed)
+                if in_flight:
+                    done, in_flight = wait(in_flight, timeout=self.poll_seconds, return_when=FIRST_COMPLETED)
+                    self.processed += len(done)
+                    in_flight = set(in_flight)
+                elif once:
+                    break
+                else:
+                    # Idle: sleep until the next poll, waking early on shutdown
+                    stop.wait(self.poll_seconds)
+            for future in in_flight:
+                future.result()
+        return self.processed
+
+
+async def run_in_process(poll_seconds=None):
+    """
+    Run jobs one at a time on the server's event loop
+    Each job goes through sync_to_async on the thread that also runs sync views, so
+    development servers never have two connections competing for SQLite's write lock
+    """
+    poll_seconds = poll_seconds or _setting('JOBS_POLL_SECONDS', 5)
+    worker_id = f'{socket.gethostname()}:{os.getpid()}:inproc'
+    last_maintenance = 0.0
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        try:
+            if time.monotonic() - last_maintenance > 60:
+                await sync_to_async(requeue_expired)()
+                await sync_to_async(prune)()
+                last_maintenance = time.monotonic()
+            while True:
+                claimed = await sync_to_async(claim)(worker_id, 1)
+                if not claimed:
+                    break
+                await sync_to_async(execute)(claimed[0])
+        except Exception:
+            logger.exception('In-process job pass failed')
+
+
+def start_in_process():
+    """
+    Start the in-process worker task on the running event loop (once per process)
+    """
+    global _loop, _wakeup
+    if _loop is not None:
+        return
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    _wakeup.set()  # Pick up jobs queued before this process started
+    _loop.create_task(run_in_process())
+
+
+class JobWorkerMiddleware:
+    """
+    ASGI middleware that starts the in-process job worker with the first connection
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if _loop is None and scope['type'] in ('http', 'websocket') and _setting('JOBS_RUN_IN_PROCESS', True):
+            start_in_process()
+        return await self.app(scope, receive, send)
+
+
+# ==================== METRICS ====================
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def metrics(window=timedelta(hours=1)):
+    """
+    Queue depth and latency figures for jobs finished within `window`
+    Wait is from the time a job became runnable to its (last) start; run is start to finish
+    """
+    now = timezone.now()
+    depth = {status: 0 for status, _ in Job.STATUS_CHOICES}
+    recent = Job.objects.filter(Q(status__in=['queued', 'running']) | Q(finished_at__gte=now - window))
+    for row in recent.values('status').order_by().annotate(count=Count('id')):
+        depth[row['status']] = row['count']
+    oldest = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at').values_list('run_at', flat=True).first()
+
+    by_name = {}
+    finished = Job.objects.filter(finished_at__gte=now - window, started_at__isnull=False).values_list(
+        'name', 'status', 'run_at', 'started_at', 'finished_at', 'attempts'
+    )
+    for name, status, run_at, started_at, finished_at, attempts in finished.iterator():
+        stats = by_name.setdefault(name, {'done': 0, 'failed': 0, 'retries': 0, 'wait': [], 'run': []})
+        stats[status] += 1
+        stats['retries'] += attempts - 1
+        stats['wait'].append(max((started_at - run_at).total_seconds(), 0.0))
+        stats['run'].append((finished_at - started_at).total_seconds())
+
+    def summary(seconds):
+        return {
+            'p50_ms': None if not seconds else round(_percentile(seconds, 0.5) * 1000, 1),
+            'p95_ms': None if not seconds else round(_percentile(seconds, 0.95) * 1000, 1),
+            'max_ms': None if not seconds else round(max(seconds) * 1000, 1),
+        }
+
+    return {
+        'window_seconds': int(window.total_seconds()),
+        'queue': {
+            'depth': depth,
+            'oldest_ready_age_seconds': None if oldest is None else round((now - oldest).total_seconds(), 1),
+        },
+        'jobs': {
+            name: {
+                'done': stats['done'],
+                'failed': stats['failed'],
+                'retries': stats['retries'],
+                'wait': summary(stats['wait']),
+                'run': summary(stats['run']),
+            }
+            for name, stats in sorted(by_name.items())
+        },
+    }
+
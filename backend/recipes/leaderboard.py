@@ -0,0 +1,184 @@
+"""
+Leaderboard for Hall of Fame and Top Dishes
+Keeps a Bayesian-weighted score per recipe in LeaderboardEntry and updates it incrementally,
+so the homepage reads the Top-N straight from an index instead of averaging the ratings table
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Sum, Value
+
+from .models import LeaderboardEntry, Rating, RatingTally, Recipe
+
+
+def _prior():
+    """
+    Return (prior mean, prior weight) used to pull sparsely rated recipes toward the middle
+    """
+    return (
+        float(getattr(settings, 'LEADERBOARD_PRIOR_MEAN', 3.0)),
+        int(getattr(settings, 'LEADERBOARD_PRIOR_WEIGHT', 5)),
+    )
+
+
+def bayesian_score(rating_count, rating_sum):
+    """
+    Weighted average that treats every recipe as having `weight` extra ratings of `mean` stars
+    One 5-star rating no longer beats hundreds of 4.9s
+    """
+    mean, weight = _prior()
+    return (rating_sum + weight * mean) / (rating_count + weight)
+
+
+def _apply_delta(recipe_id, count_delta, sum_delta):
+    """
+    Shift the stored aggregates of one recipe and recompute its score in a single UPDATE
+    Returns the new (rating_count, rating_sum, score), or None when the recipe has no entry
+    """
+    mean, weight = _prior()
+    if connection.features.can_return_columns_from_insert:
+        # UPDATE ... RETURNING (SQLite 3.35+, PostgreSQL): the new aggregates without a read.
+        # SET expressions see the row as it was, like the F() expressions below
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {connection.ops.quote_name(LeaderboardEntry._meta.db_table)} '
+                'SET rating_count = rating_count + %s, rating_sum = rating_sum + %s, '
+                'score = (rating_sum + %s) / (rating_count + %s) '
+                'WHERE recipe_id = %s RETURNING rating_count, rating_sum, score',
+                [count_delta, sum_delta, float(sum_delta + weight * mean), count_delta + weight, recipe_id],
+            )
+            row = cursor.fetchone()
+        return tuple(row) if row is not None else None
+    updated = LeaderboardEntry.objects.filter(recipe_id=recipe_id).update(
+        rating_count=F('rating_count') + count_delta,
+        rating_sum=F('rating_sum') + sum_delta,
+        score=ExpressionWrapper(
+            (F('rating_sum') + Value(sum_delta + weight * mean))
+            / (F('rating_count') + Value(count_delta + weight)),
+            output_field=FloatField(),
+        ),
+    )
+    if not updated:
+        return None
+    return LeaderboardEntry.objects.filter(recipe_id=recipe_id).values_list(
+        'rating_count', 'rating_sum', 'score',
+    ).first()
+
+
+def refresh(recipe_id):
+    """
+    Recompute the entry of one recipe from its ratings and compacted tally (used for new or
+    out-of-sync entries)
+    """
+    recipe = Recipe.objects.filter(id=recipe_id).only('id', 'status').first()
+    if recipe is None:
+        return None
+    totals = Rating.objects.filter(recipe_id=recipe_id).aggregate(count=Count('id'), total=Sum('score'))
+    compacted = RatingTally.objects.filter(recipe_id=recipe_id).values_list('rating_count', 'rating_sum').first()
+    rating_count = (totals['count'] or 0) + (compacted[0] if compacted else 0)
+    rating_sum = (totals['total'] or 0) + (compacted[1] if compacted else 0)
+    values = {
+        'is_ranked': recipe.status == 'approved',
+        'rating_count': rating_count,
+        'rating_sum': rating_sum,
+        'score': bayesian_score(rating_count, rating_sum),
+    }
+    # Plain autocommit writes: update_or_create's read-then-write transaction fails fast
+    # on SQLite when another worker holds the write lock
+    if not LeaderboardEntry.objects.filter(recipe_id=recipe_id).update(**values):
+        LeaderboardEntry.objects.create(recipe_id=recipe_id, **values)
+    return LeaderboardEntry(recipe_id=recipe_id, **values)
+
+
+def schedule_refresh(recipe_id):
+    """
+    Queue a full recompute of one entry on the job queue instead of aggregating inline
+    """
+    from . import jobs, tasks
+    jobs.enqueue(tasks.refresh_leaderboard, recipe_id, dedupe_key=f'leaderboard:{recipe_id}')
+
+
+def record_rating(recipe_id, previous_score, new_score):
+    """
+    Apply a created or changed rating to the leaderboard
+    previous_score is None when the user had not rated the recipe before
+    Returns the new (rating_count, rating_sum, score), or None when the entry was missing
+    and a recompute has been queued instead
+    """
+    count_delta = 0 if previous_score is not None else 1
+    sum_delta = new_score - (previous_score or 0)
+    aggregates = _apply_delta(recipe_id, count_delta, sum_delta)
+    if aggregates is None:
+        schedule_refresh(recipe_id)
+    return aggregates
+
+
+def discard_rating(recipe_id, score):
+    """
+    Remove a deleted rating from the leaderboard
+    No-op when the recipe entry itself is gone (e.g. cascading recipe deletion)
+    """
+    _apply_delta(recipe_id, -1, -score)
+
+
+def sync_recipe(recipe, created=False):
+    """
+    Keep the ranked flag in step with moderation status after a recipe is saved
+    A new recipe has no ratings yet, so its entry is written directly
+    """
+    if created:
+        LeaderboardEntry.objects.create(
+            recipe_id=recipe.id,
+            is_ranked=recipe.status == 'approved',
+            score=bayesian_score(0, 0),
+        )
+        return
+    updated = LeaderboardEntry.objects.filter(recipe_id=recipe.id).update(
+        is_ranked=recipe.status == 'approved'
+    )
+    if not updated:
+        schedule_refresh(recipe.id)
+
+
+def rebuild():
+    """
+    Recompute every entry from scratch (after bulk inserts or updates, which skip model signals)
+    """
+    totals = {
+        row['recipe_id']: (row['count'], row['total'])
+        for row in Rating.objects.values('recipe_id').annotate(count=Count('id'), total=Sum('score'))
+    }
+    compacted = {
+        recipe_id: (rating_count, rating_sum)
+        for recipe_id, rating_count, rating_sum
+        in RatingTally.objects.values_list('recipe_id', 'rating_count', 'rating_sum')
+    }
+    entries = []
+    for recipe_id, status in Recipe.objects.values_list('id', 'status'):
+        rating_count, rating_sum = totals.get(recipe_id, (0, 0))
+        compacted_count, compacted_sum = compacted.get(recipe_id, (0, 0))
+        rating_count += compacted_count
+        rating_sum += compacted_sum
+        entries.append(LeaderboardEntry(
+            recipe_id=recipe_id,
+            is_ranked=status == 'approved',
+            rating_count=rating_count,
+            rating_sum=rating_sum,
+            score=bayesian_score(rating_count, rating_sum),
+        ))
+    LeaderboardEntry.objects.all().delete()
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=500)
+    return len(entries)
+
+
+def top(limit):
+    """
+    Return the `limit` best ranked approved recipes, best first
+    Reads LeaderboardEntry through its (is_ranked, score) index
+    """
+    entries = (
+        LeaderboardEntry.objects
+        .filter(is_ranked=True)
+        .order_by('-score', '-rating_count')
+        .select_related('recipe', 'recipe__author')[:limit]
+    )
+    return [entry.recipe for entry in entries]
@@ -0,0 +1,108 @@
+"""
+Retention
+Moves long-declined recipes to the archive and folds old ratings into per-recipe tallies,
+one chunk per transaction, then reports the space reclaimed. Safe to interrupt: a later run
+picks up what is left (see recipes.retention)
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes import retention
+
+
+def _size(value):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(value) < 1024 or unit == 'GB':
+            return f'{value:.0f} {unit}' if unit == 'B' else f'{value:.1f} {unit}'
+        value /= 1024
+
+
+class Command(BaseCommand):
+    help = 'Archive long-declined recipes and compact old ratings into per-recipe tallies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--declined-days', type=int, default=None,
+                            help='Archive recipes declined this many days ago (default RETENTION_DECLINED_DAYS, 0 skips)')
+        parser.add_argument('--ratings-days', type=int, default=None,
+                            help='Compact ratings older than this many days (default RETENTION_RATINGS_DAYS, 0 skips)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows per transaction (default RETENTION_CHUNK_SIZE)')
+        parser.add_argument('--max-seconds', type=float, default=None,
+                            help='Stop after the chunk that crosses this budget; the next run resumes')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='Return the freed database pages to the filesystem (locks the database meanwhile)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived or compacted')
+
+    def handle(self, *args, **options):
+        declined_before = self.horizon(options['declined_days'], retention.declined_horizon)
+        ratings_before = self.horizon(options['ratings_days'], retention.ratings_horizon)
+        if options['dry_run']:
+            if declined_before is not None:
+                self.stdout.write(f'{retention.stale_recipes(declined_before).count()} recipes declined before '
+                                  f'{declined_before:%Y-%m-%d} would be archived')
+            if ratings_before is not None:
+                self.stdout.write(f'{retention.old_ratings(ratings_before).count()} ratings created before '
+                                  f'{ratings_before:%Y-%m-%d} would be compacted')
+            return
+
+        started = time.perf_counter()
+        deadline = started + options['max_seconds'] if options['max_seconds'] is not None else None
+        usage_before = retention.database_usage()
+        archived = released = compacted = 0
+        finished = True
+
+        if declined_before is not None:
+            after = 0
+            while True:
+                after, count, size = retention.archive_declined(declined_before, after, options['chunk_size'])
+                if after is None:
+                    break
+                archived += count
+                released += size
+                self.stdout.write(f'archived {archived} recipes (up to #{after})')
+                if deadline is not None and time.perf_counter() > deadline:
+                    finished = False
+                    break
+
+        if ratings_before is not None and finished:
+            after = 0
+            while True:
+                after, count = retention.compact_ratings(ratings_before, after, options['chunk_size'])
+                if after is None:
+                    break
+                compacted += count
+                self.stdout.write(f'compacted {compacted} ratings (up to #{after})')
+                if deadline is not None and time.perf_counter() > deadline:
+                    finished = False
+                    break
+
+        if options['vacuum'] and finished:
+            retention.vacuum()
+        self.report(released, usage_before, retention.database_usage())
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} recipes and compacted {compacted} ratings in {time.perf_counter() - started:.2f}s'
+            + ('' if finished else '; time budget spent, run again to continue')
+        ))
+
+    def horizon(self, days, default):
+        if days is None:
+            return default()
+        return timezone.now() - timedelta(days=days) if days else None
+
+    def report(self, released, before, after):
+        if released:
+            self.stdout.write(f'media: {_size(released)} left unreferenced, unlinked by the job queue after MEDIA_GC_GRACE')
+        if before is None or after is None:
+            return
+        (file_before, free_before), (file_after, free_after) = before, after
+        # Archive rows, tallies, tombstones and queued jobs take some of the freed pages back
+        reclaimed = (file_before - free_before) - (file_after - free_after)
+        self.stdout.write(
+            f'database: {_size(reclaimed)} reclaimed, file {_size(file_before)} -> {_size(file_after)}, '
+            f'{_size(free_after)} free for reuse'
+        )
+        if free_after and file_after >= file_before:
+            self.stdout.write('run with --vacuum to return the free pages to the filesystem')
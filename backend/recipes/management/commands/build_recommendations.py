@@ -0,0 +1,30 @@
+"""
+Recommendation maintenance
+Rebuilds every recipe's item-item neighbor list from the full rating matrix, or only
+refreshes the lists of recipes rated since the last build
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed item-item neighbor lists behind recommended recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-only', action='store_true',
+                            help='Only refresh recipes rated since the last build (what the job does)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['stale_only']:
+            count = recommendations.refresh_stale()
+            action = 'Refreshed'
+        else:
+            count = recommendations.rebuild()
+            action = 'Rebuilt'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} neighbor lists of {count} recipes in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,21 @@
+"""
+Similar-recipes index maintenance
+Re-signs every recipe and rebuilds the LSH buckets and document frequencies, e.g. after
+changing SIMILAR_MINHASH_PERMUTATIONS or SIMILAR_LSH_BANDS
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import similar
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the MinHash/LSH index behind similar recipes'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = similar.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} recipes in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,30 @@
+"""
+Outbox dispatcher process
+Drains OutboxEvent rows when side effects are not dispatched inside the ASGI process
+(requires a channel layer shared between processes, such as channels_redis)
+"""
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from recipes import outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending outbox events (WebSocket broadcasts)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain pending events and exit')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between passes')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options['once'], options['poll']))
+
+    async def run(self, once, poll):
+        while True:
+            delivered = await outbox.dispatch_pending()
+            if delivered:
+                self.stdout.write(f'Delivered {delivered} events')
+            if once:
+                return
+            await asyncio.sleep(poll)
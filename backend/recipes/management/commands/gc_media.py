@@ -0,0 +1,112 @@
+"""
+Media blob maintenance
+Unlinks unreferenced content-addressed blobs, optionally recounting references from the
+database and adopting files uploaded before content addressing into blob storage
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import F, FileField
+from django.utils import timezone
+
+from cookbook.storage import ContentAddressedStorage, is_blob_name
+from recipes.models import MediaBlob
+
+
+def file_fields():
+    """
+    Yield (model, field name) for every FileField/ImageField in the project
+    """
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, FileField):
+                yield model, field.name
+
+
+class Command(BaseCommand):
+    help = 'Unlink unreferenced media blobs (and optionally recount or adopt legacy files)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-minutes', type=int, default=10,
+                            help='Only collect blobs unreferenced for at least this long')
+        parser.add_argument('--recount', action='store_true',
+                            help='Rebuild reference counts from the file fields in the database')
+        parser.add_argument('--adopt-legacy', action='store_true',
+                            help='Move files stored under their original names into blob storage')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            self.stderr.write('Default storage is not ContentAddressedStorage; nothing to do.')
+            return
+
+        if options['adopt_legacy']:
+            self.adopt_legacy(options['dry_run'])
+        if options['recount']:
+            self.recount(options['dry_run'])
+
+        cutoff = timezone.now() - timedelta(minutes=options['grace_minutes'])
+        candidates = list(
+            MediaBlob.objects.filter(refcount=0, updated_at__lt=cutoff).values_list('name', flat=True)
+        )
+        reclaimed = 0
+        collected = 0
+        for name in candidates:
+            if options['dry_run']:
+                self.stdout.write(f'would collect {name}')
+                continue
+            size = default_storage.collect(name)
+            if size:
+                collected += 1
+                reclaimed += size
+        self.stdout.write(self.style.SUCCESS(
+            f'Collected {collected} of {len(candidates)} unreferenced blobs, reclaimed {reclaimed} bytes'
+        ))
+
+    def recount(self, dry_run):
+        """
+        Set every blob's refcount to the number of rows pointing at it
+        Repairs drift such as images of recipes removed by a cascading user delete
+        """
+        counts = {}
+        for model, field_name in file_fields():
+            for name in model._default_manager.exclude(**{field_name: ''}).values_list(field_name, flat=True):
+                if name and is_blob_name(name):
+                    counts[name] = counts.get(name, 0) + 1
+        changed = 0
+        for blob in MediaBlob.objects.all():
+            refcount = counts.get(blob.name, 0)
+            if blob.refcount != refcount:
+                changed += 1
+                self.stdout.write(f'{blob.name}: {blob.refcount} -> {refcount}')
+                if not dry_run:
+                    MediaBlob.objects.filter(name=blob.name).update(refcount=refcount, updated_at=timezone.now())
+        self.stdout.write(f'Recounted {len(counts)} referenced blobs, {changed} corrected')
+
+    def adopt_legacy(self, dry_run):
+        """
+        Re-store files that still use their upload name, deduplicating identical images
+        """
+        adopted = {}
+        for model, field_name in file_fields():
+            for obj in model._default_manager.exclude(**{field_name: ''}).iterator():
+                fieldfile = getattr(obj, field_name)
+                name = fieldfile.name
+                if not name or is_blob_name(name):
+                    continue
+                if dry_run:
+                    self.stdout.write(f'would adopt {name}')
+                    continue
+                if name not in adopted:
+                    if not default_storage.exists(name):
+                        self.stderr.write(f'missing file {name}, skipped')
+                        continue
+                    adopted[name] = default_storage.adopt(name)
+                else:
+                    # Same legacy file referenced twice: take another reference to its blob
+                    MediaBlob.objects.filter(name=adopted[name]).update(refcount=F('refcount') + 1)
+                fieldfile.name = adopted[name]
+                obj.save(update_fields=[field_name])
+                self.stdout.write(f'{name} -> {adopted[name]}')
@@ -0,0 +1,34 @@
+"""
+Job queue worker
+Runs jobs from the Job table on a thread or process pool until interrupted
+"""
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from recipes import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (leaderboard recomputes, media cleanup)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Jobs run in parallel')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                            help='Run jobs on threads (I/O bound) or processes (CPU bound)')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between queue polls')
+        parser.add_argument('--once', action='store_true', help='Drain ready jobs and exit')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        # Finish in-flight jobs on Ctrl+C / SIGTERM instead of abandoning their leases
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+        worker = jobs.Worker(
+            concurrency=options['concurrency'], pool=options['pool'], poll_seconds=options['poll']
+        )
+        self.stdout.write(f'Worker {worker.worker_id} started ({options["pool"]} pool x{options["concurrency"]})')
+        processed = worker.run(stop=stop, once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} jobs'))
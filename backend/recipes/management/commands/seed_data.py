@@ -0,0 +1,44 @@
+"""
+Development and benchmark data
+Adds the sample kitchen (super admins, their recipes and ratings, homepage content) and, on
+request, deterministic synthetic users, recipes and ratings in bulk
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import seed
+
+
+class Command(BaseCommand):
+    help = 'Seed the sample kitchen plus synthetic users, recipes and ratings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=0, help='Synthetic users to add')
+        parser.add_argument('--recipes', type=int, default=0, help='Synthetic recipes to add')
+        parser.add_argument('--ratings-per-recipe', type=int, default=0,
+                            help='Ratings on each synthetic recipe, by distinct users')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic data')
+        parser.add_argument('--password', default=seed.SAMPLE_PASSWORD, help='Password of every seeded user')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created = seed.seed(
+            users=options['users'],
+            recipes=options['recipes'],
+            ratings_per_recipe=options['ratings_per_recipe'],
+            seed=options['seed'],
+            password=options['password'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {created['users']} users, {created['recipes']} recipes and {created['ratings']} "
+            f"ratings in {time.perf_counter() - started:.2f}s"
+        ))
+        if options['recipes']:
+            self.stdout.write(
+                'Similar recipes and recommendations do not cover synthetic recipes yet: run '
+                'build_similarity_index and build_recommendations'
+            )
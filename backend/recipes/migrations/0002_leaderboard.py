@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def backfill_leaderboard(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Rating = apps.get_model('recipes', 'Rating')
+    LeaderboardEntry = apps.get_model('recipes', 'LeaderboardEntry')
+    mean = float(getattr(settings, 'LEADERBOARD_PRIOR_MEAN', 3.0))
+    weight = int(getattr(settings, 'LEADERBOARD_PRIOR_WEIGHT', 5))
+    totals = {
+        row['recipe_id']: (row['count'], row['total'])
+        for row in Rating.objects.values('recipe_id').annotate(count=Count('id'), total=Sum('score'))
+    }
+    entries = []
+    for recipe_id, status in Recipe.objects.values_list('id', 'status'):
+        rating_count, rating_sum = totals.get(recipe_id, (0, 0))
+        entries.append(LeaderboardEntry(
+            recipe_id=recipe_id,
+            is_ranked=status == 'approved',
+            rating_count=rating_count,
+            rating_sum=rating_sum,
+            score=(rating_sum + weight * mean) / (rating_count + weight),
+        ))
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard', serialize=False, to='recipes.recipe')),
+                ('is_ranked', models.BooleanField(default=False)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_ranked', '-score', '-rating_count'], name='leaderboard_rank_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_leaderboard, migrations.RunPython.noop),
+    ]
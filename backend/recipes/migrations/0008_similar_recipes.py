@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import Counter
+
+
+def backfill_profiles(apps, schema_editor):
+    from recipes import similar
+
+    Recipe = apps.get_model('recipes', 'Recipe')
+    SimilarityProfile = apps.get_model('recipes', 'SimilarityProfile')
+    SimilarityBucket = apps.get_model('recipes', 'SimilarityBucket')
+    DocumentFrequency = apps.get_model('recipes', 'DocumentFrequency')
+    frequencies = Counter()
+    for recipe in Recipe.objects.only('id', 'title', 'description', 'ingredients').iterator():
+        ingredient_signature, text_signature, terms = similar.features(recipe)
+        frequencies.update(terms.keys())
+        SimilarityProfile.objects.create(
+            recipe_id=recipe.id, ingredient_signature=ingredient_signature, text_signature=text_signature,
+            terms=terms, fingerprint=similar.fingerprint(recipe),
+        )
+        SimilarityBucket.objects.bulk_create([
+            SimilarityBucket(recipe_id=recipe.id, key=key) for key in similar.keys_for(ingredient_signature, text_signature)
+        ])
+    DocumentFrequency.objects.bulk_create(
+        [DocumentFrequency(term=term, documents=count) for term, count in frequencies.items()], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentFrequency',
+            fields=[
+                ('term', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('documents', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SimilarityProfile',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similarity_profile', serialize=False, to='recipes.recipe')),
+                ('ingredient_signature', models.JSONField(default=list)),
+                ('text_signature', models.JSONField(default=list)),
+                ('terms', models.JSONField(default=dict)),
+                ('fingerprint', models.CharField(max_length=32)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SimilarityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'recipe'], name='similarity_bucket_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationClaim',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='moderation_claim', serialize=False, to='recipes.recipe')),
+                ('claimed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at', 'id'], name='recipe_pending_idx'),
+        ),
+        migrations.AddField(
+            model_name='moderationclaim',
+            name='moderator',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_moderation_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRecipe',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('author_id', models.BigIntegerField(db_index=True)),
+                ('title', models.CharField(max_length=200)),
+                ('declined_at', models.DateTimeField()),
+                ('data', models.JSONField(default=dict)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RatingTally',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_tally', serialize=False, to='recipes.recipe')),
+                ('rating_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
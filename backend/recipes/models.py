@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 import json
 
@@ -39,20 +41,37 @@ class Recipe(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Moderation queue: only pending rows, oldest first (recipes.moderation)
+            models.Index(fields=['created_at', 'id'], condition=models.Q(status='pending'),
+                         name='recipe_pending_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
+    def rating_totals(self):
+        """
+        (count, sum) of the recipe's ratings, including those compacted into its RatingTally
+        """
+        ratings = self.ratings.all()
+        rating_count, rating_sum = len(ratings), sum(r.score for r in ratings)
+        try:
+            tally = self.rating_tally
+        except ObjectDoesNotExist:
+            return rating_count, rating_sum
+        return rating_count + tally.rating_count, rating_sum + tally.rating_sum
+    
     @property
     def average_rating(self):
-        ratings = self.ratings.all()
-        if ratings:
-            return sum(r.score for r in ratings) / len(ratings)
+        rating_count, rating_sum = self.rating_totals()
+        if rating_count:
+            return rating_sum / rating_count
         return 0
     
     @property
     def total_ratings(self):
-        return self.ratings.count()
+        return self.rating_totals()[0]
 
 class Rating(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ratings')
@@ -76,3 +95,243 @@ class HomepageContent(models.Model):
     
     def __str__(self):
         return "Homepage Content"
+
+class LeaderboardEntry(models.Model):
+    """
+    Denormalized rating aggregates and Bayesian ranking score for a recipe
+    Maintained incrementally by recipes.leaderboard so Top-N reads never aggregate ratings
+    """
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True, related_name='leaderboard')
+    is_ranked = models.BooleanField(default=False)  # Mirrors status == 'approved'
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_ranked', '-score', '-rating_count'], name='leaderboard_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.recipe_id}: {self.score:.3f} ({self.rating_count} ratings)"
+
+class MediaBlob(models.Model):
+    """
+    Reference count for a content-addressed media file (cookbook.storage.ContentAddressedStorage)
+    Rows at refcount 0 are unreferenced and get unlinked by `manage.py gc_media`
+    """
+    name = models.CharField(max_length=100, primary_key=True)  # blobs/ab/<sha256>.ext
+    digest = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField(default=0)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+class OutboxEvent(models.Model):
+    """
+    Side effect recorded in the same transaction as the model change that caused it
+    Drained after commit by recipes.outbox (WebSocket broadcasts, media file deletes)
+    """
+    KIND_CHOICES = [
+        ('broadcast', 'Broadcast'),
+        ('delete_file', 'Delete file'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_by = models.CharField(max_length=40, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"#{self.id} {self.kind}"
+
+class Job(models.Model):
+    """
+    Deferred unit of work for the database-backed job queue (recipes.jobs)
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list)
+    priority = models.IntegerField(default=0)  # Higher runs first
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now)
+    dedupe_key = models.CharField(max_length=200, blank=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=40, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='job_ready_idx'),
+            models.Index(fields=['dedupe_key', 'status'], name='job_dedupe_idx'),
+            models.Index(fields=['finished_at'], name='job_finished_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.id} {self.name} ({self.status})"
+
+class RecipeChange(models.Model):
+    """
+    Change log behind the incremental sync API (recipes.changes)
+    Holds one row per recipe: recording a change replaces the previous row, so the id is
+    both the sync cursor and the point at which the recipe last changed
+    """
+    KIND_CHOICES = [
+        ('upsert', 'Created or updated'),
+        ('delete', 'Deleted'),
+    ]
+    
+    recipe_id = models.BigIntegerField(unique=True)  # No foreign key: tombstones outlive the recipe
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"#{self.id} {self.kind} recipe {self.recipe_id}"
+
+class RecipeNeighbor(models.Model):
+    """
+    One entry of a recipe's precomputed top-K item-item neighbor list (recipes.recommendations)
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+')
+    similarity = models.FloatField()
+    
+    class Meta:
+        unique_together = ('recipe', 'neighbor')
+    
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.neighbor_id}: {self.similarity:.3f}"
+
+class NeighborRefresh(models.Model):
+    """
+    Recipe whose ratings changed after its neighbor list was computed
+    Drained in batches by the refresh_recommendations job
+    """
+    recipe_id = models.BigIntegerField(primary_key=True)  # No foreign key: deleted recipes need no refresh
+    requested_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"refresh neighbors of recipe {self.recipe_id}"
+
+class SimilarityProfile(models.Model):
+    """
+    MinHash signatures and term counts of a recipe (recipes.similar)
+    `fingerprint` hashes the indexed fields so unrelated saves skip re-indexing
+    """
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True,
+                                  related_name='similarity_profile')
+    ingredient_signature = models.JSONField(default=list)
+    text_signature = models.JSONField(default=list)
+    terms = models.JSONField(default=dict)  # {term: weighted count} of title and description
+    fingerprint = models.CharField(max_length=32)
+    
+    def __str__(self):
+        return f"similarity profile of recipe {self.recipe_id}"
+
+class SimilarityBucket(models.Model):
+    """
+    One LSH band of a recipe's signatures; recipes sharing a key are similar candidates
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+')
+    key = models.BigIntegerField()
+    
+    class Meta:
+        indexes = [
+            # Covering index: lookups count candidates per recipe without reading the table
+            models.Index(fields=['key', 'recipe'], name='similarity_bucket_idx'),
+        ]
+    
+    def __str__(self):
+        return f"bucket {self.key}: recipe {self.recipe_id}"
+
+class DocumentFrequency(models.Model):
+    """
+    Number of indexed recipes whose title or description uses a term (TF-IDF weights)
+    """
+    term = models.CharField(max_length=100, primary_key=True)
+    documents = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.term}: {self.documents}"
+
+class ModerationClaim(models.Model):
+    """
+    Lease on a pending recipe held by the moderator reviewing it (recipes.moderation)
+    An expired lease counts as free and is taken over by the next claim
+    """
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True,
+                                  related_name='moderation_claim')
+    moderator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    claimed_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"recipe {self.recipe_id} claimed by {self.moderator_id} until {self.expires_at}"
+
+class RatingTally(models.Model):
+    """
+    Ratings older than the retention horizon, folded into counts by recipes.retention
+    Averages, totals and the leaderboard add these to the recipe's remaining ratings; each
+    rater's share is kept in CompactedRating
+    """
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True,
+                                  related_name='rating_tally')
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"recipe {self.recipe_id}: {self.rating_count} compacted ratings"
+
+class CompactedRating(models.Model):
+    """
+    Who gave which score in a RatingTally, without the rating row
+    Lets a rater who rates the recipe again replace their compacted share instead of being
+    counted twice
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='compacted_ratings')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    score = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        unique_together = ('recipe', 'user')
+    
+    def __str__(self):
+        return f"{self.user_id} rated recipe {self.recipe_id}: {self.score} (compacted)"
+
+class ArchivedRecipe(models.Model):
+    """
+    A declined recipe moved out of the recipe tables by recipes.retention
+    Keeps its last representation, ratings included, under its original id
+    """
+    id = models.BigIntegerField(primary_key=True)
+    author_id = models.BigIntegerField(db_index=True)  # No foreign key: archives outlive their authors
+    title = models.CharField(max_length=200)
+    declined_at = models.DateTimeField()
+    data = models.JSONField(default=dict)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"#{self.id} {self.title} (archived {self.archived_at:%Y-%m-%d})"
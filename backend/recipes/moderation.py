@@ -0,0 +1,122 @@
+"""
+Moderation Queue
+Pending recipes oldest first, read through a partial index that holds only pending rows, so
+the queue costs the same however many recipes have been approved.
+A moderator claims a recipe before reviewing it. The claim is a lease of
+MODERATION_CLAIM_SECONDS, renewed by claiming again; an abandoned review returns to the queue
+when its lease runs out, and while it holds no one else can claim, approve or decline the recipe.
+Every queue change is broadcast to the 'moderators' WebSocket group with the pending count.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import outbox
+from .models import ModerationClaim, Recipe
+
+GROUP = 'moderators'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def pending():
+    return Recipe.objects.filter(status='pending')
+
+
+def pending_count():
+    return pending().count()
+
+
+def queue(offset, limit, moderator=None, available=False):
+    """
+    Return (number of pending recipes, page of them oldest first with their claims)
+    `available` leaves out recipes other moderators hold a live claim on
+    """
+    queryset = pending()
+    if available:
+        queryset = queryset.exclude(id__in=ModerationClaim.objects.filter(
+            expires_at__gt=timezone.now(),
+        ).exclude(moderator=moderator).values('recipe_id'))
+    total = queryset.count()
+    page = list(
+        queryset.select_related('author', 'moderation_claim__moderator')
+        .only('id', 'title', 'description', 'ingredients', 'servings', 'image', 'created_at',
+              'author__id', 'author__username', 'moderation_claim__expires_at',
+              'moderation_claim__moderator__id', 'moderation_claim__moderator__username')
+        .order_by('created_at', 'id')[offset:offset + limit]
+    )
+    return total, page
+
+
+def active_claim(recipe):
+    """
+    The live claim on a recipe (with its moderator loaded), or None
+    """
+    try:
+        claim = recipe.moderation_claim
+    except ModerationClaim.DoesNotExist:
+        return None
+    return claim if claim.expires_at > timezone.now() else None
+
+
+def claim(recipe_id, moderator):
+    """
+    Take or renew the lease on a pending recipe
+    Returns (claim, acquired): the caller's claim, or the live claim of another moderator
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=_setting('MODERATION_CLAIM_SECONDS', 300))
+    with transaction.atomic():
+        taken = ModerationClaim.objects.filter(recipe_id=recipe_id).filter(
+            Q(moderator=moderator) | Q(expires_at__lte=now)
+        ).update(moderator=moderator, claimed_at=now, expires_at=expires_at)
+        if not taken:
+            try:
+                with transaction.atomic():
+                    ModerationClaim.objects.create(
+                        recipe_id=recipe_id, moderator=moderator, claimed_at=now, expires_at=expires_at,
+                    )
+            except IntegrityError:
+                # Someone else holds a live lease (or got there first)
+                return ModerationClaim.objects.select_related('moderator').get(recipe_id=recipe_id), False
+    return ModerationClaim(recipe_id=recipe_id, moderator=moderator, claimed_at=now, expires_at=expires_at), True
+
+
+def release(recipe_id, moderator):
+    """
+    Give up a claim; returns whether the moderator held one
+    """
+    deleted, _ = ModerationClaim.objects.filter(recipe_id=recipe_id, moderator=moderator).delete()
+    return bool(deleted)
+
+
+def blocking_claim(recipe, moderator):
+    """
+    A live claim by another moderator that stops `moderator` from deciding on the recipe
+    """
+    claim = active_claim(recipe)
+    return claim if claim is not None and claim.moderator_id != moderator.id else None
+
+
+def decided(recipe_id):
+    """
+    A recipe left the queue: drop its claim
+    """
+    ModerationClaim.objects.filter(recipe_id=recipe_id).delete()
+
+
+def publish(action, recipe_id, **data):
+    """
+    Tell moderators the queue changed (sent after the surrounding transaction commits)
+    """
+    outbox.publish(GROUP, 'moderation_update', {
+        'action': action,
+        'recipe_id': recipe_id,
+        'pending_count': pending_count(),
+        **data,
+    })
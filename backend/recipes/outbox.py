@@ -0,0 +1,226 @@
+"""
+Transactional Outbox for Broadcasts and Side Effects
+Views record WebSocket broadcasts as OutboxEvent rows in the same transaction as their
+model changes. After commit a dispatcher drains the rows in batches,
+so a slow channel layer never stalls a request and a rolled-back request sends nothing.
+Rows are claimed with a lease before dispatch, which gives at-least-once delivery across
+several dispatchers and effectively exactly-once with a single one.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from cookbook import metrics
+from . import replay
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+BROADCASTS_PUBLISHED = metrics.Counter(
+    'broadcasts_published_total', 'Broadcasts queued by views (sent only if their transaction commits)', ('type',),
+)
+BROADCASTS_SENT = metrics.Counter('broadcasts_sent_total', 'Broadcasts handed to the channel layer', ('type',))
+BROADCAST_SEND = metrics.Histogram(
+    'broadcast_send_seconds', 'Time for one group_send fan-out to the channel layer', ('type',),
+)
+BROADCAST_LAG = metrics.Histogram(
+    'broadcast_lag_seconds', 'Time from queueing a broadcast to sending it', ('type',),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# A claimed batch not finished within this time is picked up by another dispatcher
+CLAIM_LEASE = timedelta(seconds=60)
+
+_loop = None
+_wakeup = None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==================== PRODUCERS ====================
+
+def publish(group_name, message_type, data):
+    """
+    Queue a WebSocket broadcast; it is sent only if the surrounding transaction commits
+    """
+    OutboxEvent.objects.create(
+        kind='broadcast',
+        payload={'group': group_name, 'type': message_type, 'data': data},
+    )
+    BROADCASTS_PUBLISHED.labels(message_type).inc()
+    transaction.on_commit(notify)
+
+
+def notify():
+    """
+    Wake the in-process dispatcher (safe to call from any thread)
+    """
+    if _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+# ==================== DISPATCHER ====================
+
+def claim_batch(batch_size, dispatcher_id):
+    """
+    Lease up to batch_size undispatched events to this dispatcher, oldest first
+    """
+    close_old_connections()
+    now = timezone.now()
+    ids = OutboxEvent.objects.filter(
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - CLAIM_LEASE),
+        dispatched_at__isnull=True,
+    ).order_by('id').values('id')[:batch_size]
+    OutboxEvent.objects.filter(id__in=ids).update(claimed_by=dispatcher_id, claimed_at=now)
+    return list(OutboxEvent.objects.filter(claimed_by=dispatcher_id, dispatched_at__isnull=True).order_by('id'))
+
+
+def finish_batch(done, failed):
+    """
+    Mark delivered events, release failed ones for retry (or give up after too many attempts)
+    """
+    now = timezone.now()
+    if done:
+        OutboxEvent.objects.filter(id__in=done).update(dispatched_at=now)
+    max_attempts = _setting('OUTBOX_MAX_ATTEMPTS', 5)
+    for event_id, error in failed:
+        OutboxEvent.objects.filter(id=event_id).update(
+            attempts=F('attempts') + 1, last_error=error, claimed_by='', claimed_at=None
+        )
+    if failed:
+        # Dead letters keep their last_error for inspection but stop being retried
+        OutboxEvent.objects.filter(
+            id__in=[event_id for event_id, _ in failed], attempts__gte=max_attempts
+        ).update(dispatched_at=now)
+
+
+def prune():
+    """
+    Drop delivered events past the retention window
+    """
+    horizon = timezone.now() - _setting('OUTBOX_RETENTION', timedelta(days=1))
+    deleted, _ = OutboxEvent.objects.filter(dispatched_at__lt=horizon).delete()
+    return deleted
+
+
+async def perform(event, channel_layer):
+    """
+    Carry out one side effect
+    """
+    if event.kind == 'broadcast':
+        payload = event.payload
+        frame = replay.encode_frame(event.id, payload['type'], payload['data'])
+        # Recorded before sending: a client resuming in between gets it from the buffer
+        # and drops the live copy by its sequence number
+        replay.buffer.record(event.id, payload['group'], frame)
+        started = time.perf_counter()
+        await channel_layer.group_send(payload['group'], {
+            'type': payload['type'],
+            'seq': event.id,
+            'frame': frame,
+        })
+        BROADCAST_SEND.labels(payload['type']).observe(time.perf_counter() - started)
+        BROADCAST_LAG.labels(payload['type']).observe((timezone.now() - event.created_at).total_seconds())
+        BROADCASTS_SENT.labels(payload['type']).inc()
+    elif event.kind == 'delete_file':
+        # Media deletes now go through the job queue (recipes.tasks.release_media);
+        # this drains rows queued before the switch
+        await sync_to_async(default_storage.delete)(event.payload['name'])
+    else:
+        raise ValueError(f'Unknown outbox event kind: {event.kind}')
+
+
+async def dispatch_pending(dispatcher_id=None):
+    """
+    Drain every pending event in batches; returns the number delivered
+    Must run on the event loop that owns the channel layer (the ASGI server loop
+    for the in-memory layer)
+    """
+    # Imported here so API-only processes (cookbook.settings_api) never load Channels
+    from channels.layers import get_channel_layer
+
+    dispatcher_id = dispatcher_id or uuid.uuid4().hex
+    channel_layer = get_channel_layer()
+    batch_size = _setting('OUTBOX_BATCH_SIZE', 100)
+    delivered = 0
+    while True:
+        events = await sync_to_async(claim_batch)(batch_size, dispatcher_id)
+        if not events:
+            return delivered
+        done, failed = [], []
+        for event in events:
+            try:
+                await perform(event, channel_layer)
+                done.append(event.id)
+            except Exception as exc:
+                logger.exception('Outbox event %s failed', event.id)
+                failed.append((event.id, repr(exc)))
+        await sync_to_async(finish_batch)(done, failed)
+        delivered += len(done)
+
+
+async def run_dispatcher(poll_seconds=None):
+    """
+    Dispatch forever: immediately when notified after a commit, otherwise every poll interval
+    """
+    poll_seconds = poll_seconds or _setting('OUTBOX_POLL_SECONDS', 5)
+    dispatcher_id = uuid.uuid4().hex
+    last_prune = None
+    try:
+        # Let clients that reconnect right after a restart resume from memory
+        if replay.buffer.latest is None:
+            replay.buffer.prime(await sync_to_async(replay.recent_rows)(replay.buffer.events.maxlen))
+    except Exception:
+        logger.exception('Replay buffer priming failed')
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        try:
+            await dispatch_pending(dispatcher_id)
+            now = timezone.now()
+            if last_prune is None or now - last_prune > timedelta(minutes=10):
+                await sync_to_async(prune)()
+                last_prune = now
+        except Exception:
+            logger.exception('Outbox dispatch pass failed')
+
+
+def start_dispatcher():
+    """
+    Start the dispatcher task on the running event loop (once per process)
+    """
+    global _loop, _wakeup
+    if _loop is not None:
+        return
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    _wakeup.set()  # Drain anything left over from before this process started
+    _loop.create_task(run_dispatcher())
+
+
+class OutboxDispatcherMiddleware:
+    """
+    ASGI middleware that starts the in-process dispatcher on the server's event loop
+    with the first connection, so broadcasts reach sockets held by this process
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if _loop is None and scope['type'] in ('http', 'websocket') and _setting('OUTBOX_DISPATCH_IN_PROCESS', True):
+            start_dispatcher()
+        return await self.app(scope, receive, send)
@@ -0,0 +1,84 @@
+"""
+Rating Writes
+A rating starts with an INSERT ... ON CONFLICT DO NOTHING, so the first statement of the
+transaction is a write and takes SQLite's write lock before anything is read. update_or_create
+read first: its read lock then had to be upgraded, which fails at once with "database is
+locked" when another rater committed in between, and two first ratings could both miss the
+SELECT and collide on the unique constraint. The leaderboard aggregates move by the difference
+in the same transaction and come back from the UPDATE (recipes.leaderboard), so the rating
+view patches them into the cached recipe instead of re-reading the ratings table.
+SQLite's RETURNING reports the row as written, never as it was, so a repeat rating reads the
+previous score right after the insert attempt, still under the write lock.
+"""
+from django.db import connection
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from . import leaderboard
+from .models import CompactedRating, Rating, Recipe
+
+
+def _insert(recipe_id, user_id, score, created_at):
+    """
+    Insert a first rating; returns its id, or None when the user already rated the recipe
+    or the recipe does not exist
+    """
+    quote = connection.ops.quote_name
+    recipe, user, *rest = [
+        quote(Rating._meta.get_field(name).column) for name in ('recipe', 'user', 'score', 'created_at')
+    ]
+    recipes = quote(Recipe._meta.db_table)
+    # The WHERE also keeps SQLite from reading ON CONFLICT as a join constraint
+    sql = (
+        f'INSERT INTO {quote(Rating._meta.db_table)} ({", ".join([recipe, user, *rest])}) '
+        f'SELECT %s, %s, %s, %s WHERE EXISTS (SELECT 1 FROM {recipes} WHERE {quote(Recipe._meta.pk.column)} = %s) '
+        f'ON CONFLICT ({recipe}, {user}) DO NOTHING'
+    )
+    params = [
+        recipe_id, user_id, score,
+        Rating._meta.get_field('created_at').get_db_prep_value(created_at, connection),
+        recipe_id,
+    ]
+    with connection.cursor() as cursor:
+        if connection.features.can_return_columns_from_insert:
+            cursor.execute(sql + ' RETURNING id', params)
+            row = cursor.fetchone()
+            return row[0] if row is not None else None
+        cursor.execute(sql, params)
+        return cursor.lastrowid if cursor.rowcount == 1 else None
+
+
+def rate(recipe_id, user, score):
+    """
+    Create or replace a user's rating of a recipe and move the leaderboard; call in a transaction
+    Returns (rating, previous score or None, new (rating_count, rating_sum, score) or None when
+    the recipe had no leaderboard entry), or None when the recipe does not exist
+    """
+    now = timezone.now()
+    rating_id = _insert(recipe_id, user.id, score, now)
+    if rating_id is not None:
+        previous_score, created_at = None, now
+        # A compacted rating by the same user leaves the tally and the leaderboard first
+        # (see the CompactedRating post_delete signal), so the new one replaces it
+        CompactedRating.objects.filter(recipe_id=recipe_id, user=user).delete()
+    else:
+        existing = Rating.objects.filter(recipe_id=recipe_id, user=user).values_list(
+            'id', 'score', 'created_at',
+        ).first()
+        if existing is None:
+            return None
+        rating_id, previous_score, created_at = existing
+        if previous_score != score:
+            Rating.objects.filter(id=rating_id).update(score=score)
+    rating = Rating(id=rating_id, recipe_id=recipe_id, user=user, score=score, created_at=created_at)
+    # Tells the post_save receiver that the leaderboard already moved
+    rating.leaderboard_recorded = True
+    aggregates = leaderboard.record_rating(recipe_id, previous_score, score)
+    if previous_score != score:
+        # The statements above bypass Model.save(): retire the cached recipe and log the
+        # change like a saved rating would
+        post_save.send(
+            sender=Rating, instance=rating, created=previous_score is None,
+            update_fields=None, raw=False, using=connection.alias,
+        )
+    return rating, previous_score, aggregates
@@ -0,0 +1,286 @@
+"""
+Item-item Recommendations from the Rating Matrix
+Ratings form a sparse user x recipe matrix. Each rating is centered on its user's mean
+(adjusted cosine, so generous and harsh raters count alike), recipe columns are normalized,
+and the similarity of two recipes is the dot product of their columns, shrunk toward zero when
+few users rated both. Every recipe keeps only its top-K neighbors in RecipeNeighbor, so a
+"recommended for you" lookup reads K rows per seed recipe instead of touching the matrix.
+
+Lists are rebuilt in full by `manage.py build_recommendations`. Between rebuilds a rating
+marks its recipe stale and the refresh_recommendations job recomputes the stale recipes'
+columns, rewrites their lists and patches them into the lists of the other recipes. Drift from
+shifted user means is corrected by the next full rebuild.
+NumPy and SciPy are imported inside the build functions; web requests never load them.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg
+from django.utils import timezone
+
+from . import leaderboard
+from .models import NeighborRefresh, Rating, Recipe, RecipeNeighbor
+
+# Columns of the similarity matrix computed at a time (bounds memory to items x BLOCK floats)
+BLOCK = 512
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==================== OFFLINE COMPUTATION ====================
+
+class RatingMatrix:
+    """
+    Normalized, user-centered rating matrix plus the 0/1 matrix of who rated what
+    """
+    def __init__(self, user_ids, recipe_ids, scores):
+        import numpy as np
+        from scipy import sparse
+
+        users, user_index = np.unique(user_ids, return_inverse=True)
+        self.recipe_ids, item_index = np.unique(recipe_ids, return_inverse=True)
+        self.positions = {int(recipe_id): position for position, recipe_id in enumerate(self.recipe_ids)}
+        shape = (len(users), len(self.recipe_ids))
+
+        scores = np.asarray(scores, dtype=np.float64)
+        means = np.bincount(user_index, weights=scores, minlength=len(users)) / np.bincount(user_index, minlength=len(users))
+        centered = sparse.csc_matrix((scores - means[user_index], (user_index, item_index)), shape=shape)
+        norms = np.sqrt(np.asarray(centered.multiply(centered).sum(axis=0)).ravel())
+        # Recipes every rater scored at their own mean carry no signal
+        norms[norms == 0] = np.inf
+        self.normalized = (centered @ sparse.diags(1 / norms)).tocsc()
+        self.normalized_t = self.normalized.T.tocsr()
+        self.rated = sparse.csc_matrix((np.ones(len(scores)), (user_index, item_index)), shape=shape)
+        self.rated_t = self.rated.T.tocsr()
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def similarities(self, positions, shrinkage):
+        """
+        Dense (recipes x len(positions)) block of similarities to the given recipe columns
+        """
+        import numpy as np
+
+        block = (self.normalized_t @ self.normalized[:, positions]).toarray()
+        if shrinkage:
+            co_rated = (self.rated_t @ self.rated[:, positions]).toarray()
+            block *= co_rated / (co_rated + shrinkage)
+        block[positions, np.arange(len(positions))] = 0
+        return block
+
+
+def load_matrix():
+    """
+    The whole Rating table as a RatingMatrix, or None when nobody has rated anything
+    """
+    import numpy as np
+
+    rows = np.array(list(Rating.objects.values_list('user_id', 'recipe_id', 'score')), dtype=np.int64)
+    if not len(rows):
+        return None
+    return RatingMatrix(rows[:, 0], rows[:, 1], rows[:, 2])
+
+
+def top_neighbors(block, positions, k):
+    """
+    Yield (position, [(neighbor position, similarity)]) with the K most similar positive neighbors
+    """
+    import numpy as np
+
+    k = min(k, block.shape[0] - 1)
+    if k <= 0:
+        for position in positions:
+            yield position, []
+        return
+    candidates = np.argpartition(-block, k - 1, axis=0)[:k]
+    for column, position in enumerate(positions):
+        similarities = block[candidates[:, column], column]
+        order = np.argsort(-similarities)
+        yield position, [
+            (int(candidates[index, column]), float(similarities[index]))
+            for index in order if similarities[index] > 0
+        ]
+
+
+def _blocks(matrix, positions, shrinkage):
+    """
+    Yield (positions, similarity block) BLOCK columns at a time
+    """
+    for start in range(0, len(positions), BLOCK):
+        chunk = positions[start:start + BLOCK]
+        yield chunk, matrix.similarities(chunk, shrinkage)
+
+
+def _lists_from_block(matrix, chunk, block, k):
+    return {
+        int(matrix.recipe_ids[position]): [
+            (int(matrix.recipe_ids[neighbor]), similarity) for neighbor, similarity in neighbors
+        ]
+        for position, neighbors in top_neighbors(block, chunk, k)
+    }
+
+
+def compute_lists(matrix, positions=None, k=None, shrinkage=None):
+    """
+    Neighbor lists {recipe id: [(neighbor id, similarity)]} for the given matrix positions
+    (all recipes by default)
+    """
+    k = k or _setting('RECOMMENDATIONS_NEIGHBORS', 20)
+    shrinkage = _setting('RECOMMENDATIONS_SHRINKAGE', 10) if shrinkage is None else shrinkage
+    positions = list(range(len(matrix))) if positions is None else list(positions)
+    lists = {}
+    for chunk, block in _blocks(matrix, positions, shrinkage):
+        lists.update(_lists_from_block(matrix, chunk, block, k))
+    return lists
+
+
+def _write(lists):
+    """
+    Replace the stored lists of the given recipes
+    """
+    # Neighbors count too: a refresh rewrites a few lists that still point at other recipes
+    ids = set(lists).union(*({neighbor_id for neighbor_id, _ in neighbors} for neighbors in lists.values()))
+    existing = set(Recipe.objects.filter(id__in=ids).values_list('id', flat=True))
+    RecipeNeighbor.objects.filter(recipe_id__in=list(lists)).delete()
+    RecipeNeighbor.objects.bulk_create([
+        RecipeNeighbor(recipe_id=recipe_id, neighbor_id=neighbor_id, similarity=similarity)
+        for recipe_id, neighbors in lists.items() if recipe_id in existing
+        for neighbor_id, similarity in neighbors if neighbor_id in existing
+    ], batch_size=1000)
+
+
+def rebuild():
+    """
+    Recompute every neighbor list from all ratings; returns the number of recipes covered
+    """
+    matrix = load_matrix()
+    lists = compute_lists(matrix) if matrix is not None else {}
+    with transaction.atomic():
+        NeighborRefresh.objects.all().delete()
+        RecipeNeighbor.objects.all().delete()
+        _write(lists)
+    return len(lists)
+
+
+def refresh_stale():
+    """
+    Recompute the lists of recipes whose ratings changed and patch them into other lists
+    Returns the number of lists rewritten
+    """
+    stale = list(NeighborRefresh.objects.values_list('recipe_id', 'requested_at'))
+    if not stale:
+        return 0
+    if not RecipeNeighbor.objects.exists():
+        return rebuild()
+
+    import numpy as np
+
+    matrix = load_matrix()
+    stale_ids = {recipe_id for recipe_id, _ in stale}
+    positions = [
+        matrix.positions[recipe_id] for recipe_id in stale_ids
+        if matrix is not None and recipe_id in matrix.positions
+    ]
+    k = _setting('RECOMMENDATIONS_NEIGHBORS', 20)
+    lists = {}
+    # Similarity is symmetric: a stale recipe's column also holds its similarity to every
+    # other recipe, so it may enter or leave any other list
+    reverse = {}
+    for chunk, block in _blocks(matrix, positions, _setting('RECOMMENDATIONS_SHRINKAGE', 10)):
+        lists.update(_lists_from_block(matrix, chunk, block, k))
+        for row, column in zip(*np.nonzero(block > 0)):
+            reverse.setdefault(int(matrix.recipe_ids[row]), {})[int(matrix.recipe_ids[chunk[column]])] = float(
+                block[row, column]
+            )
+    # Recipes whose last rating was removed have no column (and no neighbors) any more
+    lists.update({recipe_id: [] for recipe_id in stale_ids if recipe_id not in lists})
+
+    current = {}
+    for recipe_id, neighbor_id, similarity in RecipeNeighbor.objects.exclude(
+        recipe_id__in=stale_ids
+    ).values_list('recipe_id', 'neighbor_id', 'similarity'):
+        current.setdefault(recipe_id, {})[neighbor_id] = similarity
+    for recipe_id in (set(current) | set(reverse)) - stale_ids:
+        neighbors = current.get(recipe_id, {})
+        kept = {neighbor_id: similarity for neighbor_id, similarity in neighbors.items() if neighbor_id not in stale_ids}
+        merged = sorted({**kept, **reverse.get(recipe_id, {})}.items(), key=lambda item: -item[1])[:k]
+        if dict(merged) != neighbors:
+            lists[recipe_id] = merged
+
+    with transaction.atomic():
+        _write(lists)
+        # Keep markers re-requested while this refresh ran
+        for recipe_id, requested_at in stale:
+            NeighborRefresh.objects.filter(recipe_id=recipe_id, requested_at=requested_at).delete()
+    return len(lists)
+
+
+def mark_stale(recipe_id):
+    """
+    Queue a refresh of a recipe's neighbors; ratings within RECOMMENDATIONS_REFRESH_DELAY
+    are folded into one job
+    """
+    from . import jobs, tasks
+    if not NeighborRefresh.objects.filter(recipe_id=recipe_id).update(requested_at=timezone.now()):
+        NeighborRefresh.objects.create(recipe_id=recipe_id)
+    jobs.enqueue(
+        tasks.refresh_recommendations,
+        delay=_setting('RECOMMENDATIONS_REFRESH_DELAY', timedelta(minutes=1)),
+        dedupe_key='recommendations',
+    )
+
+
+# ==================== ONLINE LOOKUP ====================
+
+def score(seeds, neighbor_rows):
+    """
+    Rank candidates from seed weights {recipe id: weight} and (recipe, neighbor, similarity) rows
+    A candidate scores the sum of similarity x weight over the seeds that list it, so recipes
+    close to several liked seeds beat one lucky match; the cost is O(K) per seed
+    """
+    totals = {}
+    for recipe_id, neighbor_id, similarity in neighbor_rows:
+        if neighbor_id not in seeds:
+            totals[neighbor_id] = totals.get(neighbor_id, 0.0) + similarity * seeds[recipe_id]
+    ranked = sorted((total, recipe_id) for recipe_id, total in totals.items() if total > 0)
+    return [recipe_id for _, recipe_id in reversed(ranked)]
+
+
+def recommend(user, limit=10):
+    """
+    Return (recipe ids, personalized) for a user: neighbors of their recent ratings, weighted
+    by how much they liked each seed, or the leaderboard when that yields too little
+    """
+    ratings = list(
+        Rating.objects.filter(user=user).order_by('-created_at')
+        .values_list('recipe_id', 'score')[:_setting('RECOMMENDATIONS_SEEDS', 50)]
+    )
+    rated = set(Rating.objects.filter(user=user).values_list('recipe_id', flat=True))
+    recipe_ids = []
+    if ratings:
+        mean = Rating.objects.filter(user=user).aggregate(mean=Avg('score'))['mean']
+        seeds = {recipe_id: stars - mean for recipe_id, stars in ratings}
+        if not any(seeds.values()):
+            # Every rating equal: fall back to the distance from the middle of the scale
+            seeds = {recipe_id: stars - 3.0 for recipe_id, stars in ratings}
+        rows = RecipeNeighbor.objects.filter(recipe_id__in=list(seeds)).values_list(
+            'recipe_id', 'neighbor_id', 'similarity'
+        )
+        candidates = [recipe_id for recipe_id in score(seeds, rows) if recipe_id not in rated]
+        visible = set(
+            Recipe.objects.filter(id__in=candidates, status='approved')
+            .exclude(author=user).values_list('id', flat=True)
+        )
+        recipe_ids = [recipe_id for recipe_id in candidates if recipe_id in visible][:limit]
+    personalized = bool(recipe_ids)
+    if len(recipe_ids) < limit:
+        for recipe in leaderboard.top(limit + len(rated) + len(recipe_ids)):
+            if len(recipe_ids) >= limit:
+                break
+            if recipe.id not in rated and recipe.id not in recipe_ids and recipe.author_id != user.id:
+                recipe_ids.append(recipe.id)
+    return recipe_ids, personalized
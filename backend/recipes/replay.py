@@ -0,0 +1,128 @@
+"""
+Broadcast Replay for Reconnecting WebSocket Clients
+Every broadcast carries its OutboxEvent id as a monotonic sequence number. The dispatcher
+records each frame it sends in a bounded in-memory ring buffer; a client that reconnects
+with its last seen sequence gets only the frames it missed, from the buffer or else from
+the retained outbox rows, or a "resync" signal when the gap is too old or too long.
+"""
+from collections import deque
+
+from django.conf import settings
+from django.db.models import Max, Min
+
+from cookbook.renderers import dumps_text
+from .models import OutboxEvent
+
+# from_buffer() result when the buffer does not reach back far enough
+UNKNOWN = object()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class ReplayBuffer:
+    """
+    Ring buffer of (seq, group, frame) for broadcasts dispatched by this process
+    `floor` is the highest sequence number the buffer can no longer vouch for: every
+    broadcast after it is held, so a client with last_seq >= floor can be served from memory
+    """
+    def __init__(self, size):
+        self.events = deque(maxlen=size)
+        self.floor = None
+
+    def record(self, seq, group, frame):
+        if self.floor is None:
+            self.floor = seq - 1
+        if len(self.events) == self.events.maxlen:
+            self.floor = self.events[0][0]
+        self.events.append((seq, group, frame))
+
+    def prime(self, rows):
+        """
+        Seed from already dispatched (seq, group, frame) rows, oldest first
+        """
+        for seq, group, frame in rows:
+            self.record(seq, group, frame)
+
+    @property
+    def latest(self):
+        return self.events[-1][0] if self.events else None
+
+    def after(self, last_seq, group):
+        """
+        Return [(seq, frame)] newer than last_seq, or None when the buffer cannot tell
+        """
+        if self.floor is None or last_seq < self.floor:
+            return None
+        return [(seq, frame) for seq, event_group, frame in self.events if seq > last_seq and event_group == group]
+
+
+buffer = ReplayBuffer(_setting('WS_REPLAY_BUFFER_SIZE', 1000))
+
+
+def encode_frame(seq, message_type, data):
+    """
+    The wire format of a broadcast (shared by live delivery and replay)
+    """
+    return dumps_text({'type': message_type, 'seq': seq, 'data': data})
+
+
+def _broadcasts():
+    return OutboxEvent.objects.filter(kind='broadcast', dispatched_at__isnull=False)
+
+
+def recent_rows(limit):
+    """
+    The latest `limit` delivered broadcasts as (seq, group, frame), oldest first
+    """
+    rows = _broadcasts().order_by('-id').values_list('id', 'payload')[:limit]
+    return [
+        (seq, payload['group'], encode_frame(seq, payload['type'], payload['data']))
+        for seq, payload in reversed(list(rows))
+    ]
+
+
+def from_buffer(last_seq, group):
+    """
+    Frames newer than last_seq from memory; None means resync, UNKNOWN means ask the database
+    """
+    latest = buffer.latest
+    if latest is not None and last_seq > latest:
+        # Sequence from another database (e.g. reset development data)
+        return None
+    frames = buffer.after(last_seq, group)
+    if frames is None:
+        return UNKNOWN
+    if len(frames) > _setting('WS_REPLAY_MAX_EVENTS', 50):
+        return None
+    return frames
+
+
+def from_database(last_seq, group):
+    """
+    Frames newer than last_seq rebuilt from retained outbox rows, or None when rows the
+    client may have missed were already pruned or there are too many to replay
+    """
+    limit = _setting('WS_REPLAY_MAX_EVENTS', 50)
+    bounds = OutboxEvent.objects.aggregate(oldest=Min('id'), newest=Max('id'))
+    if bounds['oldest'] is None or not bounds['oldest'] - 1 <= last_seq <= bounds['newest']:
+        return None
+    rows = list(
+        _broadcasts().filter(id__gt=last_seq).order_by('id').values_list('id', 'payload')[:limit + 1]
+    )
+    if len(rows) > limit:
+        return None
+    return [
+        (seq, encode_frame(seq, payload['type'], payload['data']))
+        for seq, payload in rows if payload['group'] == group
+    ]
+
+
+def latest_seq():
+    """
+    Newest sequence number known to this process (used to re-anchor clients after a resync)
+    """
+    if buffer.latest is not None:
+        return buffer.latest
+    return _broadcasts().aggregate(newest=Max('id'))['newest'] or 0
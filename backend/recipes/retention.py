@@ -0,0 +1,217 @@
+"""
+Retention of Declined Recipes and Old Ratings
+Recipes declined (and not edited since) more than RETENTION_DECLINED_DAYS ago move to
+ArchivedRecipe: their last representation, ratings included, is kept as JSON, while the row
+and everything cascading from it leave the recipe tables. Their image reference is released
+(the job queue unlinks blobs left unreferenced) and the change log gets a delete tombstone.
+Ratings older than RETENTION_RATINGS_DAYS are folded into the recipe's RatingTally and
+deleted, leaving a slim CompactedRating (recipe, user, score) behind. Averages, totals and the
+leaderboard keep counting them, but they no longer show in the ratings list, as the rater's own
+rating or in recommendations. A rater who rates the recipe again takes their share back out of
+the tally (recipes.ratings), so nobody is counted twice.
+Both work through at most RETENTION_CHUNK_SIZE rows per transaction, lowest id first, so an
+interrupted run loses nothing and the next run carries on with what is left.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F, prefetch_related_objects
+from django.utils import timezone
+
+from cookbook.storage import ContentAddressedStorage, is_blob_name
+from . import cache as recipe_cache
+from . import changes
+from . import jobs
+from . import outbox
+from . import recommendations
+from . import snapshots
+from . import tasks
+from .models import ArchivedRecipe, CompactedRating, MediaBlob, Rating, RatingTally, Recipe
+from .serializers import RecipeSerializer
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def chunk_size():
+    return _setting('RETENTION_CHUNK_SIZE', 500)
+
+
+def declined_horizon():
+    """
+    Recipes declined before this are archived; None when archiving is off
+    """
+    days = _setting('RETENTION_DECLINED_DAYS', 90)
+    return timezone.now() - timedelta(days=days) if days else None
+
+
+def ratings_horizon():
+    """
+    Ratings created before this are compacted; None when compaction is off
+    """
+    days = _setting('RETENTION_RATINGS_DAYS', 730)
+    return timezone.now() - timedelta(days=days) if days else None
+
+
+def stale_recipes(before):
+    return Recipe.objects.filter(status='declined', updated_at__lt=before)
+
+
+def old_ratings(before):
+    return Rating.objects.filter(created_at__lt=before)
+
+
+# ==================== DECLINED RECIPES ====================
+
+def _released_bytes(names):
+    """
+    Size of the blobs that dropping one reference per name leaves unreferenced
+    """
+    if not isinstance(default_storage, ContentAddressedStorage):
+        return 0
+    references = Counter(name for name in names if is_blob_name(name))
+    return sum(
+        size
+        for name, size, refcount in MediaBlob.objects.filter(name__in=references).values_list('name', 'size', 'refcount')
+        if refcount <= references[name]
+    )
+
+
+def archive_declined(before, after=0, limit=None):
+    """
+    Archive the next declined recipes (ids above `after`) last changed before `before`
+    Returns (last id handled or None when there are none left, recipes archived, media bytes released)
+    """
+    with transaction.atomic():
+        recipes = list(
+            stale_recipes(before).filter(id__gt=after).order_by('id').select_related('author')[:limit or chunk_size()]
+        )
+        if not recipes:
+            return None, 0, 0
+        prefetch_related_objects(recipes, 'ratings__user', 'rating_tally')
+        representations = {recipe.id: RecipeSerializer(recipe).data for recipe in recipes}
+        ArchivedRecipe.objects.bulk_create([
+            ArchivedRecipe(
+                id=recipe.id, author_id=recipe.author_id, title=recipe.title,
+                declined_at=recipe.updated_at, data=representations[recipe.id],
+            )
+            for recipe in recipes
+        ])
+        images = [recipe.image.name for recipe in recipes if recipe.image]
+        released = _released_bytes(images)
+        for name in images:
+            jobs.enqueue(tasks.release_media, name)
+        # Cascades to ratings, leaderboard entries and indexes; signals leave the tombstones
+        Recipe.objects.filter(id__in=representations).delete()
+        for data in representations.values():
+            outbox.publish('recipes', 'recipe_update', {'action': 'delete', 'recipe': data})
+    return recipes[-1].id, len(recipes), released
+
+
+# ==================== OLD RATINGS ====================
+
+def _delete_ratings(before, after, limit):
+    """
+    Delete the next ratings created before `before`, bypassing the rating signals
+    Returns [(id, recipe id, user id, score)] of the deleted ratings
+    """
+    selected = old_ratings(before).filter(id__gt=after).order_by('id')[:limit]
+    quote = connection.ops.quote_name
+    table = quote(Rating._meta.db_table)
+    recipe, user = (quote(Rating._meta.get_field(name).column) for name in ('recipe', 'user'))
+    with connection.cursor() as cursor:
+        if connection.features.can_return_columns_from_insert:
+            # Deleting first takes the write lock before anything is read (see recipes.ratings);
+            # backends with INSERT ... RETURNING support DELETE ... RETURNING too
+            subquery, params = selected.values('id').query.sql_with_params()
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ({subquery}) RETURNING id, {recipe}, {user}, score',
+                params,
+            )
+            return sorted(cursor.fetchall())
+        rows = list(selected.values_list('id', 'recipe_id', 'user_id', 'score'))
+        if rows:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(rows))})',
+                [rating_id for rating_id, _, _, _ in rows],
+            )
+        return rows
+
+
+def compact_ratings(before, after=0, limit=None):
+    """
+    Fold the next ratings (ids above `after`) created before `before` into rating tallies
+    Returns (last id handled or None when there are none left, ratings compacted)
+    """
+    with transaction.atomic():
+        rows = _delete_ratings(before, after, limit or chunk_size())
+        if not rows:
+            return None, 0
+        CompactedRating.objects.bulk_create([
+            CompactedRating(recipe_id=recipe_id, user_id=user_id, score=score)
+            for _, recipe_id, user_id, score in rows
+        ])
+        totals = {}
+        for _, recipe_id, _, score in rows:
+            rating_count, rating_sum = totals.get(recipe_id, (0, 0))
+            totals[recipe_id] = (rating_count + 1, rating_sum + score)
+        for recipe_id, (rating_count, rating_sum) in totals.items():
+            # The leaderboard already counts these ratings and stays as it is
+            if not RatingTally.objects.filter(recipe_id=recipe_id).update(
+                rating_count=F('rating_count') + rating_count,
+                rating_sum=F('rating_sum') + rating_sum,
+                updated_at=timezone.now(),
+            ):
+                RatingTally.objects.create(recipe_id=recipe_id, rating_count=rating_count, rating_sum=rating_sum)
+        # What the rating signals would have done, once per recipe
+        for recipe_id in totals:
+            recipe_cache.invalidate(recipe_id)
+            recommendations.mark_stale(recipe_id)
+        changes.record(totals)
+        snapshots.schedule()
+    return rows[-1][0], len(rows)
+
+
+def release_compacted(recipe_id, score):
+    """
+    Take one compacted rating back out of its recipe's tally (the CompactedRating row is
+    being deleted: its rater rated again, or a user or recipe cascade)
+    """
+    RatingTally.objects.filter(recipe_id=recipe_id).update(
+        rating_count=F('rating_count') - 1,
+        rating_sum=F('rating_sum') - score,
+        updated_at=timezone.now(),
+    )
+
+
+# ==================== SPACE ====================
+
+def database_usage():
+    """
+    (file bytes, free bytes) of the primary database, or None when it is not SQLite
+    Free pages are reused by later writes; only VACUUM returns them to the filesystem
+    """
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        values = []
+        for pragma in ('page_size', 'page_count', 'freelist_count'):
+            cursor.execute(f'PRAGMA {pragma}')
+            values.append(cursor.fetchone()[0])
+    page_size, page_count, freelist_count = values
+    return page_size * page_count, page_size * freelist_count
+
+
+def vacuum():
+    """
+    Rewrite the SQLite database without its free pages and truncate the write-ahead log
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
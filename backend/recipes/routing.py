@@ -3,4 +3,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/recipes/$', consumers.RecipeConsumer.as_asgi()),
+    re_path(r'ws/moderation/$', consumers.ModeratorConsumer.as_asgi()),
 ]
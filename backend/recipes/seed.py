@@ -0,0 +1,432 @@
+"""
+Development and Benchmark Data
+The sample kitchen (Ninang Rhobby's team, their recipes and ratings, the homepage) plus any
+number of synthetic users, recipes and ratings generated from a seed, so the same arguments
+on the same database always give the same rows.
+Everything goes in with bulk inserts inside one transaction, and all seeded users share one
+password hash. Bulk inserts skip model signals, so the leaderboard entries and change log
+rows of synthetic recipes are written alongside them.
+"""
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import cache as recipe_cache
+from . import changes
+from . import leaderboard
+from . import recommendations
+from . import snapshots
+from .models import HomepageContent, LeaderboardEntry, Rating, Recipe, RecipeChange, User
+
+SAMPLE_PASSWORD = 'password123'
+
+# Prefix of synthetic usernames (cook1, cook2, ...)
+SYNTHETIC_PREFIX = 'cook'
+
+
+# ==================== SAMPLE KITCHEN ====================
+
+SUPER_ADMINS = [
+    {
+        'username': 'rhobby',
+        'email': 'rhobby@cookbook.com',
+        'first_name': 'Rhobby Jay',
+        'last_name': 'Calixtro',
+        'bio': 'Frontend wizard making interfaces as smooth as perfectly cooked rice — our very own tita Rhobby, yours truly.',
+        'github_link': 'https://github.com/JayLarkspur20'
+    },
+    {
+        'username': 'rixzel',
+        'email': 'rixzel@cookbook.com',
+        'first_name': 'Rixzel Jhay',
+        'last_name': 'Avendano',
+        'bio': 'Solutions architect for AWS, making sure every deployment is as seamless as every delicious bite.',
+        'github_link': 'https://github.com/Meowers22'
+    },
+    {
+        'username': 'joshua',
+        'email': 'joshua@cookbook.com',
+        'first_name': 'Joshua Robert',
+        'last_name': 'Bejo',
+        'bio': 'Backend specialist who loves optimizing database queries as much as perfecting adobo recipes.',
+        'github_link': 'https://github.com/JoshuaBejo'
+    },
+    {
+        'username': 'john',
+        'email': 'john@cookbook.com',
+        'first_name': 'John Michael',
+        'last_name': 'Ocampo',
+        'bio': 'DevOps engineer who deploys applications faster than you can say "sarap!"',
+        'github_link': 'https://github.com/Kaels10'
+    },
+    {
+        'username': 'guian',
+        'email': 'guian@cookbook.com',
+        'first_name': 'Guian Karlo',
+        'last_name': 'Pimentel',
+        'bio': 'UI/UX designer who believes good design is like good food — it brings people together.',
+        'github_link': 'https://github.com/gypimentel'
+    }
+]
+
+SAMPLE_RECIPES = [
+    {
+        'title': "Ninang Rhobby's Ultimate Bacsilog",
+        'description': "The crown jewel of Filipino breakfast! Perfectly seasoned beef tapa, garlic fried rice, and a sunny-side-up egg that'll make you cry tears of joy, anak.",
+        'ingredients': [
+            "500g beef sirloin, sliced thin",
+            "1/4 cup soy sauce",
+            "2 tbsp brown sugar",
+            "4 cloves garlic, minced",
+            "3 cups day-old rice",
+            "4 eggs",
+            "Salt and pepper to taste",
+            "Cooking oil for frying"
+        ],
+        'steps': "1. Marinate beef in soy sauce, sugar, and half the garlic for 2 hours.\n2. Fry marinated beef until caramelized and crispy.\n3. Make garlic fried rice with remaining garlic and day-old rice.\n4. Fry eggs sunny-side up with runny yolks.\n5. Serve together with love and a big smile, anak!",
+        'servings': 4,
+        'author': 0,  # Rhobby
+        'is_signature': True
+    },
+    {
+        'title': "Lola's Secret Adobo",
+        'description': "Passed down through generations, this adobo recipe will make your neighbors peek over the fence wondering what smells so amazing!",
+        'ingredients': [
+            "1 kg pork belly, cut in chunks",
+            "1/2 cup soy sauce",
+            "1/4 cup white vinegar",
+            "1 head garlic, crushed",
+            "3 bay leaves",
+            "1 tsp black peppercorns",
+            "2 tbsp brown sugar"
+        ],
+        'steps': "1. Brown pork belly in a pot until golden.\n2. Add all ingredients and bring to a boil.\n3. Simmer for 45 minutes until tender.\n4. Let it reduce until sauce is thick and glossy.\n5. Serve with steaming rice, apo!",
+        'servings': 6,
+        'author': 1,  # Rixzel
+        'is_signature': True
+    },
+    {
+        'title': "Crispy Pata Paradise",
+        'description': "Deep-fried pork leg so crispy it sings, so tender it melts. This is what dreams are made of, mga anak!",
+        'ingredients': [
+            "1 whole pork leg (pata)",
+            "2 tbsp salt",
+            "1 tbsp black pepper",
+            "4 bay leaves",
+            "Oil for deep frying",
+            "Soy sauce and vinegar for dipping"
+        ],
+        'steps': "1. Boil pata with salt, pepper, and bay leaves for 1 hour.\n2. Let it cool and dry completely overnight.\n3. Deep fry until golden and crispy all around.\n4. Serve with sawsawan and lots of rice, mga apo!",
+        'servings': 8,
+        'author': 2,  # Joshua
+        'is_signature': True
+    },
+    {
+        'title': "Sinigang na Baboy Supreme",
+        'description': "Sour, savory, and soul-warming. This tamarind-based soup will cure whatever ails you, guaranteed by Ninang!",
+        'ingredients': [
+            "1 kg pork ribs",
+            "2 packs sinigang mix",
+            "2 tomatoes, quartered",
+            "1 onion, quartered",
+            "2 cups kangkong",
+            "1 cup string beans",
+            "2 pieces radish, sliced",
+            "3 pieces green chili"
+        ],
+        'steps': "1. Boil pork ribs until tender, about 1 hour.\n2. Add tomatoes and onions, cook until soft.\n3. Add sinigang mix and bring to a boil.\n4. Add vegetables and simmer until cooked.\n5. Season with salt and serve hot with rice!",
+        'servings': 6,
+        'author': 3,  # John
+        'is_signature': True
+    },
+    {
+        'title': "Pancit Canton Fiesta",
+        'description': "Long noodles for long life! This colorful stir-fried noodle dish brings the party to your plate, mga anak.",
+        'ingredients': [
+            "500g pancit canton noodles",
+            "200g pork, sliced thin",
+            "200g shrimp, peeled",
+            "2 cups mixed vegetables",
+            "4 cloves garlic, minced",
+            "2 tbsp soy sauce",
+            "1 tbsp oyster sauce",
+            "2 cups chicken broth"
+        ],
+        'steps': "1. Soak noodles in warm water until soft.\n2. Stir-fry pork and shrimp with garlic until cooked.\n3. Add vegetables and sauces, cook until tender.\n4. Toss in noodles and broth gradually.\n5. Cook until noodles absorb all the flavors!",
+        'servings': 8,
+        'author': 4,  # Guian
+        'is_signature': True
+    },
+    {
+        'title': "Chicken Tinola Comfort",
+        'description': "A warm hug in a bowl! This ginger-infused chicken soup with green papaya will heal your body and soul.",
+        'ingredients': [
+            "1 whole chicken, cut into pieces",
+            "2 inches ginger, sliced",
+            "1 onion, quartered",
+            "2 cups green papaya, cubed",
+            "2 cups malunggay leaves",
+            "Fish sauce to taste",
+            "6 cups water"
+        ],
+        'steps': "1. Saute ginger and onion until fragrant.\n2. Add chicken pieces and brown lightly.\n3. Pour water and simmer until chicken is tender.\n4. Add papaya and cook until soft.\n5. Add malunggay leaves and season with fish sauce.",
+        'servings': 6,
+        'author': 0,  # Rhobby
+        'is_signature': False
+    },
+    {
+        'title': "Beef Kare-Kare Royalty",
+        'description': "Rich, nutty, and absolutely divine! This peanut-based stew with oxtail is fit for royalty, apo.",
+        'ingredients': [
+            "2 kg oxtail, cut into pieces",
+            "1 cup ground peanuts",
+            "1/4 cup rice flour",
+            "2 bundles pechay",
+            "1 bundle string beans",
+            "2 pieces eggplant",
+            "Bagoong alamang for serving"
+        ],
+        'steps': "1. Boil oxtail until very tender, about 2-3 hours.\n2. Mix ground peanuts and rice flour with broth.\n3. Add peanut mixture to pot and simmer.\n4. Add vegetables and cook until tender.\n5. Serve with bagoong alamang and steamed rice.",
+        'servings': 8,
+        'author': 1,  # Rixzel
+        'is_signature': False
+    },
+    {
+        'title': "Lechon Kawali Perfection",
+        'description': "Crispy outside, tender inside! This deep-fried pork belly will make you forget all your troubles, anak.",
+        'ingredients': [
+            "2 kg pork belly, whole",
+            "2 tbsp salt",
+            "1 tbsp black pepper",
+            "4 bay leaves",
+            "Oil for deep frying",
+            "Lechon sauce for serving"
+        ],
+        'steps': "1. Boil pork belly with salt, pepper, and bay leaves for 1 hour.\n2. Let cool and dry completely.\n3. Deep fry until golden and crispy.\n4. Chop into serving pieces.\n5. Serve with lechon sauce and rice.",
+        'servings': 8,
+        'author': 2,  # Joshua
+        'is_signature': False
+    }
+]
+
+# ==================== SYNTHETIC DATA ====================
+
+PROTEINS = [
+    'chicken', 'pork', 'beef', 'pork belly', 'oxtail', 'bangus', 'tilapia', 'galunggong',
+    'shrimp', 'squid', 'crab', 'tofu', 'chicken liver', 'longganisa', 'corned beef', 'eggplant',
+]
+DISHES = [
+    'Adobo', 'Sinigang', 'Tinola', 'Kare-Kare', 'Paksiw', 'Inihaw', 'Ginataan', 'Sisig',
+    'Menudo', 'Caldereta', 'Nilaga', 'Bistek', 'Pinakbet', 'Escabeche', 'Afritada', 'Lumpia',
+    'Pancit', 'Arroz Caldo', 'Sarciado', 'Torta',
+]
+STYLES = [
+    "Lola's", "Ninang's", 'Classic', 'Spicy', 'Crispy', 'Fiesta', 'Weeknight', 'Probinsya',
+    'Garlicky', 'Sunday', 'Creamy', 'Smoky', 'Batangas', 'Ilocos', 'Bicol',
+]
+PANTRY = [
+    '4 cloves garlic, minced', '1 onion, chopped', '2 tomatoes, quartered', '1/4 cup soy sauce',
+    '1/4 cup vinegar', '3 bay leaves', '1 tsp black peppercorns', '2 tbsp fish sauce',
+    '1 can coconut milk', '2 inches ginger, sliced', '2 cups kangkong', '1 cup string beans',
+    '2 pieces green chili', '1 tbsp brown sugar', '1 tbsp oyster sauce', '2 potatoes, cubed',
+    '1 carrot, sliced', '1 red bell pepper, sliced', '1/2 cup tomato sauce', '1 cup liver spread',
+    '2 tbsp calamansi juice', '1 bundle pechay', '2 cups green papaya, cubed', '1 cup ground peanuts',
+    '2 tbsp annatto oil', '1 cup chicken broth', '3 stalks lemongrass', '1 cup malunggay leaves',
+    '2 eggs, beaten', '1 tbsp bagoong', '2 tbsp cooking oil', 'Salt and pepper to taste',
+]
+PRAISE = [
+    'Just like the one from the carinderia, anak.', 'Best eaten with lots of rice.',
+    'A family favourite every Sunday.', 'Tastes even better the next day.',
+    'Perfect for rainy afternoons.', 'Your titas will ask for the recipe.',
+]
+STEPS = (
+    "1. Saute the garlic and onion until fragrant.\n"
+    "2. Brown the {protein} on all sides.\n"
+    "3. Add the remaining ingredients and bring to a boil.\n"
+    "4. Simmer until tender and the sauce thickens.\n"
+    "5. Season to taste and serve hot with rice."
+)
+# Seeded recipes are mostly approved; the rest fill the moderation queue and the declined list
+STATUSES = ['approved'] * 85 + ['pending'] * 10 + ['declined'] * 5
+# Seeded ratings lean positive, like real ones
+SCORE_WEIGHTS = [1, 2, 5, 10, 12]
+
+
+def synthetic_recipe(rng, author_id):
+    """
+    {field: value} of one synthetic recipe
+    """
+    protein, dish = rng.choice(PROTEINS), rng.choice(DISHES)
+    title = f'{rng.choice(STYLES)} {protein.title()} {dish}'
+    return {
+        'title': title,
+        'description': f'{title}, the way we make it at home. {rng.choice(PRAISE)}',
+        'ingredients': [f'500g {protein}'] + rng.sample(PANTRY, rng.randint(5, 10)),
+        'steps': STEPS.format(protein=protein),
+        'servings': rng.randint(1, 10),
+        'author_id': author_id,
+        'status': rng.choice(STATUSES),
+        'is_signature': rng.random() < 0.03,
+    }
+
+
+# ==================== SEEDING ====================
+
+def _next_id(model):
+    return (model.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+
+
+class BulkInserter:
+    """
+    Insert rows of {attname: value} with one executemany per batch
+    bulk_create prepares every value through its field and compiles a statement for each
+    249 rows (SQLite's parameter limit), which dominates at millions of rows. Here the
+    statement is compiled once, rows carry their primary key, values missing from a row are
+    taken from a model instance built from `defaults` (auto_now timestamps included), and
+    `prepare` lists the fields whose row values still need their field's conversion
+    """
+    def __init__(self, model, defaults=None, prepare=()):
+        instance = model(**(defaults or {}))
+        self.fields = model._meta.concrete_fields
+        self.template = {
+            field.attname: field.get_db_prep_save(field.pre_save(instance, True), connection)
+            for field in self.fields
+        }
+        self.prepare = {name: model._meta.get_field(name) for name in prepare}
+        quote = connection.ops.quote_name
+        self.sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(field.column) for field in self.fields),
+            ', '.join(['%s'] * len(self.fields)),
+        )
+
+    def insert(self, rows):
+        template, prepare = self.template, self.prepare
+        values = []
+        for row in rows:
+            for name, field in prepare.items():
+                row[name] = field.get_db_prep_save(row[name], connection)
+            values.append(tuple(row.get(name, default) for name, default in template.items()))
+        with connection.cursor() as cursor:
+            cursor.executemany(self.sql, values)
+        return len(values)
+
+
+def seed_sample(password_hash):
+    """
+    Add whatever is missing of the sample kitchen; returns the number of users, recipes and
+    ratings created
+    A handful of rows, so recipes are saved one by one and their signals index them
+    """
+    usernames = [admin['username'] for admin in SUPER_ADMINS]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    new_users = User.objects.bulk_create([
+        User(role='super_admin', password=password_hash, **admin)
+        for admin in SUPER_ADMINS if admin['username'] not in existing
+    ])
+    admins = {user.username: user for user in User.objects.filter(username__in=usernames)}
+    admins = [admins[username] for username in usernames]
+
+    titles = [recipe['title'] for recipe in SAMPLE_RECIPES]
+    existing = set(Recipe.objects.filter(title__in=titles).values_list('title', flat=True))
+    new_recipes = [
+        Recipe.objects.create(**{**recipe, 'author': admins[recipe['author']], 'status': 'approved'})
+        for recipe in SAMPLE_RECIPES if recipe['title'] not in existing
+    ]
+
+    # Every super admin rates every sample recipe 5/5 to establish a baseline
+    sample = list(Recipe.objects.filter(title__in=titles).values_list('id', flat=True))
+    ratings = Rating.objects.filter(recipe_id__in=sample)
+    before = ratings.count()
+    Rating.objects.bulk_create(
+        [Rating(recipe_id=recipe_id, user=admin, score=5) for recipe_id in sample for admin in admins],
+        ignore_conflicts=True,
+    )
+    new_ratings = ratings.count() - before
+    if new_ratings:
+        for recipe_id in sample:
+            leaderboard.refresh(recipe_id)
+            recommendations.mark_stale(recipe_id)
+        changes.record(sample)
+    HomepageContent.objects.get_or_create(id=1)
+    return len(new_users), len(new_recipes), new_ratings
+
+
+def seed(users=0, recipes=0, ratings_per_recipe=0, seed=0, password=SAMPLE_PASSWORD,
+         batch_size=50_000, log=print):
+    """
+    Seed the sample kitchen plus `users` users, `recipes` recipes by random authors and
+    `ratings_per_recipe` ratings by distinct random users on each of them
+    Returns the number of rows created per model
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    password_hash = make_password(password)
+    with transaction.atomic():
+        created = dict(zip(('users', 'recipes', 'ratings'), seed_sample(password_hash)))
+
+        # Numbered after the synthetic users already there, so running again adds more
+        number = User.objects.filter(username__regex=rf'^{SYNTHETIC_PREFIX}[0-9]+$').count() + 1
+        user_id = _next_id(User)
+        inserter = BulkInserter(User, {'password': password_hash})
+        for offset in range(0, users, batch_size):
+            count = min(batch_size, users - offset)
+            inserter.insert([
+                {
+                    'id': user_id + index,
+                    'username': f'{SYNTHETIC_PREFIX}{number + index}',
+                    'email': f'{SYNTHETIC_PREFIX}{number + index}@example.com',
+                    'first_name': f'Cook {number + index}',
+                } for index in range(offset, offset + count)
+            ])
+            created['users'] += count
+        if users:
+            log(f'{users} users in {time.perf_counter() - started:.1f}s')
+
+        # Ids are handed out here rather than read back: SQLite lets one transaction write
+        # at a time, so nothing else can take them in between
+        authors = list(User.objects.values_list('id', flat=True))
+        raters = min(ratings_per_recipe, len(authors))
+        recipe_id = first_recipe_id = _next_id(Recipe)
+        recipe_inserter = BulkInserter(Recipe, prepare=('ingredients',))
+        rating_inserter = BulkInserter(Rating)
+        entry_inserter = BulkInserter(LeaderboardEntry)
+        change_inserter = BulkInserter(RecipeChange)
+        rating_id, change_id = _next_id(Rating), _next_id(RecipeChange)
+        scores = range(1, 6)
+        per_batch = max(batch_size // max(raters, 1), 1)
+        for offset in range(0, recipes, per_batch):
+            rows, ratings, entries = [], [], []
+            for _ in range(min(per_batch, recipes - offset)):
+                row = synthetic_recipe(rng, rng.choice(authors))
+                row['id'] = recipe_id
+                picked = rng.choices(scores, SCORE_WEIGHTS, k=raters)
+                for user, score in zip(rng.sample(authors, raters), picked):
+                    ratings.append({'id': rating_id, 'recipe_id': recipe_id, 'user_id': user, 'score': score})
+                    rating_id += 1
+                entries.append({
+                    'recipe_id': recipe_id,
+                    'is_ranked': row['status'] == 'approved',
+                    'rating_count': raters,
+                    'rating_sum': sum(picked),
+                    'score': leaderboard.bayesian_score(raters, sum(picked)),
+                })
+                rows.append(row)
+                recipe_id += 1
+            created['recipes'] += recipe_inserter.insert(rows)
+            created['ratings'] += rating_inserter.insert(ratings)
+            entry_inserter.insert(entries)
+            log(f'{created["recipes"]} recipes, {created["ratings"]} ratings in {time.perf_counter() - started:.1f}s')
+
+        # The change log, which the save signals would have written row by row
+        for offset in range(first_recipe_id, recipe_id, batch_size):
+            change_inserter.insert([
+                {'id': change_id + new_id - first_recipe_id, 'recipe_id': new_id, 'kind': 'upsert'}
+                for new_id in range(offset, min(offset + batch_size, recipe_id))
+            ])
+        recipe_cache.invalidate_all()
+        snapshots.schedule()
+    return created
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from .models import User, Recipe, Rating, HomepageContent
+from . import moderation
+from .models import User, Recipe, Rating, HomepageContent, ModerationClaim
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -71,10 +72,70 @@ class RecipeSerializer(serializers.ModelSerializer):
     def get_user_rating(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            rating = obj.ratings.filter(user=request.user).first()
-            return rating.score if rating else None
+            # Scan the (usually prefetched) ratings instead of issuing another query
+            for rating in obj.ratings.all():
+                if rating.user_id == request.user.id:
+                    return rating.score
         return None
 
+class RecipeCardSerializer(serializers.ModelSerializer):
+    """
+    What a recipe card shows (homepage sections): no steps, ingredients or ratings list
+    """
+    author = UserSerializer(read_only=True)
+    average_rating = serializers.ReadOnlyField()
+    total_ratings = serializers.ReadOnlyField()
+    image = serializers.ImageField(use_url=True, read_only=True)
+    
+    class Meta:
+        model = Recipe
+        fields = ('id', 'title', 'description', 'servings', 'image', 'author', 'status', 'is_signature',
+                  'created_at', 'updated_at', 'average_rating', 'total_ratings')
+
+class ModerationClaimSerializer(serializers.ModelSerializer):
+    recipe_id = serializers.IntegerField(read_only=True)
+    moderator = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ModerationClaim
+        fields = ('recipe_id', 'moderator', 'claimed_at', 'expires_at')
+    
+    def get_moderator(self, obj):
+        return {'id': obj.moderator.id, 'username': obj.moderator.username}
+
+class ModerationCardSerializer(serializers.ModelSerializer):
+    """
+    What a moderator needs to pick a recipe from the queue: no steps, ratings or full profiles
+    The claim changes without the recipe, so the cached card leaves it to `claim_data`
+    """
+    author = serializers.SerializerMethodField()
+    excerpt = serializers.SerializerMethodField()
+    ingredient_count = serializers.SerializerMethodField()
+    image = serializers.ImageField(use_url=True, read_only=True)
+    
+    class Meta:
+        model = Recipe
+        fields = ('id', 'title', 'excerpt', 'ingredient_count', 'servings', 'image', 'author',
+                  'created_at')
+    
+    def get_author(self, obj):
+        return {'id': obj.author.id, 'username': obj.author.username}
+    
+    def get_excerpt(self, obj):
+        if len(obj.description) <= 160:
+            return obj.description
+        return obj.description[:159].rstrip() + '…'
+    
+    def get_ingredient_count(self, obj):
+        return len(obj.ingredients or [])
+
+def claim_data(recipe):
+    """
+    The live claim on a recipe as shown on its moderation card, or None
+    """
+    claim = moderation.active_claim(recipe)
+    return ModerationClaimSerializer(claim).data if claim is not None else None
+
 class HomepageContentSerializer(serializers.ModelSerializer):
     class Meta:
         model = HomepageContent
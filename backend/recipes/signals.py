@@ -0,0 +1,131 @@
+"""
+Model signal handlers
+Keeps denormalized data (leaderboard, recipe cache, snapshots) in sync with model changes
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import autocomplete
+from . import cache as recipe_cache
+from . import changes
+from . import facets
+from . import leaderboard
+from . import recommendations
+from . import retention
+from . import similar
+from . import snapshots
+from .models import CompactedRating, HomepageContent, Rating, Recipe, SimilarityProfile, User
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Rank or unrank a recipe whenever its moderation status may have changed
+    """
+    if raw:
+        return
+    leaderboard.sync_recipe(instance, created)
+    # Re-signs the recipe for similar-recipe lookups when its text or ingredients changed
+    similar.index_recipe(instance)
+
+
+@receiver(post_delete, sender=SimilarityProfile)
+def similarity_profile_deleted(sender, instance, **kwargs):
+    """
+    Release the document frequencies of a deleted recipe's terms
+    """
+    similar.forget_terms(instance.terms)
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Count ratings saved outside recipes.ratings.rate() (admin, shell, fixtures)
+    A new rating moves the entry by itself; a changed one has no previous score to subtract,
+    so its recipe is recomputed on the job queue
+    """
+    if getattr(instance, 'leaderboard_recorded', False):
+        return
+    if created and not raw:
+        # Replaces the rater's compacted rating, if any
+        CompactedRating.objects.filter(recipe_id=instance.recipe_id, user_id=instance.user_id).delete()
+        leaderboard.record_rating(instance.recipe_id, None, instance.score)
+    else:
+        leaderboard.schedule_refresh(instance.recipe_id)
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    """
+    Subtract deleted ratings, including those removed by user or recipe cascades
+    """
+    leaderboard.discard_rating(instance.recipe_id, instance.score)
+
+
+@receiver(post_delete, sender=CompactedRating)
+def compacted_rating_deleted(sender, instance, **kwargs):
+    """
+    Take a rater's compacted share out of the tally and the leaderboard when they rate again
+    or their user or recipe is deleted
+    """
+    retention.release_compacted(instance.recipe_id, instance.score)
+    leaderboard.discard_rating(instance.recipe_id, instance.score)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, raw=False, **kwargs):
+    """
+    Retire cached representations of a saved or deleted recipe and log the change for sync
+    Deletions leave a tombstone, including recipes removed by a user cascade
+    """
+    recipe_cache.invalidate(instance.id)
+    autocomplete.touch(instance.id)
+    facets.touch(instance.id)
+    if not raw:
+        changes.record([instance.id], 'delete' if kwargs['signal'] is post_delete else 'upsert')
+        snapshots.schedule()
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_delete, sender=CompactedRating)
+def rating_changed(sender, instance, **kwargs):
+    """
+    Ratings are embedded in the recipe representation, so retire the recipe entry
+    They also move the recipe's item-item neighbors, type-ahead popularity and rating band
+    """
+    recipe_cache.invalidate(instance.recipe_id)
+    autocomplete.touch(instance.recipe_id)
+    facets.touch(instance.recipe_id)
+    if not kwargs.get('raw'):
+        changes.record([instance.recipe_id])
+        recommendations.mark_stale(instance.recipe_id)
+        snapshots.schedule()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """
+    Authors and raters are nested in every recipe, so any profile change retires the whole cache
+    Login timestamp updates do not affect serialized data and are ignored
+    """
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    recipe_cache.invalidate_all()
+    if not kwargs.get('raw'):
+        snapshots.schedule()
+    if kwargs['signal'] is post_save and not kwargs.get('raw'):
+        # Deletions reach the change log through the recipe and rating cascades
+        changes.record_user(instance.id)
+
+
+@receiver(post_save, sender=HomepageContent)
+def homepage_content_changed(sender, instance, **kwargs):
+    """
+    The welcome message and image are part of the cached public homepage document
+    """
+    recipe_cache.invalidate_documents()
+    if not kwargs.get('raw'):
+        snapshots.schedule()
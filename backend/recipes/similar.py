@@ -0,0 +1,283 @@
+"""
+Similar Recipes via MinHash/LSH and TF-IDF
+Every recipe gets a SimilarityProfile when it is saved:
+- its ingredient lines normalized to ingredient names ("2 cups coconut milk, warmed" ->
+  "coconut milk") and MinHash-signed, so the fraction of equal signature slots estimates the
+  Jaccard similarity of two ingredient sets
+- the terms of its title and description, MinHash-signed as well and counted for TF-IDF
+  against the document frequencies kept in DocumentFrequency
+Each signature is cut into LSH bands and every band is stored as a SimilarityBucket key. A
+lookup fetches the recipes sharing a bucket with the target through the key index, then ranks
+only those candidates by estimated ingredient Jaccard blended with TF-IDF cosine, so the
+catalogue is never scanned.
+"""
+import hashlib
+import math
+import random
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Count, F
+
+from .models import DocumentFrequency, Recipe, SimilarityBucket, SimilarityProfile
+
+# Mersenne prime for the universal hash family h(x) = (a * x + b) mod P
+_PRIME = (1 << 61) - 1
+
+# Quantities, units and preparation notes that do not identify an ingredient
+_UNITS = {
+    'bundle', 'can', 'clove', 'cup', 'dash', 'g', 'gram', 'head', 'inch', 'kg', 'kilo', 'l', 'lb',
+    'liter', 'ml', 'oz', 'pack', 'packet', 'piece', 'pinch', 'pound', 'slice', 'sprig', 'stalk',
+    'tbsp', 'tablespoon', 'tsp', 'teaspoon', 'whole',
+}
+_NOTES = re.compile(r'\b(?:for serving|for garnish|to taste|as needed|optional)\b.*$')
+_PANTRY = {'water', 'salt', 'pepper', 'salt and pepper', 'oil', 'cooking oil'}
+_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'has', 'have', 'in',
+    'into', 'is', 'it', 'its', 'of', 'on', 'or', 'so', 'that', 'the', 'this', 'to', 'will', 'with',
+    'you', 'your', 'our', 'we', 'my', 'all', 'any', 'what', 'whatever', 'ever',
+    # Filipino particles used throughout the house style ("mga", "apo", "anak"...)
+    'ang', 'ng', 'na', 'sa', 'mga', 'apo', 'anak', 'po', 'ko', 'ka',
+}
+_WORD = re.compile(r"[a-z][a-z'-]*")
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==================== FEATURES ====================
+
+def _singular(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('oes', 'ches', 'shes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(line):
+    """
+    Reduce an ingredient line to the ingredient's name, or '' for pantry staples
+    """
+    line = line.lower().split(',')[0].split('(')[0]
+    line = _NOTES.sub('', line)
+    words = [
+        _singular(word) for word in _WORD.findall(line)
+    ]
+    words = [word for word in words if word not in _UNITS and word not in {'of'}]
+    name = ' '.join(words)
+    return '' if name in _PANTRY else name
+
+
+def ingredient_tokens(ingredients):
+    """
+    Ingredient names plus their words, so "pork belly" still overlaps "pork ribs"
+    """
+    tokens = set()
+    for line in ingredients or []:
+        name = normalize_ingredient(str(line))
+        if name:
+            tokens.add(name)
+            tokens.update(f'~{word}' for word in name.split() if len(word) > 2)
+    return tokens
+
+
+def text_terms(title, description):
+    """
+    Term counts of the title (counted twice: it names the dish) and the description
+    """
+    terms = Counter()
+    for weight, text in ((2, title or ''), (1, description or '')):
+        for word in _WORD.findall(text.lower()):
+            word = _singular(word.strip("'-"))
+            if 2 < len(word) <= 100 and word not in _STOPWORDS:
+                terms[word] += weight
+    return terms
+
+
+# ==================== MINHASH / LSH ====================
+
+def _permutations(count):
+    # Fixed seed: signatures must agree across processes and restarts
+    rng = random.Random(20240501)
+    return [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(count)]
+
+
+_cached_permutations = {}
+
+
+def _hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), 'big')
+
+
+def minhash(tokens, count=None):
+    """
+    MinHash signature of a token set (empty for an empty set)
+    """
+    count = count or _setting('SIMILAR_MINHASH_PERMUTATIONS', 64)
+    if not tokens:
+        return []
+    permutations = _cached_permutations.get(count)
+    if permutations is None:
+        permutations = _cached_permutations[count] = _permutations(count)
+    hashes = [_hash(token) for token in tokens]
+    return [min((a * value + b) % _PRIME for value in hashes) for a, b in permutations]
+
+
+def band_keys(kind, signature, bands=None):
+    """
+    One bucket key per LSH band: recipes agreeing on every slot of a band share its key
+    """
+    bands = bands or _setting('SIMILAR_LSH_BANDS', 32)
+    if not signature:
+        return []
+    rows = max(len(signature) // bands, 1)
+    keys = []
+    for band, start in enumerate(range(0, rows * bands, rows)):
+        chunk = ','.join(map(str, signature[start:start + rows]))
+        digest = hashlib.blake2b(f'{kind}:{band}:{chunk}'.encode(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+def estimated_jaccard(first, second):
+    if not first or not second or len(first) != len(second):
+        return 0.0
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+def features(recipe):
+    """
+    (ingredient signature, text signature, term counts) of a recipe
+    """
+    terms = text_terms(recipe.title, recipe.description)
+    return minhash(ingredient_tokens(recipe.ingredients)), minhash(set(terms)), dict(terms)
+
+
+def keys_for(ingredient_signature, text_signature):
+    return band_keys('ingredients', ingredient_signature) + band_keys('text', text_signature)
+
+
+# ==================== MAINTENANCE ====================
+
+def fingerprint(recipe):
+    source = f'{recipe.title}\x00{recipe.description}\x00' + '\x00'.join(map(str, recipe.ingredients or []))
+    return hashlib.blake2b(source.encode(), digest_size=16).hexdigest()
+
+
+def _shift_frequencies(terms, delta):
+    if not terms:
+        return
+    if delta > 0:
+        DocumentFrequency.objects.bulk_create(
+            [DocumentFrequency(term=term, documents=0) for term in terms], ignore_conflicts=True,
+        )
+    DocumentFrequency.objects.filter(term__in=list(terms)).update(documents=F('documents') + delta)
+
+
+def index_recipe(recipe):
+    """
+    (Re)build a recipe's profile, buckets and its share of the document frequencies
+    Skipped when title, description and ingredients are unchanged
+    """
+    current = fingerprint(recipe)
+    profile = SimilarityProfile.objects.filter(recipe_id=recipe.id).first()
+    if profile is not None and profile.fingerprint == current:
+        return profile
+    ingredient_signature, text_signature, terms = features(recipe)
+
+    old_terms = set(profile.terms) if profile is not None else set()
+    _shift_frequencies(old_terms - set(terms), -1)
+    _shift_frequencies(set(terms) - old_terms, 1)
+
+    values = {
+        'ingredient_signature': ingredient_signature,
+        'text_signature': text_signature,
+        'terms': terms,
+        'fingerprint': current,
+    }
+    if profile is None:
+        profile = SimilarityProfile.objects.create(recipe_id=recipe.id, **values)
+    else:
+        SimilarityProfile.objects.filter(recipe_id=recipe.id).update(**values)
+        profile = SimilarityProfile(recipe_id=recipe.id, **values)
+    SimilarityBucket.objects.filter(recipe_id=recipe.id).delete()
+    SimilarityBucket.objects.bulk_create([
+        SimilarityBucket(recipe_id=recipe.id, key=key) for key in keys_for(ingredient_signature, text_signature)
+    ])
+    return profile
+
+
+def forget_terms(terms):
+    """
+    A profile is gone (its recipe was deleted): release its document frequencies
+    """
+    _shift_frequencies(set(terms or ()), -1)
+
+
+def rebuild():
+    """
+    Re-index every recipe from scratch (after changing the signature settings)
+    """
+    SimilarityBucket.objects.all().delete()
+    SimilarityProfile.objects.all().delete()
+    DocumentFrequency.objects.all().delete()
+    count = 0
+    for recipe in Recipe.objects.only('id', 'title', 'description', 'ingredients').iterator():
+        index_recipe(recipe)
+        count += 1
+    return count
+
+
+# ==================== LOOKUP ====================
+
+def _tfidf(terms, frequencies, documents):
+    vector = {
+        term: count * math.log((1 + documents) / (1 + frequencies.get(term, 0)))
+        for term, count in terms.items()
+    }
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {term: weight / norm for term, weight in vector.items()}
+
+
+def similar(recipe, limit=10):
+    """
+    Return [(recipe id, similarity)] of approved recipes most like `recipe`, best first
+    Reads the target's LSH buckets, then scores at most SIMILAR_MAX_CANDIDATES profiles
+    """
+    profile = SimilarityProfile.objects.filter(recipe_id=recipe.id).first() or index_recipe(recipe)
+    keys = keys_for(profile.ingredient_signature, profile.text_signature)
+    # Counted in the database: popular buckets may hold many rows, only the best candidates
+    # (most bands shared) come back
+    candidates = list(
+        SimilarityBucket.objects.filter(key__in=keys, recipe__status='approved')
+        .exclude(recipe_id=recipe.id)
+        .values('recipe_id').annotate(bands=Count('recipe_id')).order_by('-bands')
+        .values_list('recipe_id', flat=True)[:_setting('SIMILAR_MAX_CANDIDATES', 100)]
+    )
+    if not candidates:
+        return []
+    # Plain rows: only the two fields scored, without building model instances
+    profiles = list(
+        SimilarityProfile.objects.filter(recipe_id__in=candidates)
+        .values_list('recipe_id', 'ingredient_signature', 'terms')
+    )
+
+    all_terms = set(profile.terms).union(*(terms for _, _, terms in profiles))
+    frequencies = dict(DocumentFrequency.objects.filter(term__in=all_terms).values_list('term', 'documents'))
+    documents = SimilarityProfile.objects.count()
+    target = _tfidf(profile.terms, frequencies, documents)
+
+    weight = _setting('SIMILAR_INGREDIENT_WEIGHT', 0.6)
+    scored = []
+    for recipe_id, signature, terms in profiles:
+        vector = _tfidf(terms, frequencies, documents)
+        cosine = sum(value * vector.get(term, 0.0) for term, value in target.items())
+        jaccard = estimated_jaccard(profile.ingredient_signature, signature)
+        scored.append((weight * jaccard + (1 - weight) * cosine, recipe_id))
+    scored.sort(reverse=True)
+    return [(recipe_id, round(score, 4)) for score, recipe_id in scored[:limit] if score > 0]
@@ -0,0 +1,302 @@
+"""
+Pre-rendered Public Documents
+The guest homepage, the guest recipe list (the public catalogue) and the team page are
+rendered to JSON files under SNAPSHOTS_DIR, with their brotli/gzip variants, shortly after the
+data behind them changes, and served from disk with FileResponse (sendfile under WSGI servers
+with wsgi.file_wrapper) without going through DRF, the ORM or the recipe cache.
+Files are named by their content and never modified: a build writes new files, swaps the
+origin's manifest, then removes files no manifest names. The manifest records the catalogue
+token of the recipe cache (recipes.cache) the build started under. Every recipe, rating, user
+or homepage change replaces that token, so until the rebuild the change queued has finished
+the views render live; with several server processes this needs a shared CACHES['recipes'].
+Image URLs are absolute, so every origin (scheme and host) gets its own snapshots. Only the
+origins listed in SNAPSHOTS_ORIGINS are built: the Host header is the client's to choose, so
+requests for any other origin are always rendered live.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import FileResponse, HttpRequest, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from cookbook.compression import identity_refused, negotiate, precompress
+from cookbook.renderers import dumps
+from . import cache as recipe_cache
+
+logger = logging.getLogger(__name__)
+
+DOCUMENTS = ('homepage', 'catalogue', 'team')
+
+MANIFEST = 'manifest.json'
+SUFFIXES = {'identity': '.json', 'br': '.json.br', 'gzip': '.json.gz'}
+
+# Unreferenced files are kept this long, for readers holding the previous manifest and for
+# builds of the same origin running in other processes
+PRUNE_AFTER_SECONDS = 60
+
+_manifests = {}
+_requested = set()
+_build_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enabled():
+    return _setting('SNAPSHOTS_ENABLED', True)
+
+
+def _root():
+    return Path(_setting('SNAPSHOTS_DIR', Path(tempfile.gettempdir()) / 'cookbook-snapshots'))
+
+
+def _slug(origin):
+    return hashlib.sha256(origin.encode()).hexdigest()[:16]
+
+
+def _directory(origin):
+    return _root() / _slug(origin)
+
+
+def origin_of(request):
+    return f'{request.scheme}://{request.get_host()}'
+
+
+def _read_manifest(directory):
+    """
+    An origin's manifest, re-read only when the file was replaced
+    """
+    path = os.path.join(directory, MANIFEST)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _manifests.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    try:
+        with open(path, 'rb') as manifest_file:
+            manifest = json.loads(manifest_file.read())
+    except (OSError, ValueError):
+        return None
+    _manifests[path] = (signature, manifest)
+    return manifest
+
+
+def allowed_origins():
+    """
+    Origins snapshots are built for, e.g. 'https://cookbook.example'
+    """
+    return [origin.rstrip('/') for origin in _setting('SNAPSHOTS_ORIGINS', ())]
+
+
+def known_origins():
+    """
+    Allowed origins that have snapshots on disk
+    """
+    return [origin for origin in allowed_origins() if _read_manifest(_directory(origin)) is not None]
+
+
+def forget_origins():
+    """
+    Remove the snapshots of origins that are no longer allowed
+    """
+    keep = {_slug(origin) for origin in allowed_origins()}
+    try:
+        directories = [directory for directory in _root().iterdir() if directory.name not in keep]
+    except FileNotFoundError:
+        return
+    for directory in directories:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+# ==================== SERVING ====================
+
+def respond(name, request):
+    """
+    Serve the current snapshot of a document for the request's origin
+    Returns None when the view has to render live: no snapshot yet, or one built before
+    the latest change (a rebuild is queued then)
+    """
+    if not enabled():
+        return None
+    origin = origin_of(request)
+    if origin not in allowed_origins():
+        return None
+    token = recipe_cache.catalogue_token()
+    manifest = _read_manifest(_directory(origin))
+    if manifest is None or manifest['token'] != token or name not in manifest['documents']:
+        request_build(origin, token)
+        return None
+    document = manifest['documents'][name]
+
+    encoding = negotiate(request, document['variants'])
+    if encoding is None and identity_refused(request):
+        response = HttpResponse(status=406)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+    encoding = encoding or 'identity'
+    etag = f'"{document["stem"]}-{encoding}"'
+    if etag in [value.strip() for value in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        try:
+            fileobj = open(_directory(origin) / (document['stem'] + SUFFIXES[encoding]), 'rb')
+        except FileNotFoundError:
+            # Pruned by a build in another process that has not swapped the manifest yet
+            request_build(origin, document['stem'])
+            return None
+        response = FileResponse(fileobj, content_type='application/json')
+        del response['Content-Disposition']
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        for header, value in document['headers'].items():
+            response.headers[header] = value
+    response.headers['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+# ==================== BUILDING ====================
+
+class _GuestRequest(HttpRequest):
+    """
+    A guest's GET from `origin`, for rendering documents outside of a request
+    """
+    def __init__(self, origin):
+        super().__init__()
+        self._scheme, host = origin.split('://', 1)
+        self.method = 'GET'
+        self.META['HTTP_HOST'] = host
+        self.user = AnonymousUser()
+
+    def _get_scheme(self):
+        return self._scheme
+
+
+def _render(name, request):
+    """
+    (payload, extra response headers) of a document as a guest sees it
+    """
+    from . import views
+    if name == 'homepage':
+        return views.build_homepage_payload(request), {}
+    if name == 'catalogue':
+        cursor, payload = views.build_catalogue_payload(request)
+        return payload, {'X-Changes-Cursor': str(cursor)}
+    return views.build_team_payload(), {}
+
+
+def _write(path, content):
+    """
+    Create a file atomically: readers see all of it or none
+    """
+    descriptor, temporary = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(descriptor, 'wb') as temporary_file:
+            temporary_file.write(content)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _publish(directory, name, content):
+    """
+    Store a document and its compressed variants under its digest
+    Returns (file stem, variants); an unchanged document reuses the files already written
+    """
+    stem = f'{name}-{hashlib.blake2b(content, digest_size=12).hexdigest()}'
+    if (directory / (stem + SUFFIXES['identity'])).exists():
+        return stem, [encoding for encoding, suffix in SUFFIXES.items() if (directory / (stem + suffix)).exists()]
+    variants = precompress(content)
+    # Identity last: its presence means the variants are complete
+    for encoding in sorted(variants, key=lambda encoding: encoding == 'identity'):
+        _write(directory / (stem + SUFFIXES[encoding]), variants[encoding])
+    return stem, list(variants)
+
+
+def _prune(directory, documents):
+    keep = {MANIFEST} | {
+        document['stem'] + SUFFIXES[encoding]
+        for document in documents.values() for encoding in document['variants']
+    }
+    cutoff = time.time() - PRUNE_AFTER_SECONDS
+    for path in directory.iterdir():
+        try:
+            if path.name not in keep and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            # Gone already, or still open on a platform that refuses to delete it
+            pass
+
+
+def build(origin):
+    """
+    Render every document for `origin` and publish them; returns the new manifest, or None
+    when the origin is not (or no longer) allowed
+    """
+    if origin not in allowed_origins():
+        forget_origins()
+        return None
+    # Taken before reading anything, so a change made during the build outdates the result
+    token = recipe_cache.catalogue_token()
+    request = _GuestRequest(origin)
+    directory = _directory(origin)
+    with _build_lock:
+        started = time.perf_counter()
+        directory.mkdir(parents=True, exist_ok=True)
+        documents = {}
+        for name in DOCUMENTS:
+            payload, headers = _render(name, request)
+            stem, variants = _publish(directory, name, dumps(payload))
+            documents[name] = {'stem': stem, 'variants': variants, 'headers': headers}
+        manifest = {'origin': origin, 'token': token, 'built_at': time.time(), 'documents': documents}
+        _write(directory / MANIFEST, json.dumps(manifest).encode())
+        _prune(directory, documents)
+        forget_origins()
+    logger.info('Snapshots for %s built in %.2fs', origin, time.perf_counter() - started)
+    return manifest
+
+
+def _queue(origin, delay=None):
+    from . import jobs, tasks
+    jobs.enqueue(tasks.build_snapshots, origin, delay=delay, dedupe_key=f'snapshots:{_slug(origin)}')
+
+
+def request_build(origin, reason):
+    """
+    Queue a build for an allowed `origin` once per reason (e.g. the catalogue token) in this
+    process
+    """
+    key = (origin, reason)
+    if key in _requested or origin not in allowed_origins():
+        return
+    if len(_requested) >= 1024:
+        _requested.clear()
+    _requested.add(key)
+    _queue(origin)
+
+
+def schedule():
+    """
+    The data behind the documents changed: rebuild the snapshots of every allowed origin
+    served so far after SNAPSHOTS_DELAY_SECONDS, so changes in quick succession share one build
+    """
+    if not enabled():
+        return
+    delay = timedelta(seconds=_setting('SNAPSHOTS_DELAY_SECONDS', 1))
+    for origin in known_origins():
+        _queue(origin, delay)
@@ -0,0 +1,64 @@
+"""
+Deferred Jobs
+Work that views queue instead of doing inline (see recipes.jobs)
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from cookbook.storage import ContentAddressedStorage, is_blob_name
+from . import jobs
+from . import leaderboard
+from . import recommendations
+from . import snapshots
+from .models import MediaBlob
+
+
+@jobs.task(priority=5)
+def refresh_leaderboard(recipe_id):
+    """
+    Recompute one recipe's leaderboard entry from its ratings
+    """
+    leaderboard.refresh(recipe_id)
+
+
+@jobs.task()
+def release_media(name):
+    """
+    Drop one reference to a replaced or deleted media file
+    Blobs left without references are unlinked after a grace period, so a response or
+    rolled-back upload still pointing at them keeps working for a while
+    """
+    default_storage.delete(name)
+    if isinstance(default_storage, ContentAddressedStorage) and is_blob_name(name):
+        if MediaBlob.objects.filter(name=name, refcount=0).exists():
+            jobs.enqueue(
+                collect_media, name,
+                delay=getattr(settings, 'MEDIA_GC_GRACE', timedelta(minutes=10)),
+                dedupe_key=f'collect_media:{name}',
+            )
+
+
+@jobs.task(priority=-5)
+def collect_media(name):
+    """
+    Unlink a blob that is still unreferenced
+    """
+    default_storage.collect(name)
+
+
+@jobs.task(priority=-1)
+def refresh_recommendations():
+    """
+    Recompute the neighbor lists of recipes rated since the last refresh
+    """
+    recommendations.refresh_stale()
+
+
+@jobs.task(priority=-1)
+def build_snapshots(origin):
+    """
+    Re-render the public documents served from disk for one origin
+    """
+    snapshots.build(origin)
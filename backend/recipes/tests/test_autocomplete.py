@@ -0,0 +1,46 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from recipes import autocomplete, changes
+from recipes.models import Recipe, User
+
+
+@override_settings(AUTOCOMPLETE_SYNC_SECONDS=0)
+class SuggestTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='pw')
+        self.recipe = self.create('Chicken Adobo', ['chicken', 'soy sauce'])
+        autocomplete.build()
+
+    def create(self, title, ingredients):
+        return Recipe.objects.create(
+            title=title, description='Dish', ingredients=ingredients, steps='Cook', author=self.author,
+            status='approved',
+        )
+
+    def labels(self, prefix):
+        return [suggestion['label'] for suggestion in autocomplete.suggest(prefix)]
+
+    def test_follows_saved_and_deleted_recipes(self):
+        self.assertEqual(self.labels('ado'), ['Chicken Adobo'])
+        self.create('Pork Adobo', ['pork'])
+        self.assertEqual(sorted(self.labels('ado')), ['Chicken Adobo', 'Pork Adobo'])
+        self.recipe.delete()
+        self.assertEqual(self.labels('ado'), ['Pork Adobo'])
+
+    def test_reads_the_database_outside_the_lock(self):
+        # A slow change-log read used to hold up every lookup in the process
+        reads = []
+
+        def unlocked(read):
+            def wrapped(*args, **kwargs):
+                reads.append(autocomplete._lock.locked())
+                return read(*args, **kwargs)
+            return wrapped
+
+        self.create('Pork Adobo', ['pork'])
+        with mock.patch.object(changes, 'drain', unlocked(changes.drain)), \
+                mock.patch.object(autocomplete, '_rows', unlocked(autocomplete._rows)):
+            self.assertIn('Pork Adobo', self.labels('ado'))
+        self.assertEqual(reads, [False, False])
@@ -0,0 +1,61 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes import cache as recipe_cache
+from recipes.models import HomepageContent, Recipe, User
+
+
+@override_settings(READ_REPLICA_VIEWS=[])
+class VariantTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['recipes'].clear()
+        self.author = User.objects.create_user('author', password='pw')
+        self.recipe = Recipe.objects.create(
+            title='Sinigang', description='Sour soup', ingredients=['tamarind'], steps='Boil', author=self.author,
+            status='approved',
+        )
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+
+    def test_variants_are_cached_and_retired_together(self):
+        detail = recipe_cache.represent_one(self.recipe, self.request)
+        card = recipe_cache.represent_one(self.recipe, self.request, 'card')
+        self.assertIn('steps', detail)
+        self.assertNotIn('steps', card)
+        self.assertNotIn('ratings', card)
+        self.assertEqual(recipe_cache.get(self.recipe.id, self.request, 'card'), card)
+
+        self.recipe.title = 'Sinigang na Baboy'
+        self.recipe.save()
+        self.assertIsNone(recipe_cache.get(self.recipe.id, self.request))
+        self.assertIsNone(recipe_cache.get(self.recipe.id, self.request, 'card'))
+        self.assertEqual(recipe_cache.represent_one(self.recipe, self.request, 'card')['title'], 'Sinigang na Baboy')
+
+    def test_cached_card_skips_the_database(self):
+        recipe_cache.represent([self.recipe.id], self.request, 'card')
+        with self.assertNumQueries(0):
+            cards = recipe_cache.represent([self.recipe.id], self.request, 'card')
+        self.assertEqual([card['title'] for card in cards], ['Sinigang'])
+
+    def test_homepage_serves_cards(self):
+        HomepageContent.objects.create(id=1)
+        response = APIClient().get('/api/homepage/', HTTP_ACCEPT_ENCODING='identity')
+        recent = response.json()['recent_recipes']
+        self.assertEqual([recipe['title'] for recipe in recent], ['Sinigang'])
+        self.assertNotIn('steps', recent[0])
+
+    def test_moderation_cards_carry_the_live_claim(self):
+        admin = User.objects.create_user('admin', password='pw', role='admin')
+        Recipe.objects.filter(id=self.recipe.id).update(status='pending')
+        client = APIClient()
+        client.force_authenticate(admin)
+        [card] = client.get('/api/moderation/queue/').data['results']
+        self.assertEqual((card['title'], card['claim']), ('Sinigang', None))
+
+        # Claiming does not change the recipe, so the cached card stays and the claim is live
+        client.post(f'/api/moderation/queue/{self.recipe.id}/claim/')
+        [card] = client.get('/api/moderation/queue/').data['results']
+        self.assertEqual(card['claim']['moderator']['username'], 'admin')
@@ -0,0 +1,71 @@
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes import changes, ratings
+from recipes.models import Recipe, RecipeChange, User
+
+
+@override_settings(READ_REPLICA_VIEWS=[])
+class ChangeLogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['recipes'].clear()
+        self.author = User.objects.create_user('author', password='pw')
+        self.recipe = self.create('Chicken Adobo')
+        self.client = APIClient()
+
+    def create(self, title, status='approved'):
+        return Recipe.objects.create(
+            title=title, description='Dish', ingredients=['chicken'], steps='Cook', author=self.author,
+            status=status,
+        )
+
+    def sync(self, cursor, **params):
+        response = self.client.get('/api/recipes/changes/', {'since': cursor, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_keeps_one_row_per_recipe(self):
+        cursor = changes.latest_cursor()
+        self.recipe.title = 'Pork Adobo'
+        self.recipe.save()
+        ratings.rate(self.recipe.id, User.objects.create_user('rater', password='pw'), 4)
+        self.assertEqual(changes.since(cursor, 10)[0], [(self.recipe.id, 'upsert')])
+        self.assertEqual(RecipeChange.objects.filter(recipe_id=self.recipe.id).count(), 1)
+
+        recipe_id = self.recipe.id
+        self.recipe.delete()
+        self.assertEqual(changes.drain(cursor), ({recipe_id}, changes.latest_cursor()))
+        self.assertEqual(RecipeChange.objects.get(recipe_id=recipe_id).kind, 'delete')
+
+    def test_pages_through_changes(self):
+        cursor = changes.latest_cursor()
+        others = [self.create(title).id for title in ('Sinigang', 'Kare-Kare', 'Lechon')]
+        rows, cursor, has_more = changes.since(cursor, 2)
+        self.assertEqual(([recipe_id for recipe_id, _ in rows], has_more), (others[:2], True))
+        rows, cursor, has_more = changes.since(cursor, 2)
+        self.assertEqual(([recipe_id for recipe_id, _ in rows], has_more), (others[2:], False))
+        self.assertEqual(changes.since(cursor, 2), ([], cursor, False))
+
+    def test_endpoint_follows_the_list_cursor(self):
+        cursor = int(self.client.get('/api/recipes/')['X-Changes-Cursor'])
+        self.assertEqual(self.sync(cursor), {'cursor': cursor, 'has_more': False, 'recipes': [], 'deleted': []})
+
+        self.recipe.title = 'Pork Adobo'
+        self.recipe.save()
+        pending = self.create('Draft', status='pending')
+        data = self.sync(cursor)
+        self.assertEqual([recipe['title'] for recipe in data['recipes']], ['Pork Adobo'])
+        # Recipes the caller cannot see are reported as deleted
+        self.assertEqual(data['deleted'], [pending.id])
+
+        recipe_id = self.recipe.id
+        self.recipe.delete()
+        data = self.sync(data['cursor'])
+        self.assertEqual((data['recipes'], data['deleted']), ([], [recipe_id]))
+
+    def test_endpoint_rejects_bad_and_unknown_cursors(self):
+        self.assertEqual(self.client.get('/api/recipes/changes/', {'since': 'x'}).status_code, 400)
+        response = self.client.get('/api/recipes/changes/', {'since': changes.latest_cursor() + 1})
+        self.assertEqual((response.status_code, response.data['cursor']), (410, changes.latest_cursor()))
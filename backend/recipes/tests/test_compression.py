@@ -0,0 +1,70 @@
+import gzip
+import json
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from cookbook.compression import negotiate, precompress, precompressed_response
+from cookbook.middleware import CompressionMiddleware
+
+BODY = json.dumps([{'id': number, 'title': 'Chicken Adobo'} for number in range(200)]).encode()
+
+
+def request(accept_encoding=None):
+    headers = {} if accept_encoding is None else {'HTTP_ACCEPT_ENCODING': accept_encoding}
+    return RequestFactory().get('/', **headers)
+
+
+class NegotiateTests(SimpleTestCase):
+    def test_prefers_brotli_and_honours_q_values(self):
+        self.assertEqual(negotiate(request('gzip, br')), 'br')
+        self.assertEqual(negotiate(request('gzip, br;q=0')), 'gzip')
+        self.assertEqual(negotiate(request('br;q=0.5, gzip')), 'gzip')
+        self.assertEqual(negotiate(request('*')), 'br')
+        self.assertIsNone(negotiate(request('')))
+        self.assertIsNone(negotiate(request('identity')))
+
+    def test_picks_among_available_encodings(self):
+        self.assertEqual(negotiate(request('br, gzip'), ['identity', 'gzip']), 'gzip')
+        self.assertIsNone(negotiate(request('br'), ['identity', 'gzip']))
+
+
+class PrecompressedResponseTests(SimpleTestCase):
+    def test_falls_back_to_a_stored_variant_the_client_accepts(self):
+        # br used to win the negotiation and, with no br variant stored, send identity
+        variants = {'identity': BODY, 'gzip': gzip.compress(BODY)}
+        response = precompressed_response(request('br, gzip'), variants)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_identity_when_nothing_else_is_accepted(self):
+        response = precompressed_response(request('deflate'), precompress(BODY))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, BODY)
+
+    def test_refused_identity(self):
+        self.assertEqual(precompressed_response(request('identity;q=0'), {'identity': BODY}).status_code, 406)
+        self.assertEqual(precompressed_response(request('*;q=0'), {'identity': BODY}).status_code, 406)
+        response = precompressed_response(request('gzip, identity;q=0'), precompress(BODY))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    def respond(self, response, accept_encoding='gzip'):
+        return CompressionMiddleware(lambda request: response)(request(accept_encoding))
+
+    def test_compresses_large_json(self):
+        response = self.respond(HttpResponse(BODY, content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+    def test_leaves_small_and_binary_bodies(self):
+        self.assertFalse(self.respond(HttpResponse(b'{}', content_type='application/json')).has_header('Content-Encoding'))
+        self.assertFalse(self.respond(HttpResponse(BODY, content_type='image/png')).has_header('Content-Encoding'))
+
+    def test_streams_compressed(self):
+        response = self.respond(StreamingHttpResponse(iter([BODY, BODY]), content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), BODY + BODY)
@@ -0,0 +1,106 @@
+import asyncio
+import json
+from unittest import mock
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, override_settings
+
+from cookbook.renderers import dumps_text
+from recipes.consumers import CLOSE_SLOW_CONSUMER, RecipeConsumer, registry
+
+
+class SlowConsumer(RecipeConsumer):
+    """
+    RecipeConsumer behind a congested link: every send takes a second
+    """
+    async def send(self, *args, **kwargs):
+        await asyncio.sleep(1)
+        await super().send(*args, **kwargs)
+
+
+def frame(number):
+    return dumps_text({'type': 'recipe_update', 'data': {'id': number, 'title': 'x' * 400}})
+
+
+@override_settings(WS_SEND_WINDOW_BYTES=1000, WS_SEND_QUEUE_SIZE=64, WS_SEND_TIMEOUT=10,
+                   WS_SLOW_CONSUMER_POLICY='close', WS_HEARTBEAT_SECONDS=3600)
+@mock.patch.object(RecipeConsumer, 'latest_seq', mock.AsyncMock(return_value=0))
+class BackpressureTests(SimpleTestCase):
+    async def connect(self, consumer=RecipeConsumer):
+        communicator = WebsocketCommunicator(consumer.as_asgi(), '/ws/recipes/')
+        connected, _ = await communicator.connect(timeout=5)
+        self.assertTrue(connected)
+        self.assertEqual(json.loads(await communicator.receive_from(timeout=5))['type'], 'welcome')
+        return communicator
+
+    async def broadcast(self, numbers):
+        for number in numbers:
+            await get_channel_layer().group_send('recipes', {'type': 'recipe_update', 'frame': frame(number)})
+
+    async def read(self, communicator, count, answer_pings=True):
+        """
+        The ids of the next `count` broadcasts the client reads, answering pings on the way
+        """
+        ids = []
+        while len(ids) < count:
+            message = json.loads(await communicator.receive_from(timeout=5))
+            if message['type'] == 'ping':
+                self.assertTrue(answer_pings, 'unexpected ping')
+                await communicator.send_to(text_data=dumps_text({'type': 'pong'}))
+            else:
+                ids.append(message['data']['id'])
+        return ids
+
+    async def assertClosedSlow(self, communicator):
+        self.assertEqual(await communicator.receive_output(timeout=5),
+                         {'type': 'websocket.close', 'code': CLOSE_SLOW_CONSUMER})
+        await communicator.disconnect()
+
+    async def test_client_confirming_reads_gets_every_frame(self):
+        communicator = await self.connect()
+        await self.broadcast(range(20))
+        self.assertEqual(await self.read(communicator, 20), list(range(20)))
+        await communicator.disconnect()
+
+    async def test_unconfirmed_bytes_hold_frames_until_the_queue_overflows(self):
+        # daphne's send never blocks, so a client that stopped reading used to buffer without bound
+        sent = registry.counters['frames_sent']
+        with self.settings(WS_SEND_QUEUE_SIZE=4):
+            communicator = await self.connect()
+            await self.broadcast(range(10))
+            self.assertEqual(await self.read(communicator, 2, answer_pings=False), [0, 1])
+            self.assertEqual(json.loads(await communicator.receive_from(timeout=5)), {'type': 'ping'})
+            await self.assertClosedSlow(communicator)
+        self.assertEqual(registry.counters['frames_sent'] - sent, 3)
+
+    async def test_drop_oldest_resumes_after_the_pong(self):
+        dropped = registry.counters['frames_dropped']
+        with self.settings(WS_SEND_QUEUE_SIZE=2, WS_SLOW_CONSUMER_POLICY='drop_oldest'):
+            communicator = await self.connect()
+            await self.broadcast(range(3))
+            self.assertEqual(await self.read(communicator, 2, answer_pings=False), [0, 1])
+            self.assertEqual(json.loads(await communicator.receive_from(timeout=5)), {'type': 'ping'})
+            # 2 waits for the pong; 3 is pushed out of the queue by 5
+            await self.broadcast(range(3, 6))
+            while registry.counters['frames_dropped'] == dropped:
+                await asyncio.sleep(0.01)
+            await communicator.send_to(text_data=dumps_text({'type': 'pong'}))
+            self.assertEqual(await self.read(communicator, 3), [2, 4, 5])
+        self.assertEqual(registry.counters['frames_dropped'] - dropped, 1)
+        await communicator.disconnect()
+
+    async def test_held_frame_times_out(self):
+        with self.settings(WS_SEND_TIMEOUT=0.2):
+            communicator = await self.connect()
+            await self.broadcast(range(3))
+            self.assertEqual(await self.read(communicator, 2, answer_pings=False), [0, 1])
+            self.assertEqual(json.loads(await communicator.receive_from(timeout=5)), {'type': 'ping'})
+            await self.assertClosedSlow(communicator)
+
+    async def test_slow_send_times_out(self):
+        with self.settings(WS_SEND_TIMEOUT=0.2):
+            communicator = WebsocketCommunicator(SlowConsumer.as_asgi(), '/ws/recipes/')
+            connected, _ = await communicator.connect(timeout=5)
+            self.assertTrue(connected)
+            await self.assertClosedSlow(communicator)
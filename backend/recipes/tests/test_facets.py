@@ -0,0 +1,49 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from recipes import facets
+from recipes.models import Recipe, User
+
+
+@override_settings(FACETS_SYNC_SECONDS=0)
+class BrowseTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='pw')
+        self.recipe = self.create('Chicken Adobo')
+        facets.build()
+
+    def create(self, title):
+        return Recipe.objects.create(
+            title=title, description='Dish', ingredients=['chicken'], steps='Cook', author=self.author,
+            status='approved',
+        )
+
+    def ids(self):
+        return facets.browse({})[1]
+
+    def test_follows_saved_and_deleted_recipes(self):
+        self.assertEqual(self.ids(), [self.recipe.id])
+        other = self.create('Pork Adobo')
+        self.assertEqual(sorted(self.ids()), [self.recipe.id, other.id])
+        self.recipe.delete()
+        self.assertEqual(self.ids(), [other.id])
+
+    def test_browse_runs_while_a_sync_reads_the_database(self):
+        # A slow sync used to hold the index lock, stalling every browse in the process
+        browsed = []
+        rows = facets._rows
+
+        def slow_rows(*args, **kwargs):
+            browser = threading.Thread(target=lambda: browsed.append(self.ids()))
+            browser.start()
+            browser.join(timeout=5)
+            self.assertFalse(browser.is_alive())
+            return rows(*args, **kwargs)
+
+        other = self.create('Pork Adobo')
+        with mock.patch.object(facets, '_rows', slow_rows):
+            self.assertEqual(sorted(self.ids()), [self.recipe.id, other.id])
+        # The concurrent browse saw the index as it was before the sync
+        self.assertEqual(browsed, [[self.recipe.id]])
@@ -0,0 +1,39 @@
+import threading
+
+from django.test import TransactionTestCase
+
+from recipes import jobs
+from recipes.models import Job
+
+calls = []
+
+
+def record(value):
+    calls.append(value)
+
+
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+        jobs.task(name='tests.record')(record)
+        self.addCleanup(jobs._registry.pop, 'tests.record', None)
+
+    def run_worker(self, seconds):
+        stop = threading.Event()
+        threading.Timer(seconds, stop.set).start()
+        return jobs.Worker(concurrency=1, poll_seconds=0.05).run(stop=stop)
+
+    def test_idles_on_an_empty_queue_until_stopped(self):
+        # Used to wait on the in-process asyncio wakeup, which a standalone worker never has
+        self.assertEqual(self.run_worker(0.3), 0)
+
+    def test_runs_queued_jobs_then_idles(self):
+        jobs.enqueue(record, 'a')
+        self.assertEqual(self.run_worker(0.5), 1)
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(Job.objects.get().status, 'done')
+
+    def test_once_drains_and_returns(self):
+        jobs.enqueue(record, 'b')
+        self.assertEqual(jobs.Worker(concurrency=1, poll_seconds=0.05).run(once=True), 1)
+        self.assertEqual(calls, ['b'])
@@ -0,0 +1,172 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from cookbook.media import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+from cookbook.storage import is_hashed_name
+from recipes import tasks
+from recipes.models import Job, MediaBlob, Recipe, User
+
+
+def png(color='red', name='photo.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class MediaTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp(prefix='media-')
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root, READ_REPLICA_VIEWS=[])
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def released(self):
+        return list(Job.objects.filter(name='recipes.tasks.release_media').values_list('args', flat=True))
+
+
+class ReplaceImageTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('cook', password='pw')
+        self.user.profile_image = png('red')
+        self.user.save()
+        self.old_image = self.user.profile_image.name
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def update_profile(self, **data):
+        return self.client.put('/api/auth/profile/update/', {'profile_image': png('blue'), **data}, format='multipart')
+
+    def test_rejected_update_keeps_the_old_image(self):
+        response = self.update_profile(github_link='not a url')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.released(), [])
+        self.assertEqual(MediaBlob.objects.get(name=self.old_image).refcount, 1)
+
+    def test_replaced_image_is_released(self):
+        response = self.update_profile(bio='Lutong bahay')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.released(), [[self.old_image]])
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.profile_image.name, self.old_image)
+
+
+class UploadHandlerTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('cook', password='pw')
+        self.recipe = Recipe.objects.create(
+            title='Pancit', description='Noodles', ingredients=['noodles'], steps='Stir-fry', author=self.user,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_image_endpoints_reject_non_images(self):
+        text = SimpleUploadedFile('notes.png', b'not an image at all', content_type='image/png')
+        response = self.client.post(f'/api/recipes/{self.recipe.id}/photo/', {'image': text}, format='multipart')
+        self.assertEqual(response.status_code, 415)
+
+    def test_image_endpoints_accept_images(self):
+        response = self.client.post(f'/api/recipes/{self.recipe.id}/photo/', {'image': png()}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_uploads_are_not_sniffed(self):
+        request = RequestFactory().post('/elsewhere/', {'notes': SimpleUploadedFile('notes.txt', b'plain text')})
+        self.assertEqual(request.FILES['notes'].read(), b'plain text')
+
+
+class RefcountTests(MediaTestCase):
+    def test_identical_uploads_share_a_blob_until_the_last_release(self):
+        first = default_storage.save('a.png', png('green'))
+        second = default_storage.save('b.png', png('green'))
+        self.assertEqual(first, second)
+        self.assertEqual(MediaBlob.objects.get(name=first).refcount, 2)
+
+        tasks.release_media(first)
+        self.assertEqual(MediaBlob.objects.get(name=first).refcount, 1)
+        self.assertFalse(Job.objects.filter(name='recipes.tasks.collect_media').exists())
+
+        tasks.release_media(first)
+        self.assertEqual(MediaBlob.objects.get(name=first).refcount, 0)
+        self.assertEqual(Job.objects.get(name='recipes.tasks.collect_media').args, [first])
+        # Still served during the grace period
+        self.assertTrue(os.path.exists(default_storage.path(first)))
+
+        tasks.collect_media(first)
+        self.assertFalse(MediaBlob.objects.filter(name=first).exists())
+        self.assertFalse(os.path.exists(default_storage.path(first)))
+
+    def test_gc_media_only_collects_unreferenced_blobs(self):
+        kept = default_storage.save('a.png', png('green'))
+        dropped = default_storage.save('b.png', png('yellow'))
+        default_storage.delete(dropped)
+        call_command('gc_media', grace_minutes=0, stdout=io.StringIO())
+        self.assertTrue(os.path.exists(default_storage.path(kept)))
+        self.assertFalse(os.path.exists(default_storage.path(dropped)))
+        self.assertEqual(list(MediaBlob.objects.values_list('name', flat=True)), [kept])
+
+
+class ServeTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.body = png('green').read()
+        self.hashed = default_storage.save('photo.png', SimpleUploadedFile('photo.png', self.body))
+        self.legacy = 'legacy/photo.png'
+        os.makedirs(os.path.dirname(default_storage.path(self.legacy)))
+        with open(default_storage.path(self.legacy), 'wb') as legacy:
+            legacy.write(self.body)
+
+    def get(self, name, **headers):
+        return self.client.get(f'/media/{name}', **headers)
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_hashed_names_are_immutable(self):
+        self.assertTrue(is_hashed_name(self.hashed))
+        self.assertTrue(is_hashed_name('recipes/photo.0123456789ab.png'))
+        self.assertFalse(is_hashed_name(self.legacy))
+        response = self.get(self.hashed)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(self.content(response), self.body)
+
+    def test_legacy_names_revalidate(self):
+        response = self.get(self.legacy)
+        self.assertEqual(response['Cache-Control'], REVALIDATE_CACHE_CONTROL)
+        revalidated = self.get(self.legacy, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        revalidated = self.get(self.legacy, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_byte_ranges(self):
+        size = len(self.body)
+        response = self.get(self.hashed, HTTP_RANGE='bytes=2-5')
+        self.assertEqual((response.status_code, response['Content-Range']), (206, f'bytes 2-5/{size}'))
+        self.assertEqual(self.content(response), self.body[2:6])
+
+        response = self.get(self.hashed, HTTP_RANGE='bytes=-4')
+        self.assertEqual(self.content(response), self.body[-4:])
+
+        response = self.get(self.hashed, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f'bytes */{size}'))
+
+        # A stale If-Range gets the whole file
+        response = self.get(self.hashed, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), self.body)
+
+    def test_missing_and_escaping_paths_are_not_found(self):
+        self.assertEqual(self.get('missing.png').status_code, 404)
+        self.assertEqual(self.get('legacy').status_code, 404)
+        self.assertEqual(self.get('../settings.py').status_code, 404)
@@ -0,0 +1,77 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.test import SimpleTestCase, override_settings
+
+from cookbook import metrics
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _snapshot(pid, jobs, gauge):
+    return {'pid': pid, 'instance': f'{pid}-test', 'metrics': {
+        'tests_jobs_total': {'kind': 'counter', 'help': 'Jobs', 'labelnames': [], 'values': [[[], jobs]]},
+        'tests_open': {'kind': 'gauge', 'help': 'Open', 'labelnames': [], 'values': [[[], gauge]]},
+    }}
+
+
+class TombstoneTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp(prefix='metrics-'))
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(METRICS_DIR=str(self.directory), METRICS_FLUSH_SECONDS=5)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write(self, name, snapshot, age=0):
+        path = self.directory / name
+        path.write_text(json.dumps(snapshot))
+        if age:
+            stamp = time.time() - age
+            os.utime(path, (stamp, stamp))
+        return path
+
+    def totals(self):
+        merged = metrics.merge(metrics.registry.gather())
+        return {name: merged.get(name, {'values': {}})['values'].get(()) for name in ('tests_jobs_total', 'tests_open')}
+
+    def test_exited_process_is_folded_into_the_tombstone(self):
+        dead = self.write('dead.json', _snapshot(_dead_pid(), 3, 7))
+        live = self.write('live.json', _snapshot(os.getpid(), 2, 1))
+        self.assertEqual(self.totals(), {'tests_jobs_total': 5, 'tests_open': 1})
+        self.assertFalse(dead.exists())
+        self.assertTrue(live.exists())
+        self.assertTrue((self.directory / metrics.TOMBSTONE).exists())
+        # Totals hold on the next scrape, now that the counter comes from the tombstone
+        self.assertEqual(self.totals(), {'tests_jobs_total': 5, 'tests_open': 1})
+
+    def test_stale_file_of_a_reused_pid_is_folded(self):
+        # The pid is alive again, but the file has not been rewritten for many flush intervals
+        stale = self.write('stale.json', _snapshot(os.getpid(), 4, 9), age=metrics.STALE_FLUSHES * 5 + 60)
+        self.assertEqual(self.totals(), {'tests_jobs_total': 4, 'tests_open': None})
+        self.assertFalse(stale.exists())
+        self.assertEqual(self.totals(), {'tests_jobs_total': 4, 'tests_open': None})
+
+    def test_tombstone_accumulates(self):
+        self.write('first.json', _snapshot(_dead_pid(), 1, 0))
+        self.totals()
+        self.write('second.json', _snapshot(_dead_pid(), 2, 0))
+        self.assertEqual(self.totals()['tests_jobs_total'], 3)
+        self.assertEqual(self.totals()['tests_jobs_total'], 3)
+        self.assertEqual(sorted(path.name for path in self.directory.iterdir()), [metrics.TOMBSTONE])
+
+    def test_held_lock_defers_folding(self):
+        dead = self.write('dead.json', _snapshot(_dead_pid(), 3, 0))
+        (self.directory / metrics.TOMBSTONE_LOCK).touch()
+        self.assertEqual(self.totals()['tests_jobs_total'], 3)
+        self.assertTrue(dead.exists())
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes import moderation
+from recipes.models import ModerationClaim, Recipe, User
+
+
+@override_settings(READ_REPLICA_VIEWS=[])
+class ClaimTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['recipes'].clear()
+        author = User.objects.create_user('author', password='pw')
+        self.recipe = Recipe.objects.create(
+            title='Sinigang', description='Sour soup', ingredients=['tamarind'], steps='Boil', author=author,
+            status='pending',
+        )
+        self.ana = User.objects.create_user('ana', password='pw', role='admin')
+        self.ben = User.objects.create_user('ben', password='pw', role='admin')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def expire(self):
+        ModerationClaim.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_live_lease_blocks_other_moderators(self):
+        claim, acquired = moderation.claim(self.recipe.id, self.ana)
+        self.assertTrue(acquired)
+        holder, acquired = moderation.claim(self.recipe.id, self.ben)
+        self.assertFalse(acquired)
+        self.assertEqual(holder.moderator, self.ana)
+
+        # Claiming again renews the lease
+        ModerationClaim.objects.update(expires_at=timezone.now() + timedelta(seconds=5))
+        renewed, acquired = moderation.claim(self.recipe.id, self.ana)
+        self.assertTrue(acquired)
+        self.assertEqual(ModerationClaim.objects.get().expires_at, renewed.expires_at)
+
+    def test_expired_lease_goes_to_one_moderator(self):
+        moderation.claim(self.recipe.id, self.ana)
+        self.expire()
+        self.assertTrue(moderation.claim(self.recipe.id, self.ben)[1])
+        # Whoever comes next finds the lease taken again
+        holder, acquired = moderation.claim(self.recipe.id, self.ana)
+        self.assertEqual((acquired, holder.moderator), (False, self.ben))
+
+    def test_first_claim_race(self):
+        # Both moderators find no claim row; ana inserts hers just before ben's insert
+        atomic = moderation.transaction.atomic
+        blocks = []
+
+        def interleaved(*args, **kwargs):
+            blocks.append(args)
+            if len(blocks) == 2:
+                ModerationClaim.objects.create(
+                    recipe=self.recipe, moderator=self.ana, claimed_at=timezone.now(),
+                    expires_at=timezone.now() + timedelta(minutes=5),
+                )
+            return atomic(*args, **kwargs)
+
+        with mock.patch.object(moderation.transaction, 'atomic', interleaved):
+            holder, acquired = moderation.claim(self.recipe.id, self.ben)
+        self.assertEqual((acquired, holder.moderator), (False, self.ana))
+        self.assertEqual(ModerationClaim.objects.get().moderator, self.ana)
+
+    def test_endpoints(self):
+        ana, ben = self.client_for(self.ana), self.client_for(self.ben)
+        claim_url = f'/api/moderation/queue/{self.recipe.id}/claim/'
+        self.assertEqual(ana.post(claim_url).status_code, 200)
+
+        response = ben.post(claim_url)
+        self.assertEqual((response.status_code, response.data['claim']['moderator']['username']), (409, 'ana'))
+        self.assertEqual(ben.post(f'/api/recipes/{self.recipe.id}/approve/').status_code, 409)
+        self.assertEqual(ben.get('/api/moderation/queue/', {'available': 1}).data['results'], [])
+
+        self.assertEqual(ana.post(f'/api/moderation/queue/{self.recipe.id}/release/').status_code, 204)
+        self.assertEqual(ben.post(f'/api/recipes/{self.recipe.id}/approve/').status_code, 200)
+        self.assertFalse(ModerationClaim.objects.exists())
+        self.assertEqual(ana.post(claim_url).status_code, 409)
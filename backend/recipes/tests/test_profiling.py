@@ -0,0 +1,93 @@
+import json
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from cookbook import profiling
+from recipes.models import HomepageContent, Recipe, User
+
+
+class ProfileRequestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['recipes'].clear()
+        directory = tempfile.mkdtemp(prefix='profiles-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.directory = Path(directory)
+        settings = override_settings(PROFILING_DIR=directory, READ_REPLICA_VIEWS=[])
+        settings.enable()
+        self.addCleanup(settings.disable)
+        HomepageContent.objects.create(id=1)
+        author = User.objects.create_user('author', password='pw')
+        Recipe.objects.create(
+            title='Sinigang', description='Sour soup', ingredients=['tamarind'], steps='Boil', author=author,
+            status='approved',
+        )
+        self.admin = User.objects.create_user('admin', password='pw', role='admin')
+
+    def get(self, user, **params):
+        client = APIClient()
+        token = RefreshToken.for_user(user).access_token
+        return client.get('/api/homepage/', params, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def saved(self, response):
+        profile_id = response['X-Profile-Id']
+        return json.loads((self.directory / f'{profile_id}.json').read_text()), profile_id
+
+    def test_admin_captures_a_cprofile(self):
+        response = self.get(self.admin, profile='cprofile')
+        self.assertEqual(response.status_code, 200)
+        tags, profile_id = self.saved(response)
+        self.assertTrue((self.directory / f'{profile_id}.prof').exists())
+        self.assertEqual((tags['mode'], tags['view'], tags['status']), ('cprofile', 'homepage_data', 200))
+        self.assertGreater(tags['sql_count'], 0)
+        self.assertIn('render_ms', tags)
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_admin_captures_a_sampled_profile(self):
+        with self.settings(PROFILING_SAMPLE_INTERVAL=0.0001):
+            response = self.get(self.admin, profile='sample')
+        tags, profile_id = self.saved(response)
+        self.assertEqual(tags['mode'], 'sample')
+        self.assertTrue((self.directory / f'{profile_id}.folded').exists())
+
+    def test_other_users_and_unknown_modes_are_not_profiled(self):
+        cook = User.objects.create_user('cook', password='pw')
+        self.assertFalse(self.get(cook, profile='cprofile').has_header('X-Profile-Id'))
+        self.assertFalse(APIClient().get('/api/homepage/', {'profile': 'cprofile'}).has_header('X-Profile-Id'))
+        self.assertFalse(self.get(self.admin, profile='trace').has_header('X-Profile-Id'))
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_keeps_the_newest_profiles(self):
+        with self.settings(PROFILING_KEEP=2):
+            for _ in range(3):
+                self.get(self.admin, profile='cprofile')
+        self.assertEqual(len(list(self.directory.glob('*.json'))), 2)
+        self.assertEqual(len(list(self.directory.glob('*.prof'))), 2)
+
+
+class SpanTests(SimpleTestCase):
+    def test_spans_only_time_profiled_requests(self):
+        with profiling.span('serialize'):
+            pass
+        tags = {}
+        token = profiling._tags.set(tags)
+        try:
+            with profiling.span('serialize'):
+                pass
+            with profiling.span('serialize'):
+                pass
+        finally:
+            profiling._tags.reset(token)
+        self.assertEqual(list(tags), ['serialize_ms'])
+
+    def test_collapse_roots_the_stack(self):
+        stack = profiling.collapse(sys._getframe(), root='view:homepage_data').split(';')
+        self.assertEqual(stack[0], 'view:homepage_data')
+        self.assertEqual(stack[-1], f'{__name__}.SpanTests.test_collapse_roots_the_stack')
@@ -0,0 +1,72 @@
+from django.test import TestCase, override_settings
+
+from recipes import ratings, recommendations
+from recipes.models import Job, NeighborRefresh, Rating, Recipe, RecipeNeighbor, User
+
+# user -> scores of recipes A..E
+SCORES = {
+    'ana': [5, 1, 4, 2, 3],
+    'ben': [4, 2, 5, 1, 3],
+    'cara': [1, 5, 2, 4, 3],
+    'dan': [2, 4, 1, 5, None],
+    'eve': [5, None, 4, 1, 2],
+}
+
+
+@override_settings(RECOMMENDATIONS_SHRINKAGE=1)
+class RefreshStaleTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user('author', password='pw')
+        self.recipes = [
+            Recipe.objects.create(
+                title=title, description='Dish', ingredients=['rice'], steps='Cook', author=author,
+                status='approved',
+            )
+            for title in 'ABCDE'
+        ]
+        self.users = {name: User.objects.create_user(name, password='pw') for name in SCORES}
+        for name, scores in SCORES.items():
+            for recipe, score in zip(self.recipes, scores):
+                if score is not None:
+                    ratings.rate(recipe.id, self.users[name], score)
+        recommendations.rebuild()
+
+    def lists(self):
+        lists = {}
+        for recipe_id, neighbor_id, similarity in RecipeNeighbor.objects.order_by('recipe_id', '-similarity').values_list(
+            'recipe_id', 'neighbor_id', 'similarity',
+        ):
+            lists.setdefault(recipe_id, []).append((neighbor_id, round(similarity, 9)))
+        return lists
+
+    def test_ratings_mark_recipes_stale_once(self):
+        a, b = self.recipes[:2]
+        ratings.rate(a.id, self.users['eve'], 1)
+        ratings.rate(b.id, self.users['eve'], 5)
+        self.assertEqual(sorted(NeighborRefresh.objects.values_list('recipe_id', flat=True)), [a.id, b.id])
+        self.assertEqual(Job.objects.filter(name='recipes.tasks.refresh_recommendations').count(), 1)
+
+    def test_incremental_refresh_matches_a_rebuild(self):
+        before = self.lists()
+        # Swapping two scores keeps ana's mean, so no other column drifts
+        a, b = self.recipes[:2]
+        ratings.rate(a.id, self.users['ana'], 1)
+        ratings.rate(b.id, self.users['ana'], 5)
+        self.assertGreater(recommendations.refresh_stale(), 2)
+        refreshed = self.lists()
+        self.assertNotEqual(refreshed, before)
+        self.assertFalse(NeighborRefresh.objects.exists())
+        # Patched lists used to lose neighbors that were not refreshed themselves
+        recommendations.rebuild()
+        self.assertEqual(refreshed, self.lists())
+
+    def test_recipe_without_ratings_leaves_every_list(self):
+        e = self.recipes[4]
+        Rating.objects.filter(recipe=e).delete()
+        recommendations.refresh_stale()
+        self.assertFalse(RecipeNeighbor.objects.filter(recipe=e).exists())
+        self.assertFalse(RecipeNeighbor.objects.filter(neighbor=e).exists())
+
+    def test_nothing_stale(self):
+        NeighborRefresh.objects.all().delete()
+        self.assertEqual(recommendations.refresh_stale(), 0)
@@ -0,0 +1,53 @@
+import datetime
+import decimal
+import json
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from cookbook import renderers
+from cookbook.renderers import FastJSONRenderer, dumps, dumps_text
+
+DATA = {
+    'title': 'Pancit Canton',
+    'accent': 'Niño',
+    'separator': 'line\u2028break',
+    'rating': decimal.Decimal('4.50'),
+    'created_at': datetime.datetime(2026, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc),
+    'day': datetime.date(2026, 1, 2),
+    'uuid': uuid.UUID(int=1),
+    'label': gettext_lazy('Recipes'),
+    'tags': ('noodles', 'party'),
+}
+
+
+class DumpsTests(SimpleTestCase):
+    def assertMatchesDRF(self):
+        content = dumps(DATA)
+        self.assertEqual(content, JSONRenderer().render(DATA))
+        self.assertIn(b'\\u2028', content)
+        self.assertEqual(dumps_text(DATA), content.decode('utf-8'))
+
+    def test_matches_drf_with_orjson(self):
+        if renderers.orjson is None:
+            self.skipTest('orjson is not installed')
+        # Datetimes used to come out as '+00:00' instead of DRF's 'Z'
+        self.assertMatchesDRF()
+
+    def test_matches_drf_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertMatchesDRF()
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def test_renders_compact_json(self):
+        self.assertEqual(FastJSONRenderer().render({'id': 1, 'title': 'Adobo'}), b'{"id":1,"title":"Adobo"}')
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_indent_requests_use_drf(self):
+        content = FastJSONRenderer().render({'id': 1}, 'application/json; indent=2')
+        self.assertEqual(content, b'{\n  "id": 1\n}')
+        self.assertEqual(json.loads(content), {'id': 1})
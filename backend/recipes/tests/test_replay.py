@@ -0,0 +1,119 @@
+import json
+from unittest import mock
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from recipes import replay
+from recipes.consumers import RecipeConsumer
+from recipes.models import OutboxEvent
+
+
+def frame(seq):
+    return replay.encode_frame(seq, 'recipe_update', {'action': 'rate', 'seq': seq})
+
+
+class ReplayBufferTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(replay, 'buffer', replay.ReplayBuffer(3))
+        self.buffer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, *seqs, group='recipes'):
+        for seq in seqs:
+            self.buffer.record(seq, group, frame(seq))
+
+    def test_returns_frames_after_the_last_seen_sequence(self):
+        self.record(10, 11)
+        self.record(12, group='moderators')
+        self.assertEqual(self.buffer.after(10, 'recipes'), [(11, frame(11))])
+        self.assertEqual(self.buffer.after(9, 'moderators'), [(12, frame(12))])
+        self.assertEqual(self.buffer.latest, 12)
+
+    def test_floor_follows_the_oldest_dropped_frame(self):
+        self.record(10, 11, 12)
+        self.assertEqual(self.buffer.floor, 9)
+        self.record(13)
+        self.assertEqual(self.buffer.floor, 10)
+        self.assertIsNone(self.buffer.after(9, 'recipes'))
+        self.assertEqual([seq for seq, _ in self.buffer.after(10, 'recipes')], [11, 12, 13])
+
+    def test_from_buffer(self):
+        self.assertIs(replay.from_buffer(5, 'recipes'), replay.UNKNOWN)
+        self.record(10, 11, 12, 13)
+        self.assertIs(replay.from_buffer(5, 'recipes'), replay.UNKNOWN)
+        self.assertEqual(replay.from_buffer(13, 'recipes'), [])
+        # A sequence from the future (e.g. reset development data) needs a resync
+        self.assertIsNone(replay.from_buffer(99, 'recipes'))
+        with self.settings(WS_REPLAY_MAX_EVENTS=2):
+            self.assertIsNone(replay.from_buffer(10, 'recipes'))
+
+
+class FromDatabaseTests(TestCase):
+    def setUp(self):
+        self.seqs = [
+            OutboxEvent.objects.create(
+                kind='broadcast', dispatched_at=timezone.now(),
+                payload={'group': group, 'type': 'recipe_update', 'data': {'action': 'rate'}},
+            ).id
+            for group in ('recipes', 'moderators', 'recipes')
+        ]
+
+    def test_rebuilds_missed_frames(self):
+        first, _, last = self.seqs
+        self.assertEqual(replay.from_database(first, 'recipes'),
+                         [(last, replay.encode_frame(last, 'recipe_update', {'action': 'rate'}))])
+        self.assertEqual(replay.from_database(first - 1, 'recipes')[0][0], first)
+        self.assertEqual(replay.latest_seq(), last)
+
+    def test_resync_when_rows_are_pruned_or_too_many(self):
+        first, _, last = self.seqs
+        self.assertIsNone(replay.from_database(last + 1, 'recipes'))
+        OutboxEvent.objects.filter(id=first).delete()
+        self.assertIsNone(replay.from_database(first - 1, 'recipes'))
+        with self.settings(WS_REPLAY_MAX_EVENTS=1):
+            self.assertIsNone(replay.from_database(first, 'recipes'))
+
+
+@override_settings(WS_HEARTBEAT_SECONDS=3600)
+class ResumeTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(replay, 'buffer', replay.ReplayBuffer(10))
+        self.addCleanup(patcher.stop)
+        buffer = patcher.start()
+        for seq in (10, 11, 12):
+            buffer.record(seq, 'recipes', frame(seq))
+
+    async def connect(self, path):
+        communicator = WebsocketCommunicator(RecipeConsumer.as_asgi(), path)
+        connected, _ = await communicator.connect(timeout=5)
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive(self, communicator):
+        return json.loads(await communicator.receive_from(timeout=5))
+
+    async def test_reconnect_replays_missed_broadcasts(self):
+        communicator = await self.connect('/ws/recipes/?last_seq=10')
+        self.assertEqual([(await self.receive(communicator))['seq'] for _ in range(2)], [11, 12])
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_resume_message_and_resync(self):
+        communicator = await self.connect('/ws/recipes/')
+        self.assertEqual(await self.receive(communicator), {'type': 'welcome', 'seq': 12})
+        await communicator.send_to(text_data=json.dumps({'type': 'resume', 'last_seq': 11}))
+        self.assertEqual((await self.receive(communicator))['seq'], 12)
+        await communicator.send_to(text_data=json.dumps({'type': 'resume', 'last_seq': 99}))
+        self.assertEqual(await self.receive(communicator), {'type': 'resync', 'seq': 12})
+        await communicator.disconnect()
+
+    async def test_live_copies_of_replayed_events_are_skipped(self):
+        communicator = await self.connect('/ws/recipes/?last_seq=11')
+        self.assertEqual((await self.receive(communicator))['seq'], 12)
+        for seq in (12, 13):
+            await get_channel_layer().group_send('recipes', {'type': 'recipe_update', 'seq': seq, 'frame': frame(seq)})
+        self.assertEqual((await self.receive(communicator))['seq'], 13)
+        await communicator.disconnect()
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes import leaderboard, ratings, retention
+from recipes.models import ArchivedRecipe, CompactedRating, LeaderboardEntry, Rating, RatingTally, Recipe, User
+
+
+@override_settings(READ_REPLICA_VIEWS=[])
+class CompactRatingsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['recipes'].clear()
+        self.author = User.objects.create_user('author', password='pw')
+        self.recipe = Recipe.objects.create(
+            title='Sinigang', description='Sour soup', ingredients=['tamarind'], steps='Boil', author=self.author,
+            status='approved',
+        )
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+        ratings.rate(self.recipe.id, self.alice, 5)
+        ratings.rate(self.recipe.id, self.bob, 3)
+        Rating.objects.update(created_at=timezone.now() - timedelta(days=1000))
+        self.horizon = timezone.now() - timedelta(days=730)
+
+    def compact(self):
+        after, compacted = 0, 0
+        while True:
+            after, count = retention.compact_ratings(self.horizon, after)
+            if after is None:
+                return compacted
+            compacted += count
+
+    def totals(self):
+        recipe = Recipe.objects.get(id=self.recipe.id)
+        entry = LeaderboardEntry.objects.get(recipe=self.recipe)
+        return recipe.rating_totals(), (entry.rating_count, entry.rating_sum)
+
+    def assertInStep(self, expected):
+        self.assertEqual(self.totals(), (expected, expected))
+        refreshed = leaderboard.refresh(self.recipe.id)
+        self.assertEqual((refreshed.rating_count, refreshed.rating_sum), expected)
+
+    def test_compaction_keeps_the_totals(self):
+        self.assertEqual(self.compact(), 2)
+        self.assertFalse(Rating.objects.exists())
+        self.assertEqual(sorted(CompactedRating.objects.values_list('user__username', 'score')),
+                         [('alice', 5), ('bob', 3)])
+        tally = RatingTally.objects.get(recipe=self.recipe)
+        self.assertEqual((tally.rating_count, tally.rating_sum), (2, 8))
+        self.assertInStep((2, 8))
+
+    def test_rating_again_replaces_the_compacted_rating(self):
+        # The rater used to be counted twice: once in the tally, once for the new rating
+        self.compact()
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        response = client.post(f'/api/recipes/{self.recipe.id}/rate/', {'score': 1}, format='json')
+        self.assertEqual((response.data['total_ratings'], response.data['average_rating']), (2, 2))
+        self.assertFalse(CompactedRating.objects.filter(user=self.alice).exists())
+        tally = RatingTally.objects.get(recipe=self.recipe)
+        self.assertEqual((tally.rating_count, tally.rating_sum), (1, 3))
+        self.assertInStep((2, 4))
+
+    def test_deleted_rater_leaves_the_tally(self):
+        self.compact()
+        self.bob.delete()
+        self.assertInStep((1, 5))
+
+    def test_only_old_ratings_are_compacted(self):
+        carol = User.objects.create_user('carol', password='pw')
+        ratings.rate(self.recipe.id, carol, 4)
+        self.assertEqual(self.compact(), 2)
+        self.assertEqual(list(Rating.objects.values_list('user__username', flat=True)), ['carol'])
+        self.assertInStep((3, 12))
+
+
+@override_settings(READ_REPLICA_VIEWS=[])
+class ArchiveDeclinedTests(TestCase):
+    def test_archives_long_declined_recipes(self):
+        author = User.objects.create_user('author', password='pw')
+        old, recent = (
+            Recipe.objects.create(
+                title=title, description='Dish', ingredients=['rice'], steps='Cook', author=author, status='declined',
+            )
+            for title in ('Old', 'Recent')
+        )
+        Recipe.objects.filter(id=old.id).update(updated_at=timezone.now() - timedelta(days=100))
+        after, archived, _ = retention.archive_declined(retention.declined_horizon())
+        self.assertEqual((after, archived), (old.id, 1))
+        self.assertEqual(retention.archive_declined(retention.declined_horizon(), after)[0], None)
+        self.assertEqual(list(Recipe.objects.values_list('id', flat=True)), [recent.id])
+        archive = ArchivedRecipe.objects.get()
+        self.assertEqual((archive.id, archive.title, archive.data['title']), (old.id, 'Old', 'Old'))
@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from cookbook import routers
+from recipes.models import Recipe, User
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+    def test_reads_follow_the_context_and_writes_stay_on_the_primary(self):
+        router = routers.ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+        with routers.reading_from('replica'):
+            self.assertEqual(router.db_for_read(Recipe), 'replica')
+            self.assertEqual(router.db_for_write(Recipe), 'default')
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+        self.assertTrue(router.allow_migrate('default', 'recipes'))
+        self.assertFalse(router.allow_migrate('replica', 'recipes'))
+
+
+@override_settings(READ_REPLICA_VIEWS=['recipe_list_create'], READ_YOUR_WRITES_SECONDS=5)
+class ReplicaForTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def request(self, method='get', token='first'):
+        return getattr(RequestFactory(), method)('/api/recipes/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_only_reads_of_listed_views(self):
+        self.assertEqual(routers.replica_for(self.request(), 'recipe_list_create'), 'replica')
+        self.assertIsNone(routers.replica_for(self.request('post'), 'recipe_list_create'))
+        self.assertIsNone(routers.replica_for(self.request(), 'profile'))
+        with self.settings(READ_REPLICA_ALIAS='missing'):
+            self.assertIsNone(routers.replica_for(self.request(), 'recipe_list_create'))
+
+    def test_read_your_writes(self):
+        routers.wrote(self.request('post'))
+        self.assertIsNone(routers.replica_for(self.request(), 'recipe_list_create'))
+        # Other callers keep reading from the replica
+        self.assertEqual(routers.replica_for(self.request(token='second'), 'recipe_list_create'), 'replica')
+        anonymous = RequestFactory().post('/api/recipes/')
+        routers.wrote(anonymous)
+        self.assertEqual(routers.replica_for(RequestFactory().get('/api/recipes/'), 'recipe_list_create'), 'replica')
+
+    def test_window_can_be_disabled(self):
+        with self.settings(READ_YOUR_WRITES_SECONDS=0):
+            routers.wrote(self.request('post'))
+        self.assertEqual(routers.replica_for(self.request(), 'recipe_list_create'), 'replica')
+
+
+# The test replica mirrors the primary but cannot see rows of the test's open transaction,
+# so the primary stands in for it and the routing decisions are recorded
+@override_settings(READ_REPLICA_VIEWS=['recipe_list_create'], READ_REPLICA_ALIAS='default')
+class ReadReplicaMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['recipes'].clear()
+        self.cook = User.objects.create_user('cook', password='pw')
+        self.recipe = Recipe.objects.create(
+            title='Sinigang', description='Sour soup', ingredients=['tamarind'], steps='Boil', author=self.cook,
+            status='approved',
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.cook).access_token}')
+        patcher = mock.patch.object(routers, 'read_from', wraps=routers.read_from)
+        self.read_from = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def routed(self, path):
+        self.read_from.reset_mock()
+        self.assertEqual(self.client.get(path).status_code, 200)
+        return [call.args[0] for call in self.read_from.call_args_list if call.args[0] is not None]
+
+    def test_routes_listed_views_until_the_caller_writes(self):
+        self.assertEqual(self.routed('/api/recipes/'), ['default'])
+        self.assertEqual(self.routed(f'/api/recipes/{self.recipe.id}/'), [])
+
+        response = self.client.post(f'/api/recipes/{self.recipe.id}/rate/', {'score': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.routed('/api/recipes/'), [])
+
+        # A failed write changes nothing, so it does not pin the caller to the primary
+        cache.clear()
+        self.client.post(f'/api/recipes/{self.recipe.id}/rate/', {'score': 9}, format='json')
+        self.assertEqual(self.routed('/api/recipes/'), ['default'])
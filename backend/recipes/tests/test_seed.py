@@ -0,0 +1,72 @@
+import io
+
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.test import TestCase
+
+from recipes import leaderboard, seed
+from recipes.models import LeaderboardEntry, Rating, Recipe, RecipeChange, User
+
+
+def quiet(message):
+    pass
+
+
+class SeedTests(TestCase):
+    def seed(self, **kwargs):
+        return seed.seed(log=quiet, **{'users': 20, 'recipes': 30, 'ratings_per_recipe': 4, **kwargs})
+
+    def rows(self):
+        return (
+            list(Recipe.objects.order_by('id').values_list('id', 'title', 'status', 'author__username', 'ingredients')),
+            list(Rating.objects.order_by('id').values_list('recipe_id', 'user__username', 'score')),
+        )
+
+    def seeded(self, **kwargs):
+        """
+        The rows a seed run creates, rolled back afterwards
+        """
+        with transaction.atomic():
+            self.seed(**kwargs)
+            rows = self.rows()
+            transaction.set_rollback(True)
+        return rows
+
+    def test_same_seed_same_rows(self):
+        first = self.seeded(seed=7)
+        self.assertEqual(self.seeded(seed=7), first)
+        self.assertNotEqual(self.seeded(seed=8), first)
+
+    def test_creates_the_counts_asked_for(self):
+        created = self.seed()
+        samples = len(seed.SAMPLE_RECIPES)
+        admins = len(seed.SUPER_ADMINS)
+        self.assertEqual(created, {'users': admins + 20, 'recipes': samples + 30, 'ratings': samples * admins + 30 * 4})
+        synthetic = Recipe.objects.exclude(title__in=[recipe['title'] for recipe in seed.SAMPLE_RECIPES])
+        raters = synthetic.annotate(raters=Count('ratings__user', distinct=True)).values_list('raters', flat=True)
+        self.assertEqual(set(raters), {4})
+        self.assertTrue(User.objects.get(username='cook1').check_password(seed.SAMPLE_PASSWORD))
+
+    def test_bulk_rows_keep_leaderboard_and_change_log_in_step(self):
+        self.seed()
+        for recipe_id, count, total in Rating.objects.values('recipe_id').annotate(
+            count=Count('id'), total=Sum('score'),
+        ).values_list('recipe_id', 'count', 'total'):
+            entry = LeaderboardEntry.objects.get(recipe_id=recipe_id)
+            self.assertEqual((entry.rating_count, entry.rating_sum), (count, total))
+            refreshed = leaderboard.refresh(recipe_id)
+            self.assertEqual(refreshed.score, entry.score)
+        self.assertEqual(RecipeChange.objects.count(), Recipe.objects.count())
+
+    def test_running_again_adds_more(self):
+        self.seed()
+        created = self.seed(users=5, recipes=0, ratings_per_recipe=0, seed=1)
+        self.assertEqual(created, {'users': 5, 'recipes': 0, 'ratings': 0})
+        self.assertTrue(User.objects.filter(username='cook25').exists())
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('seed_data', users=3, recipes=2, ratings_per_recipe=2, stdout=out)
+        self.assertIn('Seeded', out.getvalue())
+        self.assertEqual(Recipe.objects.count(), len(seed.SAMPLE_RECIPES) + 2)
@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import Resolver404, resolve
+
+from cookbook import settings_api
+from cookbook.authentication import LazyJWTAuthentication
+from recipes.models import User
+
+# Runs in a fresh interpreter: the test process has already imported everything
+COLD_START = textwrap.dedent("""
+    import sys
+    import django
+    django.setup()
+    from django.test import Client
+    assert Client().get('/').status_code == 200
+    print(' '.join(sorted(name for name in ('daphne', 'twisted', 'channels', 'rest_framework_simplejwt')
+                          if name in sys.modules)))
+""")
+
+
+class ApiProfileTests(SimpleTestCase):
+    def test_drops_what_only_the_full_server_needs(self):
+        for app in ('daphne', 'channels', 'django.contrib.admin', 'django.contrib.sessions'):
+            self.assertIn(app, settings.INSTALLED_APPS)
+            self.assertNotIn(app, settings_api.INSTALLED_APPS)
+        self.assertIn('recipes', settings_api.INSTALLED_APPS)
+        self.assertNotIn('django.middleware.csrf.CsrfViewMiddleware', settings_api.MIDDLEWARE)
+        self.assertEqual(settings_api.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'],
+                         ('cookbook.renderers.FastJSONRenderer',))
+        self.assertFalse(settings_api.JOBS_RUN_IN_PROCESS)
+        self.assertFalse(settings_api.OUTBOX_DISPATCH_IN_PROCESS)
+
+    def test_urls_serve_the_api_without_the_admin(self):
+        self.assertEqual(resolve('/api/recipes/', urlconf='cookbook.urls_api').url_name, 'recipe_list_create')
+        with self.assertRaises(Resolver404):
+            resolve('/admin/', urlconf='cookbook.urls_api')
+
+    def test_starts_without_websocket_or_jwt_modules(self):
+        result = subprocess.run(
+            [sys.executable, '-c', COLD_START], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'cookbook.settings_api'}, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '')
+
+
+class LazyJWTAuthenticationTests(TestCase):
+    def test_authenticates_bearer_tokens_only(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        user = User.objects.create_user('cook', password='pw')
+        authentication = LazyJWTAuthentication()
+        self.assertIsNone(authentication.authenticate(RequestFactory().get('/')))
+        token = RefreshToken.for_user(user).access_token
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(authentication.authenticate(request)[0], user)
+        self.assertEqual(authentication.authenticate_header(request), 'Bearer realm="api"')
@@ -0,0 +1,68 @@
+from django.test import SimpleTestCase, TestCase
+
+from recipes import similar
+from recipes.models import DocumentFrequency, Recipe, SimilarityBucket, User
+
+
+class FeatureTests(SimpleTestCase):
+    def test_normalizes_ingredient_lines(self):
+        self.assertEqual(similar.normalize_ingredient('2 cups coconut milk, warmed'), 'coconut milk')
+        self.assertEqual(similar.normalize_ingredient('3 cloves of garlic (minced)'), 'garlic')
+        self.assertEqual(similar.normalize_ingredient('Fish sauce to taste'), 'fish sauce')
+        self.assertEqual(similar.normalize_ingredient('1 tbsp salt'), '')
+
+    def test_signatures_estimate_jaccard(self):
+        first = {f'token{number}' for number in range(100)}
+        second = {f'token{number}' for number in range(50, 150)}
+        estimate = similar.estimated_jaccard(similar.minhash(first, 256), similar.minhash(second, 256))
+        self.assertAlmostEqual(estimate, 1 / 3, delta=0.1)
+        self.assertEqual(similar.minhash(first, 64), similar.minhash(set(first), 64))
+        self.assertEqual(similar.minhash(set()), [])
+
+    def test_equal_signatures_share_every_band(self):
+        signature = similar.minhash({'pork', 'vinegar'})
+        self.assertEqual(len(similar.band_keys('ingredients', signature)), 32)
+        self.assertEqual(similar.band_keys('ingredients', signature), similar.band_keys('ingredients', list(signature)))
+        self.assertNotEqual(similar.band_keys('ingredients', signature), similar.band_keys('text', signature))
+
+
+class SimilarTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='pw')
+        self.chicken = self.create('Chicken Adobo', ['1 kg chicken', 'soy sauce', 'vinegar', '5 cloves garlic', 'bay leaves'])
+        self.pork = self.create('Pork Adobo', ['1 kg pork belly', 'soy sauce', 'vinegar', 'garlic', 'bay leaves'])
+        self.flan = self.create('Leche Flan', ['10 egg yolks', '1 can condensed milk', 'sugar'])
+
+    def create(self, title, ingredients, status='approved'):
+        return Recipe.objects.create(
+            title=title, description='Family recipe', ingredients=ingredients, steps='Cook',
+            author=self.author, status=status,
+        )
+
+    def ids(self, recipe, **kwargs):
+        return [recipe_id for recipe_id, _ in similar.similar(recipe, **kwargs)]
+
+    def documents(self, term):
+        return DocumentFrequency.objects.filter(term=term).values_list('documents', flat=True).first()
+
+    def test_finds_recipes_sharing_ingredients(self):
+        self.assertEqual(self.ids(self.chicken), [self.pork.id])
+        self.assertEqual(self.ids(self.flan), [])
+        self.assertTrue(SimilarityBucket.objects.filter(recipe=self.chicken).exists())
+
+    def test_only_approved_recipes_and_bounded_candidates(self):
+        pending = self.create('Adobong Manok', ['chicken', 'soy sauce', 'vinegar', 'garlic'], status='pending')
+        self.assertNotIn(pending.id, self.ids(self.chicken))
+        self.create('Adobong Baboy', ['pork belly', 'soy sauce', 'vinegar', 'garlic', 'bay leaves'])
+        self.assertEqual(len(self.ids(self.chicken)), 2)
+        with self.settings(SIMILAR_MAX_CANDIDATES=1):
+            self.assertEqual(len(self.ids(self.chicken)), 1)
+
+    def test_document_frequencies_follow_edits_and_deletes(self):
+        self.assertEqual(self.documents('adobo'), 2)
+        self.pork.title = 'Pork Humba'
+        self.pork.save()
+        self.assertEqual((self.documents('adobo'), self.documents('humba')), (1, 1))
+        self.chicken.delete()
+        self.assertEqual(self.documents('adobo'), 0)
+        self.assertEqual(self.documents('family'), 2)
@@ -0,0 +1,78 @@
+import json
+import shutil
+import tempfile
+
+from django.core.cache import cache, caches
+from django.http import FileResponse
+from django.test import TestCase, override_settings
+
+from recipes import snapshots
+from recipes.models import HomepageContent, Job, Recipe, User
+
+
+def body(response):
+    return b''.join(response.streaming_content) if response.streaming else response.content
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix='snapshots-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        # The replica is a second connection, which cannot see the test's open transaction
+        settings = override_settings(
+            SNAPSHOTS_DIR=directory, SNAPSHOTS_ORIGINS=['http://testserver'], READ_REPLICA_VIEWS=[],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        caches['recipes'].clear()
+        snapshots._requested.clear()
+        # Created on first read otherwise, which would outdate the first build
+        HomepageContent.objects.create(id=1)
+        author = User.objects.create_user('cook', password='pw')
+        self.recipe = Recipe.objects.create(
+            title='Adobo', description='Braised', ingredients=['pork'], steps='Simmer', author=author,
+            status='approved',
+        )
+
+    def build_jobs(self):
+        return list(Job.objects.filter(name='recipes.tasks.build_snapshots', status='queued').values_list('args', flat=True))
+
+    def test_list_is_served_from_disk_once_built(self):
+        live = self.client.get('/api/recipes/')
+        self.assertNotIsInstance(live, FileResponse)
+        self.assertEqual(self.build_jobs(), [['http://testserver']])
+
+        snapshots.build('http://testserver')
+        served = self.client.get('/api/recipes/')
+        self.assertIsInstance(served, FileResponse)
+        self.assertEqual(json.loads(body(served)), json.loads(body(live)))
+        self.assertEqual(self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=served['ETag']).status_code, 304)
+
+    def test_change_renders_live_until_rebuilt(self):
+        snapshots.build('http://testserver')
+        self.recipe.title = 'Chicken Adobo'
+        self.recipe.save()
+
+        response = self.client.get('/api/recipes/')
+        self.assertNotIsInstance(response, FileResponse)
+        self.assertEqual(json.loads(body(response))[0]['title'], 'Chicken Adobo')
+
+        snapshots.build('http://testserver')
+        response = self.client.get('/api/recipes/')
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(json.loads(body(response))[0]['title'], 'Chicken Adobo')
+
+    def test_other_hosts_render_live_without_building(self):
+        for host in ('spam-1.example', 'spam-2.example'):
+            response = self.client.get('/api/recipes/', HTTP_HOST=host)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.build_jobs(), [])
+        self.assertIsNone(snapshots.build('http://spam-1.example'))
+        self.assertEqual(snapshots.known_origins(), [])
+
+    def test_build_forgets_origins_no_longer_allowed(self):
+        with override_settings(SNAPSHOTS_ORIGINS=['http://old.example']):
+            snapshots.build('http://old.example')
+        snapshots.build('http://testserver')
+        self.assertEqual([path.name for path in snapshots._root().iterdir()], [snapshots._slug('http://testserver')])
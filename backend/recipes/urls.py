@@ -14,13 +14,23 @@ urlpatterns = [
     
     # ==================== RECIPE ENDPOINTS ====================
     path('recipes/', views.RecipeListCreateView.as_view(), name='recipe_list_create'),
+    path('recipes/changes/', views.recipe_changes, name='recipe_changes'),
+    path('recipes/browse/', views.browse_recipes, name='recipe_browse'),
+    path('recipes/autocomplete/', views.autocomplete_suggestions, name='recipe_autocomplete'),
+    path('recipes/recommended/', views.recommended_recipes, name='recommended_recipes'),
     path('recipes/<int:pk>/', views.RecipeDetailView.as_view(), name='recipe_detail'),
+    path('recipes/<int:recipe_id>/similar/', views.similar_recipes, name='similar_recipes'),
     path('recipes/<int:recipe_id>/rate/', views.rate_recipe, name='rate_recipe'),
     path('recipes/<int:recipe_id>/approve/', views.approve_recipe, name='approve_recipe'),
     path('recipes/<int:recipe_id>/decline/', views.decline_recipe, name='decline_recipe'),
     path('recipes/<int:recipe_id>/signature/', views.toggle_signature, name='toggle_signature'),
     path('recipes/<int:recipe_id>/photo/', views.update_recipe_photo, name='update_recipe_photo'),
     
+    # ==================== MODERATION ENDPOINTS ====================
+    path('moderation/queue/', views.moderation_queue, name='moderation_queue'),
+    path('moderation/queue/<int:recipe_id>/claim/', views.claim_recipe, name='claim_recipe'),
+    path('moderation/queue/<int:recipe_id>/release/', views.release_recipe, name='release_recipe'),
+    
     # ==================== HOMEPAGE ENDPOINTS ====================
     path('homepage/', views.homepage_data, name='homepage_data'),
     path('homepage/update/', views.update_homepage, name='update_homepage'),
@@ -34,4 +44,7 @@ urlpatterns = [
 
     # ==================== PUBLIC ENDPOINTS ====================
     path('team/public/', views.public_team_members, name='public_team_members'),
+
+    # ==================== OPERATIONS ENDPOINTS ====================
+    path('jobs/metrics/', views.job_metrics, name='job_metrics'),
 ]
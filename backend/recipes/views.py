@@ -6,21 +6,38 @@ Includes real-time WebSocket broadcasting for all operations
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from django.db.models import Avg, Q
-from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
 from django.core.files.base import ContentFile
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.utils.decorators import method_decorator
+from cookbook import profiling
+from cookbook.compression import precompress, precompressed_response
+from cookbook.renderers import dumps
+from cookbook.uploadhandlers import image_uploads
 import json
 import os
 import logging
+from datetime import timedelta
 
-from .models import User, Recipe, Rating, HomepageContent
+from . import autocomplete
+from . import cache as recipe_cache
+from . import changes
+from . import facets
+from . import jobs
+from . import leaderboard
+from . import moderation
+from . import outbox
+from . import ratings
+from . import recommendations
+from . import similar
+from . import snapshots
+from . import tasks
+from .models import User, Recipe, HomepageContent
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, LoginSerializer,
-    RecipeSerializer, RatingSerializer, HomepageContentSerializer
+    RecipeSerializer, RatingSerializer, HomepageContentSerializer,
+    ModerationClaimSerializer, claim_data
 )
 
 # Configure logging
@@ -31,20 +48,77 @@ def broadcast_update(group_name, message_type, data):
     """
     Broadcast updates to all connected WebSocket clients
     Used for real-time updates across the application
+    Recorded in the outbox within the current transaction and sent after commit
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
-            'type': message_type,
-            'message': data
-        }
-    )
+    outbox.publish(group_name, message_type, data)
+
+def token_pair(user):
+    """
+    Issue a refresh/access token pair for a user
+    simplejwt is imported here on first login instead of when the URLconf loads
+    """
+    from rest_framework_simplejwt.tokens import RefreshToken
+    refresh = RefreshToken.for_user(user)
+    return {'refresh': str(refresh), 'access': str(refresh.access_token)}
+
+def can_view_recipe(user, recipe_status, author_id):
+    """
+    Visibility rule shared by the recipe list and detail querysets
+    Guests see approved recipes, users also see their own, admins see everything
+    """
+    if recipe_status == 'approved':
+        return True
+    if not user.is_authenticated:
+        return False
+    if user.role in ['admin', 'super_admin']:
+        return True
+    return author_id == user.id
+
+def with_rating(recipe_data, rating_data, aggregates):
+    """
+    A recipe representation with one user's rating put in place and the new
+    (rating_count, rating_sum, score) aggregates, instead of re-serializing all ratings
+    """
+    rating_count, rating_sum, _ = aggregates
+    user_id = rating_data['user']['id']
+    ratings_data = [
+        rating_data if rating['user']['id'] == user_id else rating for rating in recipe_data['ratings']
+    ]
+    if not any(rating['user']['id'] == user_id for rating in recipe_data['ratings']):
+        ratings_data.append(rating_data)
+    return {
+        **recipe_data,
+        'ratings': ratings_data,
+        'average_rating': rating_sum / rating_count if rating_count else 0,
+        'total_ratings': rating_count,
+        'user_rating': rating_data['score'],
+    }
+
+def parse_score(value):
+    """
+    A star score from JSON (an integer) or form data (a string of digits), else None
+    Booleans and fractional scores are rejected rather than truncated
+    """
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not (1 <= value <= 5):
+        return None
+    return value
+
+def claimed_response(claim):
+    """
+    409 for a recipe another moderator is reviewing
+    """
+    return Response({
+        'error': f'{claim.moderator.username} is reviewing this recipe',
+        'claim': ModerationClaimSerializer(claim).data,
+    }, status=status.HTTP_409_CONFLICT)
 
 # ==================== AUTHENTICATION VIEWS ====================
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@transaction.atomic
 def register(request):
     """
     User registration endpoint
@@ -53,7 +127,6 @@ def register(request):
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.save()
-        refresh = RefreshToken.for_user(user)
         
         # Broadcast new user registration (for admin dashboards)
         broadcast_update('recipes', 'user_update', {
@@ -63,8 +136,7 @@ def register(request):
         
         return Response({
             'user': UserSerializer(user).data,
-            'refresh': str(refresh),
-            'access': str(refresh.access_token),
+            **token_pair(user),
         })
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -78,11 +150,9 @@ def login(request):
     serializer = LoginSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.validated_data['user']
-        refresh = RefreshToken.for_user(user)
         return Response({
             'user': UserSerializer(user).data,
-            'refresh': str(refresh),
-            'access': str(refresh.access_token),
+            **token_pair(user),
         })
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -94,25 +164,27 @@ def profile(request):
     serializer = UserSerializer(request.user)
     return Response(serializer.data)
 
+@image_uploads
 @api_view(['PUT'])
+@transaction.atomic
 def update_profile(request):
     """
     Update current user's profile
     Handles profile image uploads and basic info updates
     """
     # Handle file upload for profile image
+    replaced_image = None
     if 'profile_image' in request.FILES:
-        # Delete old profile image if exists
-        if request.user.profile_image:
-            if default_storage.exists(request.user.profile_image.name):
-                default_storage.delete(request.user.profile_image.name)
-        
+        replaced_image = request.user.profile_image.name
         request.user.profile_image = request.FILES['profile_image']
     
     # Update other fields
     serializer = UserSerializer(request.user, data=request.data, partial=True)
     if serializer.is_valid():
         updated_user = serializer.save()
+        # Release old profile image (stored blobs are reference counted) only once replaced
+        if replaced_image:
+            jobs.enqueue(tasks.release_media, replaced_image)
         
         # Broadcast profile update
         broadcast_update('recipes', 'user_update', {
@@ -125,6 +197,7 @@ def update_profile(request):
 
 # ==================== RECIPE VIEWS ====================
 
+@method_decorator(image_uploads, name='dispatch')
 class RecipeListCreateView(generics.ListCreateAPIView):
     """
     List all recipes or create a new recipe
@@ -152,6 +225,7 @@ class RecipeListCreateView(generics.ListCreateAPIView):
             return queryset.order_by('-created_at')
         return queryset.order_by('-created_at')
     
+    @transaction.atomic
     def perform_create(self, serializer):
         """
         Create new recipe and broadcast to all connected clients
@@ -167,27 +241,167 @@ class RecipeListCreateView(generics.ListCreateAPIView):
         # Broadcast new recipe creation
         broadcast_update('recipes', 'recipe_update', {
             'action': 'create',
-            'recipe': RecipeSerializer(recipe, context={'request': self.request}).data
+            'recipe': recipe_cache.represent_one(recipe, self.request)
         })
+        if recipe.status == 'pending':
+            moderation.publish('submit', recipe.id)
+    
+    def list(self, request, *args, **kwargs):
+        """
+        Resolve only the visible ids in the database, then read representations through the cache
+        Guests get the pre-rendered catalogue when it is current
+        """
+        if not request.user.is_authenticated:
+            response = snapshots.respond('catalogue', request)
+            if response is not None:
+                return response
+        # Read the cursor first so changes made while the list is built are not skipped
+        cursor = changes.latest_cursor()
+        recipe_ids = list(self.filter_queryset(self.get_queryset()).values_list('id', flat=True))
+        response = Response(recipe_cache.represent(recipe_ids, request))
+        response['X-Changes-Cursor'] = cursor
+        return response
     
     def get(self, request, *args, **kwargs):
         logger.info('GET /api/recipes/ called')
         response = super().get(request, *args, **kwargs)
-        logger.info(f'Response data: {response.data}')
+        logger.info('Response data: %s', getattr(response, 'data', '<snapshot>'))
         return response
 
+def build_catalogue_payload(request):
+    """
+    (change cursor, recipe list) as a guest sees it, for the catalogue snapshot
+    """
+    cursor = changes.latest_cursor()
+    recipe_ids = list(
+        Recipe.objects.filter(status='approved').order_by('-created_at').values_list('id', flat=True)
+    )
+    return cursor, recipe_cache.represent(recipe_ids, request)
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def recipe_changes(request):
+    """
+    Incremental sync: recipes created, updated, re-rated or deleted after ?since=<cursor>
+    Recipes deleted or no longer visible to the caller are listed by id in `deleted`
+    Start from the X-Changes-Cursor header of the recipe list (or since=0 for everything)
+    """
+    try:
+        cursor = int(request.query_params.get('since', 0))
+        limit = max(1, min(int(request.query_params.get('limit', 200)), 1000))
+    except ValueError:
+        return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    latest = changes.latest_cursor()
+    if cursor > latest:
+        # Cursor from another database (e.g. reset development data)
+        return Response({'error': 'Unknown cursor, reload the recipe list', 'cursor': latest},
+                        status=status.HTTP_410_GONE)
+    
+    rows, next_cursor, has_more = changes.since(cursor, limit)
+    updated_ids = [recipe_id for recipe_id, kind in rows if kind == 'upsert']
+    visible_ids = [
+        recipe_id for recipe_id, recipe_status, author_id
+        in Recipe.objects.filter(id__in=updated_ids).values_list('id', 'status', 'author_id')
+        if can_view_recipe(request.user, recipe_status, author_id)
+    ]
+    visible = set(visible_ids)
+    return Response({
+        'cursor': next_cursor,
+        'has_more': has_more,
+        'recipes': recipe_cache.represent(visible_ids, request),
+        'deleted': [recipe_id for recipe_id, _ in rows if recipe_id not in visible],
+    })
+
+@api_view(['GET'])
+def recommended_recipes(request):
+    """
+    "Recommended for you": approved recipes similar (by who rated them alike) to the ones the
+    user rated highly; users without usable ratings get the leaderboard instead
+    """
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    recipe_ids, personalized = recommendations.recommend(request.user, limit)
+    return Response({
+        'personalized': personalized,
+        'recipes': recipe_cache.represent(recipe_ids, request),
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def browse_recipes(request):
+    """
+    Faceted browse of approved recipes, newest first
+    Filters: servings, rating, signature, author, ingredient (repeat a parameter to select
+    several values). Facet counts come with the results
+    """
+    try:
+        page = max(1, int(request.query_params.get('page', 1)))
+        page_size = max(1, min(int(request.query_params.get('page_size', 20)), 100))
+    except ValueError:
+        return Response({'error': 'page and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    filters = {facet: request.query_params.getlist(facet) for facet in facets.FACETS}
+    total, recipe_ids, counts = facets.browse(filters, (page - 1) * page_size, page_size)
+    return Response({
+        'count': total,
+        'page': page,
+        'page_size': page_size,
+        'results': recipe_cache.represent(recipe_ids, request),
+        'facets': counts,
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def autocomplete_suggestions(request):
+    """
+    Type-ahead: approved recipe titles and ingredients with a word starting with ?q=,
+    most popular first, served from the in-memory prefix index
+    """
+    query = request.query_params.get('q', '')
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 8)), 20))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({'query': query, 'suggestions': autocomplete.suggest(query, limit)})
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def similar_recipes(request, recipe_id):
+    """
+    "More like this": approved recipes sharing ingredients and wording with a recipe
+    Each result carries a `similarity` between 0 and 1
+    """
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    recipe = Recipe.objects.filter(id=recipe_id).only(
+        'id', 'title', 'description', 'ingredients', 'status', 'author_id'
+    ).first()
+    if recipe is None or not can_view_recipe(request.user, recipe.status, recipe.author_id):
+        return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    scored = similar.similar(recipe, limit)
+    recipes = recipe_cache.represent([recipe_id for recipe_id, _ in scored], request)
+    return Response({
+        'recipe_id': recipe.id,
+        'results': [{**data, 'similarity': similarity} for data, (_, similarity) in zip(recipes, scored)],
+    })
+
+@method_decorator(image_uploads, name='dispatch')
 class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a specific recipe
     Handles permissions and image updates
     """
     serializer_class = RecipeSerializer
-
-    def get_permissions(self):
-        from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly
-        if self.request.method in ['GET']:
-            return [AllowAny()]
-        return [IsAuthenticatedOrReadOnly()]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
     def get_queryset(self):
         queryset = Recipe.objects.all()
@@ -203,35 +417,42 @@ class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
             return queryset
         return queryset
     
+    @transaction.atomic
     def perform_update(self, serializer):
         """
         Update recipe and handle image replacement
         """
         # Handle image upload
+        replaced_image = None
         if 'image' in self.request.FILES:
-            # Delete old image if exists
-            if serializer.instance.image:
-                if default_storage.exists(serializer.instance.image.name):
-                    default_storage.delete(serializer.instance.image.name)
+            replaced_image = serializer.instance.image.name
             serializer.instance.image = self.request.FILES['image']
+        was_pending = serializer.instance.status == 'pending'
         serializer.save()
+        # Release old image (stored blobs are reference counted) only once replaced
+        if replaced_image:
+            jobs.enqueue(tasks.release_media, replaced_image)
+        if was_pending != (serializer.instance.status == 'pending'):
+            moderation.publish('update', serializer.instance.id)
         # Broadcast recipe update
         broadcast_update('recipes', 'recipe_update', {
             'action': 'update',
-            'recipe': RecipeSerializer(serializer.instance, context={'request': self.request}).data
+            'recipe': recipe_cache.represent_one(serializer.instance, self.request)
         })
     
+    @transaction.atomic
     def perform_destroy(self, instance):
         """
         Delete recipe and clean up associated files
         """
-        # Delete associated image file
-        if instance.image:
-            if default_storage.exists(instance.image.name):
-                default_storage.delete(instance.image.name)
-        
         recipe_data = RecipeSerializer(instance).data
+        recipe_id, was_pending, image = instance.id, instance.status == 'pending', instance.image.name
         instance.delete()
+        # Release associated image file
+        if image:
+            jobs.enqueue(tasks.release_media, image)
+        if was_pending:
+            moderation.publish('delete', recipe_id)
         
         # Broadcast recipe deletion
         broadcast_update('recipes', 'recipe_update', {
@@ -239,89 +460,132 @@ class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
             'recipe': recipe_data
         })
     
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Serve hot recipes straight from the cache; the cached status and author
+        are enough to apply the visibility rules without touching the database
+        """
+        data = recipe_cache.get(int(kwargs['pk']), request)
+        if data is not None and can_view_recipe(request.user, data['status'], data['author']['id']):
+            return Response(data)
+        return Response(recipe_cache.represent_one(self.get_object(), request))
+    
     def get(self, request, *args, **kwargs):
-        logger.info(f'GET /api/recipes/<id>/ called with id={kwargs.get("pk") or kwargs.get("id")}')
+        logger.info('GET /api/recipes/<id>/ called with id=%s', kwargs.get("pk") or kwargs.get("id"))
         response = super().get(request, *args, **kwargs)
-        logger.info(f'Response data: {response.data}')
+        logger.info('Response data: %s', getattr(response, 'data', '<snapshot>'))
         return response
 
 @api_view(['POST'])
+@transaction.atomic
 def rate_recipe(request, recipe_id):
     """
     Rate a recipe (1-5 stars)
-    Each user can only rate a recipe once
+    Each user can only rate a recipe once; rating it again replaces the score
+    The response carries the recipe's new average_rating and total_ratings
     """
-    try:
-        recipe = Recipe.objects.get(id=recipe_id)
-    except Recipe.DoesNotExist:
-        return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
+    score = parse_score(request.data.get('score'))
+    if score is None:
+        return Response({'error': 'Score must be a whole number between 1 and 5'}, status=status.HTTP_400_BAD_REQUEST)
     
-    score = request.data.get('score')
-    if not score or not (1 <= int(score) <= 5):
-        return Response({'error': 'Score must be between 1 and 5'}, status=status.HTTP_400_BAD_REQUEST)
+    # Read before rating retires it: the broadcast patches this user's rating into it
+    cached = recipe_cache.get(recipe_id, request)
+    rated = ratings.rate(recipe_id, request.user, score)
+    if rated is None:
+        return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
+    rating, previous_score, aggregates = rated
+    rating_data = RatingSerializer(rating).data
     
-    # Create or update rating
-    rating, created = Rating.objects.update_or_create(
-        recipe=recipe,
-        user=request.user,
-        defaults={'score': int(score)}
-    )
+    # The cached ratings list is still current when the leaderboard totals moved only by
+    # this rating, i.e. nobody else rated between the cache read and the write lock
+    if cached is not None and aggregates is not None and tuple(aggregates[:2]) == (
+        cached['total_ratings'] + (previous_score is None),
+        round(cached['average_rating'] * cached['total_ratings']) + score - (previous_score or 0),
+    ):
+        recipe_data = with_rating(cached, rating_data, aggregates)
+    else:
+        recipe_data = recipe_cache.represent_one(Recipe.objects.get(id=recipe_id), request)
     
     # Broadcast rating update
     broadcast_update('recipes', 'recipe_update', {
         'action': 'rate',
-        'recipe': RecipeSerializer(recipe, context={'request': request}).data
+        'recipe': recipe_data
     })
     
-    return Response(RatingSerializer(rating).data)
+    return Response({
+        **rating_data,
+        'average_rating': recipe_data['average_rating'],
+        'total_ratings': recipe_data['total_ratings'],
+    })
 
 @api_view(['POST'])
+@transaction.atomic
 def approve_recipe(request, recipe_id):
     """
     Approve a pending recipe (Admin/Super Admin only)
+    Refused while another moderator holds a claim on it
     """
     if request.user.role not in ['admin', 'super_admin']:
         return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
     try:
         recipe = Recipe.objects.get(id=recipe_id)
+        claim = moderation.blocking_claim(recipe, request.user)
+        if claim is not None:
+            return claimed_response(claim)
+        was_pending = recipe.status == 'pending'
         recipe.status = 'approved'
         recipe.save()
+        moderation.decided(recipe.id)
+        if was_pending:
+            moderation.publish('approve', recipe.id)
+        recipe_data = recipe_cache.represent_one(recipe, request)
         
         # Broadcast approval
         broadcast_update('recipes', 'recipe_update', {
             'action': 'approve',
-            'recipe': RecipeSerializer(recipe, context={'request': request}).data
+            'recipe': recipe_data
         })
         
-        return Response(RecipeSerializer(recipe, context={'request': request}).data)
+        return Response(recipe_data)
     except Recipe.DoesNotExist:
         return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
 
 @api_view(['POST'])
+@transaction.atomic
 def decline_recipe(request, recipe_id):
     """
     Decline a pending recipe (Admin/Super Admin only)
+    Refused while another moderator holds a claim on it
     """
     if request.user.role not in ['admin', 'super_admin']:
         return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
     try:
         recipe = Recipe.objects.get(id=recipe_id)
+        claim = moderation.blocking_claim(recipe, request.user)
+        if claim is not None:
+            return claimed_response(claim)
+        was_pending = recipe.status == 'pending'
         recipe.status = 'declined'
         recipe.save()
+        moderation.decided(recipe.id)
+        if was_pending:
+            moderation.publish('decline', recipe.id)
+        recipe_data = recipe_cache.represent_one(recipe, request)
         
         # Broadcast decline
         broadcast_update('recipes', 'recipe_update', {
             'action': 'decline',
-            'recipe': RecipeSerializer(recipe, context={'request': request}).data
+            'recipe': recipe_data
         })
         
-        return Response(RecipeSerializer(recipe, context={'request': request}).data)
+        return Response(recipe_data)
     except Recipe.DoesNotExist:
         return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
 
 @api_view(['POST'])
+@transaction.atomic
 def toggle_signature(request, recipe_id):
     """
     Toggle signature status of a recipe
@@ -341,38 +605,95 @@ def toggle_signature(request, recipe_id):
         
         recipe.is_signature = not recipe.is_signature
         recipe.save()
+        recipe_data = recipe_cache.represent_one(recipe, request)
         
         # Broadcast signature toggle
         broadcast_update('recipes', 'recipe_update', {
             'action': 'signature_toggle',
-            'recipe': RecipeSerializer(recipe, context={'request': request}).data
+            'recipe': recipe_data
         })
         
-        return Response(RecipeSerializer(recipe, context={'request': request}).data)
+        return Response(recipe_data)
     except Recipe.DoesNotExist:
         return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
 
-# ==================== HOMEPAGE VIEWS ====================
+# ==================== MODERATION VIEWS ====================
 
 @api_view(['GET'])
-@permission_classes([permissions.AllowAny])
-def homepage_data(request):
+def moderation_queue(request):
     """
-    Get all homepage data including content and recipe sections
-    Public endpoint accessible to all users
+    Pending recipes oldest first as lightweight cards, with who is reviewing each
+    (Admin/Super Admin only); ?available=1 hides recipes other moderators have claimed
+    """
+    if request.user.role not in ['admin', 'super_admin']:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        page = max(1, int(request.query_params.get('page', 1)))
+        page_size = max(1, min(int(request.query_params.get('page_size', 20)), 100))
+    except ValueError:
+        return Response({'error': 'page and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    available = request.query_params.get('available') in ('1', 'true')
+    total, recipes = moderation.queue((page - 1) * page_size, page_size, request.user, available)
+    return Response({
+        'count': total,
+        'page': page,
+        'page_size': page_size,
+        # Cached cards; the claims change without the recipes and are added live
+        'results': [
+            {**card, 'claim': claim_data(recipe)}
+            for recipe, card in zip(recipes, recipe_cache.represent(recipes, request, 'moderation'))
+        ],
+    })
+
+@api_view(['POST'])
+@transaction.atomic
+def claim_recipe(request, recipe_id):
+    """
+    Claim a pending recipe for review, or renew your claim (Admin/Super Admin only)
+    The claim lapses after MODERATION_CLAIM_SECONDS unless renewed
+    """
+    if request.user.role not in ['admin', 'super_admin']:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    if not Recipe.objects.filter(id=recipe_id).exists():
+        return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
+    if not moderation.pending().filter(id=recipe_id).exists():
+        return Response({'error': 'Recipe is not pending'}, status=status.HTTP_409_CONFLICT)
+    
+    claim, acquired = moderation.claim(recipe_id, request.user)
+    if not acquired:
+        return claimed_response(claim)
+    data = ModerationClaimSerializer(claim).data
+    moderation.publish('claim', recipe_id, claim=data)
+    return Response(data)
+
+@api_view(['POST'])
+@transaction.atomic
+def release_recipe(request, recipe_id):
+    """
+    Give up your claim on a recipe without deciding (Admin/Super Admin only)
+    """
+    if request.user.role not in ['admin', 'super_admin']:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    if moderation.release(recipe_id, request.user):
+        moderation.publish('release', recipe_id)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+# ==================== HOMEPAGE VIEWS ====================
+
+def build_homepage_payload(request):
+    """
+    Assemble the homepage sections for the requesting user
     """
     # Get or create homepage content
     homepage_content, created = HomepageContent.objects.get_or_create(id=1)
     
-    # Hall of Fame - highest rated recipe
-    hall_of_fame = Recipe.objects.filter(status='approved').annotate(
-        avg_rating=Avg('ratings__score')
-    ).order_by('-avg_rating').first()
-    
-    # Top 3 dishes by average rating
-    top_dishes = Recipe.objects.filter(status='approved').annotate(
-        avg_rating=Avg('ratings__score')
-    ).order_by('-avg_rating')[:3]
+    # Top 3 dishes by Bayesian-weighted rating, read from the precomputed leaderboard
+    # (the first one doubles as the Hall of Fame champion)
+    top_dishes = leaderboard.top(3)
     
     # Signature dishes
     signature_dishes = Recipe.objects.filter(status='approved', is_signature=True)[:6]
@@ -380,18 +701,48 @@ def homepage_data(request):
     # Recently added recipes
     recent_recipes = Recipe.objects.filter(status='approved').order_by('-created_at')[:6]
     
-    # Serialize data with proper context
-    context = {'request': request} if request else {}
+    # Cards through the recipe cache; only uncached recipes hit the serializer
+    top_dishes_data = recipe_cache.represent(top_dishes, request, 'card')
     
-    return Response({
+    return {
         'homepage_content': HomepageContentSerializer(homepage_content).data,
-        'hall_of_fame': RecipeSerializer(hall_of_fame, context=context).data if hall_of_fame else None,
-        'top_dishes': RecipeSerializer(top_dishes, many=True, context=context).data,
-        'signature_dishes': RecipeSerializer(signature_dishes, many=True, context=context).data,
-        'recent_recipes': RecipeSerializer(recent_recipes, many=True, context=context).data,
-    })
+        'hall_of_fame': top_dishes_data[0] if top_dishes_data else None,
+        'top_dishes': top_dishes_data,
+        'signature_dishes': recipe_cache.represent(
+            list(signature_dishes.values_list('id', flat=True)), request, 'card',
+        ),
+        'recent_recipes': recipe_cache.represent(
+            list(recent_recipes.values_list('id', flat=True)), request, 'card',
+        ),
+    }
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def homepage_data(request):
+    """
+    Get all homepage data including content and recipe sections
+    Public endpoint accessible to all users
+    Guests get the pre-rendered snapshot, or else share one cached document stored with
+    its compressed variants
+    """
+    if request.user.is_authenticated:
+        # Personalized (user_rating), so rendered per request
+        return Response(build_homepage_payload(request))
+    
+    response = snapshots.respond('homepage', request)
+    if response is not None:
+        return response
+    variants = recipe_cache.get_document('homepage', request)
+    if variants is None:
+        payload = build_homepage_payload(request)
+        with profiling.span('render'):
+            variants = precompress(dumps(payload))
+        recipe_cache.set_document('homepage', request, variants)
+    return precompressed_response(request, variants)
 
+@image_uploads
 @api_view(['PUT'])
+@transaction.atomic
 def update_homepage(request):
     """
     Update homepage content (Super Admin only)
@@ -403,12 +754,9 @@ def update_homepage(request):
     homepage_content, created = HomepageContent.objects.get_or_create(id=1)
     
     # Handle image upload
+    replaced_image = None
     if 'aunt_rhobby_image' in request.FILES:
-        # Delete old image if exists
-        if homepage_content.aunt_rhobby_image:
-            if default_storage.exists(homepage_content.aunt_rhobby_image.name):
-                default_storage.delete(homepage_content.aunt_rhobby_image.name)
-        
+        replaced_image = homepage_content.aunt_rhobby_image.name
         homepage_content.aunt_rhobby_image = request.FILES['aunt_rhobby_image']
     
     # Update welcome message
@@ -416,6 +764,9 @@ def update_homepage(request):
         homepage_content.welcome_message = request.data['welcome_message']
     
     homepage_content.save()
+    # Release old image (stored blobs are reference counted) only once replaced
+    if replaced_image:
+        jobs.enqueue(tasks.release_media, replaced_image)
     
     # Broadcast homepage update
     broadcast_update('recipes', 'homepage_update', {
@@ -440,6 +791,7 @@ def users_list(request):
     return Response(UserSerializer(users, many=True).data)
 
 @api_view(['PUT'])
+@transaction.atomic
 def update_user_role(request, user_id):
     """
     Update user role (Super Admin only)
@@ -468,7 +820,9 @@ def update_user_role(request, user_id):
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
+@image_uploads
 @api_view(['PUT'])
+@transaction.atomic
 def update_user_profile_admin(request, user_id):
     """
     Update any user's profile (Super Admin only)
@@ -481,12 +835,9 @@ def update_user_profile_admin(request, user_id):
         user_to_update = User.objects.get(id=user_id)
         
         # Handle profile image upload
+        replaced_image = None
         if 'profile_image' in request.FILES:
-            # Delete old image if exists
-            if user_to_update.profile_image:
-                if default_storage.exists(user_to_update.profile_image.name):
-                    default_storage.delete(user_to_update.profile_image.name)
-            
+            replaced_image = user_to_update.profile_image.name
             user_to_update.profile_image = request.FILES['profile_image']
         
         # Update other fields
@@ -503,6 +854,9 @@ def update_user_profile_admin(request, user_id):
             user_to_update.role = new_role
         
         user_to_update.save()
+        # Release old image (stored blobs are reference counted) only once replaced
+        if replaced_image:
+            jobs.enqueue(tasks.release_media, replaced_image)
         
         # Broadcast user profile update
         broadcast_update('recipes', 'user_update', {
@@ -514,7 +868,9 @@ def update_user_profile_admin(request, user_id):
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
+@image_uploads
 @api_view(['POST'])
+@transaction.atomic
 def create_team_member(request):
     """
     Create new team member (Super Admin only)
@@ -558,6 +914,7 @@ def create_team_member(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['DELETE'])
+@transaction.atomic
 def delete_user(request, user_id):
     """
     Delete user account (Super Admin only)
@@ -572,13 +929,12 @@ def delete_user(request, user_id):
     try:
         user_to_delete = User.objects.get(id=user_id)
         
-        # Delete profile image if exists
-        if user_to_delete.profile_image:
-            if default_storage.exists(user_to_delete.profile_image.name):
-                default_storage.delete(user_to_delete.profile_image.name)
-        
         user_data = UserSerializer(user_to_delete).data
+        image = user_to_delete.profile_image.name
         user_to_delete.delete()
+        # Release profile image (stored blobs are reference counted)
+        if image:
+            jobs.enqueue(tasks.release_media, image)
         
         # Broadcast user deletion
         broadcast_update('recipes', 'user_update', {
@@ -592,7 +948,9 @@ def delete_user(request, user_id):
 
 # ==================== PHOTO UPDATE ENDPOINTS ====================
 
+@image_uploads
 @api_view(['POST'])
+@transaction.atomic
 def update_recipe_photo(request, recipe_id):
     """
     Update recipe photo via dedicated endpoint
@@ -612,35 +970,31 @@ def update_recipe_photo(request, recipe_id):
         if 'image' not in request.FILES:
             return Response({'error': 'No image file provided'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Delete old image if exists
-        if recipe.image:
-            if default_storage.exists(recipe.image.name):
-                default_storage.delete(recipe.image.name)
-        
         # Save new image
+        replaced_image = recipe.image.name
         recipe.image = request.FILES['image']
         recipe.save()
+        # Release old image (stored blobs are reference counted) only once replaced
+        if replaced_image:
+            jobs.enqueue(tasks.release_media, replaced_image)
+        recipe_data = recipe_cache.represent_one(recipe, request)
         
         # Broadcast photo update
         broadcast_update('recipes', 'recipe_update', {
             'action': 'photo_update',
-            'recipe': RecipeSerializer(recipe, context={'request': request}).data
+            'recipe': recipe_data
         })
         
-        return Response(RecipeSerializer(recipe, context={'request': request}).data)
+        return Response(recipe_data)
     except Recipe.DoesNotExist:
         return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
 
-@api_view(['GET'])
-@permission_classes([permissions.AllowAny])
-def public_team_members(request):
+def build_team_payload():
     """
-    Get team members for public About Us page
-    Returns only super admins with limited information
+    Limited public information about the super admins, oldest account first
     """
     super_admins = User.objects.filter(role='super_admin').order_by('date_joined')
     
-    # Return limited public information
     team_data = []
     for admin in super_admins:
         team_data.append({
@@ -652,5 +1006,33 @@ def public_team_members(request):
             'github_link': admin.github_link,
             'profile_image': admin.profile_image.url if admin.profile_image else None
         })
+    return team_data
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def public_team_members(request):
+    """
+    Get team members for public About Us page
+    Returns only super admins with limited information, from the snapshot when it is current
+    """
+    response = snapshots.respond('team', request)
+    if response is not None:
+        return response
+    return Response(build_team_payload())
+
+# ==================== OPERATIONS ENDPOINTS ====================
+
+@api_view(['GET'])
+def job_metrics(request):
+    """
+    Job queue depth and per-job wait/run latency (Super Admin only)
+    Optional ?minutes= sets the window of finished jobs considered (default 60)
+    """
+    if request.user.role != 'super_admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    return Response(team_data)
+    try:
+        minutes = max(1, min(int(request.query_params.get('minutes', 60)), 7 * 24 * 60))
+    except ValueError:
+        return Response({'error': 'minutes must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(jobs.metrics(timedelta(minutes=minutes)))
@@ -22,48 +22,91 @@ export const WebSocketProvider = ({ children }) => {
     const wsProtocol = window.location.protocol === "https:" ? "wss" : "ws";
     const wsHost = window.location.hostname;
     const wsPort = 8000;
-    const ws = new WebSocket(`${wsProtocol}://${wsHost}:${wsPort}/ws/recipes/`)
-
-    ws.onopen = () => {
-      console.log("WebSocket connected")
-      setSocket(ws)
-    }
+    let ws = null
+    let reconnectTimer = null
+    let reconnectDelay = 1000
+    let stopped = false
+    // Sequence number of the last broadcast seen; sent on reconnect to replay only missed events
+    let lastSeq = null
+
+    const connect = () => {
+      const resume = lastSeq !== null ? `?last_seq=${lastSeq}` : ""
+      ws = new WebSocket(`${wsProtocol}://${wsHost}:${wsPort}/ws/recipes/${resume}`)
+
+      ws.onopen = () => {
+        console.log("WebSocket connected")
+        reconnectDelay = 1000
+        setSocket(ws)
+      }
 
-    ws.onmessage = (event) => {
-      const message = JSON.parse(event.data)
-      setLastMessage(message)
-
-      // Force refresh for all updates
-      setRefreshTrigger((prev) => prev + 1)
-
-      // Special handling for image-related updates
-      if (
-        message.data &&
-        (message.data.action === "photo_update" ||
-          message.data.action === "profile_update" ||
-          message.data.action === "homepage_update" ||
-          message.data.action === "create_team_member" ||
-          message.data.action === "update" ||
-          message.data.action === "create")
-      ) {
-        setImageRefreshTrigger((prev) => prev + 1)
-        // Additional delay to ensure backend processing is complete
-        setTimeout(() => {
+      ws.onmessage = (event) => {
+        const message = JSON.parse(event.data)
+
+        // Server heartbeat: answer so the connection is not evicted as idle
+        if (message.type === "ping") {
+          ws.send(JSON.stringify({ type: "pong" }))
+          return
+        }
+        if (message.type === "pong") {
+          return
+        }
+        if (message.seq !== undefined && message.seq !== null) {
+          lastSeq = message.seq
+        }
+        if (message.type === "welcome") {
+          return
+        }
+
+        // Too far behind to replay: refresh everything once
+        if (message.type === "resync") {
+          setRefreshTrigger((prev) => prev + 1)
           setImageRefreshTrigger((prev) => prev + 1)
-        }, 1000)
+          return
+        }
+
+        setLastMessage(message)
+
+        // Force refresh for all updates
+        setRefreshTrigger((prev) => prev + 1)
+
+        // Special handling for image-related updates
+        if (
+          message.data &&
+          (message.data.action === "photo_update" ||
+            message.data.action === "profile_update" ||
+            message.data.action === "homepage_update" ||
+            message.data.action === "create_team_member" ||
+            message.data.action === "update" ||
+            message.data.action === "create")
+        ) {
+          setImageRefreshTrigger((prev) => prev + 1)
+          // Additional delay to ensure backend processing is complete
+          setTimeout(() => {
+            setImageRefreshTrigger((prev) => prev + 1)
+          }, 1000)
+        }
       }
-    }
 
-    ws.onclose = () => {
-      console.log("WebSocket disconnected")
-      setSocket(null)
-    }
+      ws.onclose = () => {
+        console.log("WebSocket disconnected")
+        setSocket(null)
+        // Reconnect with backoff (the server closes idle or slow sockets)
+        if (!stopped) {
+          reconnectTimer = setTimeout(connect, reconnectDelay)
+          reconnectDelay = Math.min(reconnectDelay * 2, 30000)
+        }
+      }
 
-    ws.onerror = (error) => {
-      console.error("WebSocket error:", error)
+      ws.onerror = (error) => {
+        console.error("WebSocket error:", error)
+      }
     }
 
+    connect()
+
     return () => {
+      stopped = true
+      clearTimeout(reconnectTimer)
       ws.close()
     }
   }, [])